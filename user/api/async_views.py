@@ -0,0 +1,68 @@
+"""Async registration for ASGI.
+
+The sync Register view hashes the password on the worker that serves the
+request. This one hashes it in the bounded thread pool of user.api.hashing
+and only goes to the database for the validation and the inserts, so a burst
+of registrations doesn't stop the other requests of the process.
+
+It is a plain Django view: the DRF authentication, permission and throttle
+classes don't run. Register is open to everyone and no throttle is
+configured, so the two views accept the same requests.
+"""
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from user.api.hashing import ahash_password
+from user.api.serializers import RegisterationSerializer
+from watchlist.api.renderers import render_json
+
+
+@sync_to_async
+def validate(serializer):
+    # the unique username check queries the database
+    serializer.is_valid(raise_exception=True)
+    serializer.check_passwords()
+
+
+@sync_to_async
+def create_account(serializer, password_hash):
+    """ The user and its token in one transaction """
+    with transaction.atomic():
+        account = serializer.save(password_hash=password_hash)
+        token = Token.objects.create(user=account)
+    return account, token
+
+
+# token clients have no csrf cookie, like the DRF views
+@csrf_exempt
+@require_POST
+async def register(request):
+    # the same parsers as the DRF views, the body is already read by the ASGI handler
+    try:
+        data = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]).data
+        serializer = RegisterationSerializer(data=data)
+        await validate(serializer)
+        password_hash = await ahash_password(serializer.validated_data['password'])
+        account, token = await create_account(serializer, password_hash)
+    except ValidationError as exc:
+        return render_json(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+    except APIException as exc:
+        # parse errors, and HashingBusy when the thread pool is full
+        response = render_json({'detail': exc.detail}, status=exc.status_code)
+        if exc.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = '1'
+        return response
+
+    return render_json({
+        'response': 'Successfully registered a new user.',
+        'username': account.username,
+        'email': account.email,
+        'token': token.key,
+    }, status=status.HTTP_201_CREATED)
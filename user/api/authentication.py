@@ -0,0 +1,101 @@
+"""Token authentication with an in-process cache of the tokens.
+
+The cache is per process: a logout, a deactivated user or a deleted token
+drops the entries of the process that handled the change (see user.signals),
+the other processes keep accepting the token until their entry expires,
+TOKEN_AUTH_CACHE['TIMEOUT'] seconds at most.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULT_TOKEN_CACHE = {
+    # seconds an entry is trusted, this bounds how long another process accepts a revoked token
+    'TIMEOUT': 10,
+    'MAX_ENTRIES': 10000,
+}
+
+
+class TokenCache:
+    """ LRU of token key -> (user, token) or the error message of an invalid token, with a TTL """
+
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+@lru_cache(maxsize=None)
+def get_token_cache():
+    """ The cache configured in settings.TOKEN_AUTH_CACHE, made on first use (see user.signals) """
+    config = {**DEFAULT_TOKEN_CACHE, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+    return TokenCache(config['TIMEOUT'], config['MAX_ENTRIES'])
+
+
+def invalidate_tokens(*keys):
+    """ Forget the tokens, the next request with them goes to the database again """
+    get_token_cache().delete(*keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ TokenAuthentication that keeps the token + user lookup in memory.
+
+    Invalid tokens are cached too, so a client retrying a bad token
+    doesn't hit the database every time.
+    Entries are dropped on logout and when the user or token changes (see user.signals),
+    in this process, the other ones forget them after TOKEN_AUTH_CACHE['TIMEOUT'] seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        cached = token_cache.get(key)
+        if isinstance(cached, str):
+            # a new exception every time, raising a cached one would grow its traceback with every request
+            raise exceptions.AuthenticationFailed(cached)
+        if cached is not None:
+            user, token = cached
+            # a copy, so a view changing request.user doesn't change the cache
+            return copy.copy(user), token
+
+        try:
+            user, token = super().authenticate_credentials(key)
+        except exceptions.AuthenticationFailed as exc:
+            token_cache.set(key, str(exc.detail))
+            raise
+        token_cache.set(key, (user, token))
+        return copy.copy(user), token
@@ -0,0 +1,60 @@
+"""Password hashing off the request thread.
+
+make_password() runs the full PBKDF2 cost, hundreds of milliseconds of CPU.
+Under ASGI that would stop the event loop, so the async registration hashes
+in a bounded thread pool: hashlib releases the GIL while it hashes, so the
+threads run in parallel with the loop and with each other.
+Only MAX_PENDING hashes can be queued, past that the registration is refused
+with a 503 instead of piling up requests.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+DEFAULT_PASSWORD_HASHING = {
+    # threads hashing at the same time, each one keeps a cpu busy
+    'MAX_WORKERS': 4,
+    # hashes running or waiting for a thread
+    'MAX_PENDING': 64,
+}
+
+_config = {**DEFAULT_PASSWORD_HASHING, **getattr(settings, 'PASSWORD_HASHING', {})}
+_pending = threading.BoundedSemaphore(_config['MAX_PENDING'])
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many registrations at the moment, try again in a few seconds.'
+    default_code = 'hashing_busy'
+
+
+def get_executor():
+    """ The thread pool is started on the first hash """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_config['MAX_WORKERS'], thread_name_prefix='password-hashing')
+        return _executor
+
+
+async def ahash_password(password):
+    """ make_password() in the thread pool, raises HashingBusy when the pool is full """
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), make_password, password)
+    finally:
+        _pending.release()
+
+
+def hash_passwords(passwords, workers):
+    """ make_password() of every password, in parallel, in the order of the passwords """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing') as executor:
+        return list(executor.map(make_password, passwords))
@@ -1,6 +1,9 @@
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
+from user.models import email_unique_in_database
+
 
 class RegisterationSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(style={'input_type': 'password'}, write_only=True)
@@ -16,19 +19,32 @@ class RegisterationSerializer(serializers.ModelSerializer):
                                         validated_data['password'])
         return user
 
-    def save(self):
-        password = self.validated_data['password']
-        password2 = self.validated_data['password2']
-        if password != password2:
+    def check_passwords(self):
+        if self.validated_data['password'] != self.validated_data['password2']:
             raise serializers.ValidationError({'password': 'Passwords must match.'})
 
-        if User.objects.filter(email=self.validated_data['email']).exists():
+    def save(self, password_hash=None):
+        """ password_hash is the hashed password when the caller hashed it already (see user.api.async_views) """
+        self.check_passwords()
+        email = self.validated_data['email']
+        if email and not email_unique_in_database() and User.objects.filter(email=email).exists():
             raise serializers.ValidationError({'email': 'Email already exists.'})
 
         account = User(
             email=self.validated_data['email'],
             username=self.validated_data['username']
         )
-        account.set_password(password)
-        account.save()
-        return account
\ No newline at end of file
+        if password_hash is None:
+            account.set_password(self.validated_data['password'])
+        else:
+            account.password = password_hash
+        try:
+            with transaction.atomic():
+                account.save()
+        except IntegrityError:
+            # where the emails are unique in the database (user.models.USER_EMAIL_UNIQUE),
+            # we only query on the error path, to tell it from a username taken in the meantime
+            if User.objects.filter(username=account.username).exists():
+                raise serializers.ValidationError({'username': 'A user with that username already exists.'})
+            raise serializers.ValidationError({'email': 'Email already exists.'})
+        return account
@@ -1,10 +1,13 @@
 from rest_framework.authtoken.views import obtain_auth_token
 
 from django.urls import path
+from . import async_views
 from .views import Register, Logout
 
 urlpatterns = [
     path('login/', obtain_auth_token, name='obtain-token'),
     path('register/', Register.as_view(), name='register'),
     path('logout/', Logout.as_view(), name='logout'),
+    # under ASGI, hashes the password in a bounded thread pool (see user.api.hashing)
+    path('async/register/', async_views.register, name='async-register'),
 ]
@@ -3,6 +3,7 @@ from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from user.api.authentication import invalidate_tokens
 from user.api.serializers import RegisterationSerializer
 
 
@@ -25,6 +26,16 @@ class Register(APIView):
 
 
 class Logout(APIView):
+    """Delete the token of the user.
+
+    The process that serves the logout rejects the token right away. The
+    other processes keep their cached entry, and accept the token for up to
+    TOKEN_AUTH_CACHE['TIMEOUT'] seconds (10 by default) after the logout.
+    """
+
     def post(self, request):
-        request.user.auth_token.delete()
+        token = request.user.auth_token
+        token.delete()
+        # drop it from the authentication cache right away
+        invalidate_tokens(token.key)
         return Response(status=status.HTTP_200_OK)
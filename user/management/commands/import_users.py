@@ -0,0 +1,97 @@
+"""Create many users, with their tokens, from a CSV or NDJSON file."""
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from user.api.hashing import hash_passwords
+from watchlist.export import file_format_of, open_text, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Import users from a CSV file (with a header) or an NDJSON file, with the columns username, email '
+            'and password. The passwords are hashed in parallel and every batch of users is inserted '
+            'with its tokens in one transaction. Users whose username or email is taken are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='the file to import, .csv or .ndjson, gzipped when it ends with .gz')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='the format of the file, by default from its extension')
+        parser.add_argument('--batch-size', type=int, default=500, help='users per transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='threads hashing the passwords')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or file_format_of(options['path'])
+        batch_size = options['batch_size']
+        if batch_size <= 0 or options['workers'] <= 0:
+            raise CommandError('--batch-size and --workers must be positive')
+
+        created = skipped = 0
+        start = time.perf_counter()
+        with open_text(options['path']) as file:
+            rows = read_rows(file, file_format)
+            try:
+                while batch := list(islice(rows, batch_size)):
+                    batch_created, batch_skipped = self.import_batch(batch, options['workers'])
+                    created += batch_created
+                    skipped += len(batch_skipped)
+                    for row, reason in batch_skipped:
+                        self.stderr.write(f"Skipped {row.get('username')!r}: {reason}")
+            except ValueError as exc:
+                raise CommandError(exc)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'Created {created} users, skipped {skipped}, in {elapsed:.2f}s '
+                          f'({created / elapsed if elapsed else 0:.0f} users/s)')
+
+    def import_batch(self, rows, workers):
+        """ Return the number of users created and the (row, reason) of the skipped rows """
+        skipped = []
+        valid = []
+        usernames, emails = set(), set()
+        for row in rows:
+            username = (row.get('username') or '').strip()
+            email = User.objects.normalize_email((row.get('email') or '').strip())
+            password = row.get('password') or ''
+            if not username or not password:
+                skipped.append((row, 'username and password are required'))
+            elif username in usernames or (email and email in emails):
+                skipped.append((row, 'duplicate in the file'))
+            else:
+                usernames.add(username)
+                if email:
+                    emails.add(email)
+                valid.append((row, username, email, password))
+
+        # one query per column for the whole batch
+        taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        taken_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        users = []
+        for row, username, email, password in valid:
+            if username in taken_usernames or (email and email in taken_emails):
+                skipped.append((row, 'username or email already registered'))
+            else:
+                users.append((username, email, password))
+        if not users:
+            return 0, skipped
+
+        # hashlib releases the GIL, so the threads hash in parallel
+        hashes = hash_passwords([password for _, _, password in users], workers)
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(User(username=username, email=email, password=password_hash)
+                                         for (username, email, _), password_hash in zip(users, hashes))
+                # fetched again, MySQL doesn't return the ids of a bulk insert
+                ids = User.objects.filter(username__in=[username for username, _, _ in users]).values_list(
+                    'pk', flat=True)
+                Token.objects.bulk_create(Token(key=Token.generate_key(), user_id=pk) for pk in ids)
+        except IntegrityError as exc:
+            # a user registered through the api since the check above
+            raise CommandError(f'A batch of {len(users)} users was not imported, run the import again '
+                               f'(the users already imported are skipped): {exc}')
+        return len(users), skipped
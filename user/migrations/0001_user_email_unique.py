@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Lower, NullIf
+
+# a copy of user.models.USER_EMAIL_UNIQUE as of this migration, the app code can change after it
+USER_EMAIL_UNIQUE = models.UniqueConstraint(NullIf(Lower('email'), Value('')), name='auth_user_email_uniq')
+
+
+def add_email_constraint(apps, schema_editor):
+    """ The constraint is on a table of another app, so it's added outside of the migration state """
+    schema_editor.add_constraint(apps.get_model('auth', 'User'), USER_EMAIL_UNIQUE)
+
+
+def remove_email_constraint(apps, schema_editor):
+    schema_editor.remove_constraint(apps.get_model('auth', 'User'), USER_EMAIL_UNIQUE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        # fails if two users already share an email, they have to be fixed first
+        migrations.RunPython(add_email_constraint, remove_email_constraint),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Lower, NullIf
+
+# copies of the constraints as of this migration, the app code can change after it
+OLD_USER_EMAIL_UNIQUE = models.UniqueConstraint(NullIf(Lower('email'), Value('')), name='auth_user_email_uniq')
+USER_EMAIL_UNIQUE = models.UniqueConstraint(NullIf('email', Value('')), name='auth_user_email_unique')
+
+
+def compare_emails_like_the_column(apps, schema_editor):
+    """ The emails are compared like the column again, without folding the case """
+    User = apps.get_model('auth', 'User')
+    schema_editor.remove_constraint(User, OLD_USER_EMAIL_UNIQUE)
+    schema_editor.add_constraint(User, USER_EMAIL_UNIQUE)
+
+
+def fold_the_case(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    schema_editor.remove_constraint(User, USER_EMAIL_UNIQUE)
+    schema_editor.add_constraint(User, OLD_USER_EMAIL_UNIQUE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(compare_emails_like_the_column, fold_the_case),
+    ]
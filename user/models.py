@@ -1,3 +1,19 @@
+from django.contrib.auth.models import User
+from django.db import connections, models, router
+from django.db.models import Value
+from django.db.models.functions import NullIf
+
+# auth.User doesn't have unique emails, the user migrations add this constraint to its table.
+# Users created without an email are not affected: '' is compared as NULL.
+# The emails are compared like the column, case insensitively with the default collations of MySQL.
+USER_EMAIL_UNIQUE = models.UniqueConstraint(NullIf('email', Value('')), name='auth_user_email_unique')
+
+
+def email_unique_in_database():
+    """ False when the database can't have USER_EMAIL_UNIQUE (MariaDB, MySQL < 8.0.13 have no expression
+    indexes, the migration skips it): the emails are then checked with a query before the insert """
+    return connections[router.db_for_write(User)].features.supports_expression_indexes
+
 # from django.contrib.auth import get_user_model
 # from django.db import models
 # from django.db.models.signals import post_save
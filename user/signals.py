@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.api.authentication import get_token_cache, invalidate_tokens
+
+User = get_user_model()
+
+
+# a deactivated user, a new password or new permissions must not be served from the cache
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_tokens(*Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+
+
+# covers logout, and a new token that was cached as invalid before
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+# override_settings(TOKEN_AUTH_CACHE=...) gets a new cache
+@receiver(setting_changed)
+def token_cache_settings_changed(sender, setting, **kwargs):
+    if setting == 'TOKEN_AUTH_CACHE':
+        get_token_cache.cache_clear()
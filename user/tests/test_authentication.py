@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.api.authentication import CachedTokenAuthentication, TokenCache, get_token_cache
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.addCleanup(get_token_cache().clear)
+        self.user = User.objects.create_user(username='user', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def test_valid_token_is_cached(self):
+        user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user, token), (self.user, self.token))
+        with self.assertNumQueries(0):
+            user, _ = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+    def test_cached_user_is_a_copy(self):
+        user, _ = self.authentication.authenticate_credentials(self.token.key)
+        user.username = 'changed'
+        user, _ = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.username, 'user')
+
+    def test_invalid_token_raises_a_new_exception_every_time(self):
+        raised = []
+        for _ in range(3):
+            with self.assertRaises(exceptions.AuthenticationFailed) as context:
+                self.authentication.authenticate_credentials('bad')
+            raised.append(context.exception)
+        self.assertEqual(len({id(exc) for exc in raised}), 3)
+        self.assertEqual(str(raised[0].detail), str(raised[2].detail))
+        # the cached entry is the message, not an exception that keeps the frames of every request
+        self.assertIsInstance(get_token_cache().get('bad'), str)
+
+    def test_invalid_token_is_cached(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials('bad')
+        with self.assertNumQueries(0), self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials('bad')
+
+    def test_deactivated_user_is_rejected(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_logout_revokes_the_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.post(reverse('logout')).status_code, 200)
+        self.assertEqual(client.post(reverse('logout')).status_code, 401)
+
+    def test_new_token_cached_as_invalid_is_accepted(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials('a' * 40)
+        Token.objects.create(key='a' * 40, user=User.objects.create(username='other'))
+        user, _ = self.authentication.authenticate_credentials('a' * 40)
+        self.assertEqual(user.username, 'other')
+
+
+class TokenCacheTests(TestCase):
+
+    def test_entries_expire(self):
+        cache = TokenCache(timeout=10, max_entries=10)
+        with mock.patch('user.api.authentication.time.monotonic', return_value=100):
+            cache.set('key', 'value')
+        with mock.patch('user.api.authentication.time.monotonic', return_value=110):
+            self.assertEqual(cache.get('key'), 'value')
+        with mock.patch('user.api.authentication.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get('key'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = TokenCache(timeout=10, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual([cache.get(key) for key in 'abc'], [1, None, 3])
+
+    def test_default_timeout_is_short(self):
+        # the other processes accept a revoked token until their entry expires
+        self.assertLessEqual(get_token_cache().timeout, 10)
+
+    def test_settings_are_read_on_first_use(self):
+        with override_settings(TOKEN_AUTH_CACHE={'TIMEOUT': 1, 'MAX_ENTRIES': 5}):
+            self.assertEqual((get_token_cache().timeout, get_token_cache().max_entries), (1, 5))
+        self.assertEqual(get_token_cache().timeout, 10)
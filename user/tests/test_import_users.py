@@ -0,0 +1,57 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+
+class ImportUsersTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        User.objects.create(username='taken', email='taken@example.com')
+
+    def import_users(self, name, content, **options):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        stderr = StringIO()
+        call_command('import_users', path, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def test_csv(self):
+        errors = self.import_users('users.csv', 'username,email,password\n'
+                                                'first,first@example.com,secret1\n'
+                                                'second,,secret2\n'
+                                                'third,third@example.com,secret3\n', batch_size=2, workers=2)
+        self.assertEqual(errors, '')
+        users = User.objects.exclude(username='taken').order_by('username')
+        self.assertEqual([(user.username, user.email) for user in users],
+                         [('first', 'first@example.com'), ('second', ''), ('third', 'third@example.com')])
+        self.assertTrue(User.objects.get(username='third').check_password('secret3'))
+        self.assertEqual(Token.objects.count(), 3)
+
+    def test_skipped_rows(self):
+        errors = self.import_users('users.ndjson', '\n'.join([
+            '{"username": "first", "email": "first@example.com", "password": "secret"}',
+            '{"username": "first", "email": "other@example.com", "password": "secret"}',
+            '{"username": "other", "email": "first@example.com", "password": "secret"}',
+            '{"username": "taken", "email": "new@example.com", "password": "secret"}',
+            '{"username": "new", "email": "taken@example.com", "password": "secret"}',
+            '{"username": "nopassword", "email": ""}',
+        ]))
+        self.assertEqual(errors.count('Skipped'), 5)
+        self.assertEqual(set(User.objects.values_list('username', flat=True)), {'taken', 'first'})
+        # running it again skips the users already imported
+        errors = self.import_users('again.ndjson', '{"username": "first", "password": "secret"}\n')
+        self.assertIn('already registered', errors)
+
+    def test_invalid_file(self):
+        with self.assertRaises(CommandError):
+            self.import_users('users.ndjson', '{"username": \n')
+        with self.assertRaises(CommandError):
+            self.import_users('users.csv', 'username,password\n', workers=0)
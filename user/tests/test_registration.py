@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from user.api import hashing
+
+
+class EmailUniqueTests(TestCase):
+
+    def test_emails_are_unique(self):
+        User.objects.create(username='first', email='someone@example.com')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(username='second', email='someone@example.com')
+        # compared like the column: SQLite doesn't fold the case
+        User.objects.create(username='third', email='SOMEONE@example.com')
+
+    def test_users_without_email(self):
+        User.objects.create(username='first', email='')
+        User.objects.create(username='second', email='')
+        self.assertEqual(User.objects.filter(email='').count(), 2)
+
+    def test_register_with_a_taken_email(self):
+        client = APIClient()
+        data = {'username': 'first', 'email': 'someone@example.com', 'password': 'secret', 'password2': 'secret'}
+        self.assertEqual(client.post(reverse('register'), data).status_code, 201)
+        response = client.post(reverse('register'), {**data, 'username': 'second'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    def test_checked_before_the_insert_without_the_constraint(self):
+        client = APIClient()
+        data = {'username': 'first', 'email': 'someone@example.com', 'password': 'secret', 'password2': 'secret'}
+        self.assertEqual(client.post(reverse('register'), data).status_code, 201)
+        with mock.patch.object(connection.features, 'supports_expression_indexes', False), \
+                CaptureQueriesContext(connection) as queries:
+            response = client.post(reverse('register'), {**data, 'username': 'second'})
+        self.assertEqual(response.json(), {'email': 'Email already exists.'})
+        # refused by the query, there was no insert
+        self.assertFalse([query for query in queries if query['sql'].startswith('INSERT')])
+
+
+class AsyncRegisterTests(TestCase):
+
+    def register(self, **data):
+        data = {'username': 'someone', 'email': 'someone@example.com', 'password': 'secret', 'password2': 'secret',
+                **data}
+        return self.client.post(reverse('async-register'), data, content_type='application/json')
+
+    def test_register(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username='someone')
+        self.assertTrue(user.check_password('secret'))
+        self.assertEqual(response.json()['token'], user.auth_token.key)
+
+    def test_same_errors_as_the_sync_view(self):
+        mismatch = self.register(password2='other')
+        self.assertEqual(mismatch.status_code, 400)
+        sync = self.client.post(reverse('register'), {'username': 'someone', 'email': 'someone@example.com',
+                                                      'password': 'secret', 'password2': 'other'})
+        self.assertEqual(mismatch.json(), sync.json())
+        self.assertEqual(self.register().status_code, 201)
+        self.assertIn('username', self.register(email='other@example.com').json())
+        self.assertIn('email', self.register(username='other').json())
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_busy(self):
+        # every slot of the thread pool taken
+        for _ in range(hashing._config['MAX_PENDING']):
+            hashing._pending.acquire()
+            self.addCleanup(hashing._pending.release)
+        response = self.register()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(User.objects.exists())
+
+    def test_hash_passwords(self):
+        passwords = ['first', 'second', 'third']
+        hashes = hashing.hash_passwords(passwords, workers=2)
+        self.assertEqual([check_password(password, hashed) for password, hashed in zip(passwords, hashes)],
+                         [True, True, True])
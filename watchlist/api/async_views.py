@@ -0,0 +1,123 @@
+"""Async read views for ASGI.
+
+DRF views are sync, under ASGI every request to them goes through the
+sync_to_async thread bridge. These views serve the hot read endpoints as
+native coroutines: the rows are read with Django's async ORM interface,
+with every relation the serializer needs prefetched, so serializing them
+afterwards never touches the database. The lists are serialized and rendered
+in a worker thread, a large page would hold up the event loop.
+
+They are plain Django views and bypass the DRF layer of the sync views:
+- no authentication, permission or throttle classes run. The sync reads
+  are open to everyone (AdminOrReadOnly) and no throttle is configured, so
+  this only matters if that changes.
+- no conditional_get: no ETag, If-None-Match always gets a 200.
+- no cache_response: every request reads the database.
+Keep them to anonymous GETs of public data, and use the sync views when
+the cached or revalidated responses matter more than the thread bridge.
+
+The sync views in views.py stay the ones to use under WSGI.
+"""
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+
+from watchlist.api.fields import get_selection
+from watchlist.api.pagination import WatchListCursorPagination
+from watchlist.api.prefetch import prefetch_for_serializer
+from watchlist.api.renderers import render_json
+from watchlist.api.serializers import ReviewSerializer, streamplatform_serializer_class, watchlist_serializer_class
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+async def render_list(serializer, page=None):
+    """ The response of a list, serialized and rendered off the event loop """
+    def render():
+        data = serializer.data
+        return render_json(data if page is None else {**page, 'results': data})
+
+    # the rows are prefetched, the thread never queries the database
+    return await sync_to_async(render, thread_sensitive=False)()
+
+
+def not_found(detail='Not found.'):
+    return render_json({'detail': detail}, status=404)
+
+
+def selected_queryset(request, queryset, serializer_class, **kwargs):
+    """ The queryset for the ?fields= / ?expand= of the request, and the serializer kwargs """
+    fields, expand = get_selection(request)
+    return prefetch_for_serializer(queryset, serializer_class, fields, expand, **kwargs), \
+        {'fields': fields, 'expand': expand}
+
+
+@require_safe
+async def streamplatform_list(request):
+    serializer_class = streamplatform_serializer_class(request)
+    try:
+        queryset, selection = selected_queryset(request, StreamPlatform.objects.all(), serializer_class)
+    except ValidationError as exc:
+        return render_json(exc.detail, status=400)
+    platforms = [platform async for platform in queryset]
+    # the hyperlinked serializer builds absolute urls from the request
+    serializer = serializer_class(platforms, many=True, context={'request': Request(request)}, **selection)
+    return await render_list(serializer)
+
+
+@require_safe
+async def streamplatform_detail(request, pk):
+    serializer_class = streamplatform_serializer_class(request)
+    try:
+        queryset, selection = selected_queryset(request, StreamPlatform.objects.all(), serializer_class)
+    except ValidationError as exc:
+        return render_json(exc.detail, status=400)
+    try:
+        platform = await queryset.aget(pk=pk)
+    except StreamPlatform.DoesNotExist:
+        return not_found()
+    serializer = serializer_class(platform, context={'request': Request(request)}, **selection)
+    return render_json(serializer.data)
+
+
+@require_safe
+async def watchlist_list(request):
+    paginator = WatchListCursorPagination()
+    serializer_class = watchlist_serializer_class(request)
+    try:
+        # the cursor reads the created column
+        queryset, selection = selected_queryset(request, WatchList.active_objects.all(), serializer_class,
+                                                required=('created',))
+    except ValidationError as exc:
+        return render_json(exc.detail, status=400)
+    try:
+        movies = await paginator.apaginate_queryset(queryset, Request(request))
+    except NotFound as exc:
+        return not_found(exc.detail)
+    # ?reviews=latest links to the review feed of every movie
+    serializer = serializer_class(movies, many=True, context={'request': Request(request)}, **selection)
+    return await render_list(serializer, {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+    })
+
+
+@require_safe
+async def watchlist_detail(request, pk):
+    serializer_class = watchlist_serializer_class(request)
+    try:
+        queryset, selection = selected_queryset(request, WatchList.active_objects.all(), serializer_class)
+    except ValidationError as exc:
+        return render_json(exc.detail, status=400)
+    try:
+        movie = await queryset.aget(pk=pk)
+    except WatchList.DoesNotExist:
+        return not_found()
+    return render_json(serializer_class(movie, context={'request': Request(request)}, **selection).data)
+
+
+@require_safe
+async def review_list(request, watchlist_id):
+    queryset = prefetch_for_serializer(Review.active_objects.filter(watchlist=watchlist_id), ReviewSerializer)
+    reviews = [review async for review in queryset]
+    return await render_list(ReviewSerializer(reviews, many=True))
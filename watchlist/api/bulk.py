@@ -0,0 +1,143 @@
+"""Bulk create / update of many items in one request.
+
+Every item is validated by a serializer that doesn't query the database,
+the checks that need the database (foreign keys, unique names, ids to
+update) run once for the whole batch in validate_batch(). The valid items
+are then written with bulk_create / bulk_update in a single transaction.
+
+MySQL doesn't return the ids of a bulk insert, there the ids of the new
+rows are chosen before the insert (see allocate_ids).
+"""
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from watchlist.api.cache import bump_versions
+from watchlist.api.parsers import MessagePackParser, NDJSONParser, ORJSONParser
+
+
+class BulkUpsertView(APIView):
+    """ POST a list of items, items with an id update that row, the others are created.
+
+    The response has one result per item, in the order of the request:
+    {"index": 0, "status": "created" | "updated" | "error", "id": ..., "errors": ...}
+    """
+    parser_classes = [ORJSONParser, NDJSONParser, MessagePackParser]
+
+    model = None
+    serializer_class = None
+    # model fields written by bulk_update
+    update_fields = ()
+    # inserts with allocated ids, when another writer takes one of the ids first
+    id_attempts = 3
+    batch_size = getattr(settings, 'WATCHLIST_BULK_BATCH_SIZE', 500)
+
+    def validate_batch(self, items):
+        """ Checks that need the database, items is a list of (index, validated_data).
+
+        Return a dict of index -> errors for the items that are not valid.
+        """
+        return {}
+
+    def version_names(self, obj):
+        """ The response cache versions that change when obj is written """
+        return []
+
+    def after_write(self, objects):
+        """ Called in the transaction with the created and updated objects, bulk writes send no signals """
+
+    def allocate_ids(self, objects):
+        """ Set the pks of the objects to create, after the last id of the table.
+
+        For the databases where bulk_create can't read the ids of the rows back. The ids are
+        known before the insert, so a row created at the same time by another request can't be
+        reported as one of ours: if it took one of the ids the insert fails on the primary key.
+        """
+        start = (self.model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        for pk, obj in enumerate(objects, start):
+            obj.pk = pk
+
+    def create(self, objects):
+        """ bulk_create the objects and set their pks """
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.model.objects.bulk_create(objects, batch_size=self.batch_size)
+            return
+        for attempt in range(1, self.id_attempts + 1):
+            self.allocate_ids(objects)
+            try:
+                # a savepoint, the transaction of post() goes on after a failed attempt
+                with transaction.atomic():
+                    self.model.objects.bulk_create(objects, batch_size=self.batch_size)
+                return
+            except IntegrityError:
+                if attempt == self.id_attempts:
+                    raise
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = self.serializer_class(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        # one query for all the rows we are asked to update
+        existing = self.model.objects.in_bulk([data['id'] for _, data in valid if data.get('id') is not None])
+        errors = self.validate_batch(valid)
+        for index, data in valid:
+            if data.get('id') is not None and data['id'] not in existing:
+                errors.setdefault(index, {})['id'] = ['Not found.']
+        for index, item_errors in errors.items():
+            results[index] = {'index': index, 'status': 'error', 'errors': item_errors}
+
+        created, updated = [], []
+        names = set()
+        now = timezone.now()
+        for index, data in valid:
+            if index in errors:
+                continue
+            data = dict(data)
+            pk = data.pop('id', None)
+            if pk is None:
+                created.append((index, self.model(**data)))
+                continue
+            obj = existing[pk]
+            # the old values can be cached too, like the platform a movie is moving from
+            names.update(self.version_names(obj))
+            for attr, value in data.items():
+                setattr(obj, attr, value)
+            # bulk_update doesn't fill auto_now fields
+            obj.updated_at = now
+            updated.append((index, obj))
+
+        with transaction.atomic():
+            if created:
+                self.create([obj for _, obj in created])
+            if updated:
+                self.model.objects.bulk_update([obj for _, obj in updated],
+                                               fields=[*self.update_fields, 'updated_at'],
+                                               batch_size=self.batch_size)
+            self.after_write([obj for _, obj in created + updated])
+            # bulk writes don't send post_save, so we bump the cache versions ourselves
+            for _, obj in created + updated:
+                names.update(self.version_names(obj))
+            transaction.on_commit(lambda: bump_versions(names))
+
+        for index, obj in created:
+            results[index] = {'index': index, 'status': 'created', 'id': obj.pk}
+        for index, obj in updated:
+            results[index] = {'index': index, 'status': 'updated', 'id': obj.pk}
+
+        response_status = status.HTTP_201_CREATED if not errors and len(valid) == len(items) \
+            else status.HTTP_207_MULTI_STATUS
+        return Response(results, status=response_status)
@@ -0,0 +1,216 @@
+"""Versioned response cache for the read endpoints of the watchlist api.
+
+Every cached response is stored under a key that contains the current
+version token of the data it was built from, like 'streamplatform:3' or
+'watchlist'. Saving or deleting a model gives the matching keys a new
+token (see watchlist.signals), so stale entries are never read again and
+simply fall out of the cache.
+
+The versions have to be shared by every process that writes or serves the
+data, the web workers and the management commands: DjangoCacheBackend
+stores them in a cache of settings.CACHES, Redis with REDIS_URL.
+LocMemLRUBackend, the setting without Redis, keeps them in the process: a
+bump made by another process is only seen once the entries expire, after
+its timeout.
+"""
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULT_CACHE_SETTINGS = {
+    'BACKEND': 'watchlist.api.cache.DjangoCacheBackend',
+    'OPTIONS': {},
+}
+
+
+class LocMemLRUBackend:
+    """ Per process LRU cache bounded by the number of entries and their pickled size.
+
+    The entries expire after timeout seconds, the versions too: that is how long
+    a process can serve a response that another process made stale.
+    """
+    # the other processes don't see the bumps of this one
+    shared = False
+
+    def __init__(self, max_entries=1000, max_size=64 * 1024 * 1024, timeout=60):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.timeout = timeout
+        # key -> (expiry on the monotonic clock, pickled value)
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return None
+            if expires < time.monotonic():
+                self._size -= len(value)
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        # values are pickled, so a caller can't change what is in the cache
+        return pickle.loads(value)
+
+    def get_many(self, keys):
+        return {key: value for key in keys if (value := self.get(key)) is not None}
+
+    def set(self, key, value):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, value)
+
+    def add(self, key, value):
+        """ Set the key only if it's missing, return True if it was set """
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return False
+            self._store(key, value)
+        return True
+
+    def _store(self, key, value):
+        # called with the lock held
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._size -= len(old[1])
+        if len(value) > self.max_size:
+            return
+        self._data[key] = (time.monotonic() + self.timeout, value)
+        self._size += len(value)
+        # evict the least recently used entries
+        while len(self._data) > self.max_entries or self._size > self.max_size:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+
+class DjangoCacheBackend:
+    """ Store the responses in one of the caches from settings.CACHES """
+
+    def __init__(self, alias='default', timeout=None):
+        self.alias = alias
+        # None means the entries never expire, the versions make them stale
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        # caches[alias] is per thread, so we don't keep a reference to it
+        return caches[self.alias]
+
+    @property
+    def shared(self):
+        # a local memory cache in CACHES is per process too
+        return not isinstance(self.cache, LocMemCache)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def add(self, key, value):
+        return self.cache.add(key, value, self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """ The backend configured in settings.WATCHLIST_RESPONSE_CACHE """
+    config = getattr(settings, 'WATCHLIST_RESPONSE_CACHE', DEFAULT_CACHE_SETTINGS)
+    backend_class = import_string(config['BACKEND'])
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+def _version_key(name):
+    return f'watchlist:version:{name}'
+
+
+def get_versions(names):
+    """ Return the current version token of each name, creating the missing ones """
+    backend = get_backend()
+    keys = [_version_key(name) for name in names]
+    found = backend.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            # a missing (or evicted) version gets a fresh token, never an old one
+            token = uuid.uuid4().hex
+            # add() keeps the token of a concurrent request that set it first
+            backend.add(key, token)
+            version = backend.get(key) or token
+        versions.append(version)
+    return versions
+
+
+def bump_versions(names):
+    """ Give new tokens to the names, so the responses built from them are stale """
+    backend = get_backend()
+    for name in names:
+        backend.set(_version_key(name), uuid.uuid4().hex)
+
+
+def local_bump_warning():
+    """ The warning of the management commands, whose bumps the web workers can't see with a per process backend """
+    if get_backend().shared:
+        return None
+    return ('WATCHLIST_RESPONSE_CACHE is per process: the web workers keep serving the responses they cached '
+            'until they expire')
+
+
+def cache_response(*version_names):
+    """ Cache the data of a successful GET under the versions it depends on.
+
+    version_names are formatted with the url kwargs, so a detail view can
+    depend on 'streamplatform:{pk}'.
+    The response doesn't depend on the user, but hyperlinks have the host in them,
+    so the host is part of the key.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            # read the versions before the database, a write that happens in between
+            # bumps them and the entry we store below will never be read
+            versions = get_versions([name.format(**kwargs) for name in version_names])
+            raw_key = ':'.join([request.get_host(), request.get_full_path(), *versions])
+            key = 'watchlist:response:' + hashlib.sha256(raw_key.encode()).hexdigest()
+
+            backend = get_backend()
+            data = backend.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                backend.set(key, response.data)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,202 @@
+"""Compiled, read-only version of a ModelSerializer.
+
+The DRF serializer builds every row through the field machinery: a bound
+field per attribute, get_attribute, to_representation, method dispatch for
+SerializerMethodField... For read-only output most of that work is the same
+for every row. compile_serializer() reads the serializer definition once and
+turns it into one getter per field that works on the tuples of
+.values_list(), so a list is serialized with plain function calls.
+
+The output is the same data, in the same key order, as serializer.data.
+Only the field types used in this app are supported, anything else raises
+ImproperlyConfigured when the serializer is compiled. The fields read from
+the get_annotations() of the serializer (see watchlist.api.prefetch) are
+columns of the values_list() like the model fields.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from watchlist.api.instrumentation import timed
+from watchlist.api.prefetch import get_annotations
+
+# fields whose to_representation returns database values as they are
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField,
+                serializers.BooleanField, serializers.FloatField)
+
+
+def _iso_datetime(value, field_timezone, to_representation):
+    """ DateTimeField.to_representation for ISO 8601, with the timezone looked up once per list """
+    if value is None:
+        return None
+    if field_timezone is None or value.tzinfo is None:
+        return to_representation(value)
+    value = value.astimezone(field_timezone).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class _Row:
+    """ Attribute access to a values_list() row, for the get_<field> methods """
+
+    def __init__(self, columns, row):
+        self.__dict__.update(zip(columns, row))
+
+
+class CompiledSerializer:
+    """ Serializes a queryset of serializer.Meta.model into the output of serializer(many=True).data """
+
+    def __init__(self, serializer_class, extra_columns=(), serializer=None):
+        # serializer is an instance to compile instead of serializer_class(), like a nested one with a field selection
+        self.serializer = serializer if serializer is not None else serializer_class()
+        self.model = self.serializer.Meta.model
+        # the columns read with values_list(), by attname (platform_id, not platform)
+        # extra_columns are read but not rendered, like the foreign key of a nested list
+        self.columns = [self.model._meta.pk.attname, *extra_columns]
+        self.getters = []
+        # relations loaded once for all the rows:
+        # (field name, related model, column) and (field name, compiled child, foreign key)
+        self.string_relations = []
+        self.nested = []
+        # DateTimeFields, their timezone is resolved once per list instead of once per value
+        self.datetime_fields = []
+        self.needs_row = False
+        # the get_annotations() of the serializer, only the rendered ones are added to the queryset
+        self.available_annotations = get_annotations(self.serializer)
+        self.annotations = {}
+
+        for name, field in self.serializer.fields.items():
+            if field.write_only:
+                continue
+            self.getters.append((name, self._compile_field(name, field)))
+
+    def _column(self, attname):
+        if attname not in self.columns:
+            self.columns.append(attname)
+        return self.columns.index(attname)
+
+    def _model_field(self, name, field):
+        if field.source == '*' or len(field.source_attrs) != 1:
+            raise ImproperlyConfigured(f"Can't compile field '{name}' with source '{field.source}'")
+        return self.model._meta.get_field(field.source_attrs[0])
+
+    def _compile_field(self, name, field):
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(self.serializer, field.method_name)
+            # the method can read any column of the row, even with a selection that leaves them out (?fields=)
+            for model_field in self.model._meta.concrete_fields:
+                self._column(model_field.attname)
+            self.needs_row = True
+            return lambda row, extra: method(extra['row'])
+
+        if isinstance(field, serializers.ListSerializer):
+            model_field = self._model_field(name, field)
+            # the reverse relation, like reviews -> Review.watchlist
+            foreign_key = model_field.field.attname
+            child = CompiledSerializer(type(field.child), extra_columns=(foreign_key,), serializer=field.child)
+            # a list serializer can render only some of the rows, like the latest reviews
+            self.nested.append((name, child, foreign_key, getattr(field, 'get_prefetch_queryset', None)))
+            index = 0  # the pk of the row
+            return lambda row, extra: extra[name].get(row[index], [])
+
+        if isinstance(field, serializers.StringRelatedField):
+            model_field = self._model_field(name, field)
+            index = self._column(model_field.attname)
+            self.string_relations.append((name, model_field.related_model, index))
+            return lambda row, extra: extra[name].get(row[index])
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            # the pk is the <name>_id column, no need to load the related row
+            model_field = self._model_field(name, field)
+            index = self._column(model_field.attname)
+            return lambda row, extra: row[index]
+
+        if field.source in self.available_annotations:
+            self.annotations[field.source] = self.available_annotations[field.source]
+            index = self._column(field.source)
+            return lambda row, extra: None if row[index] is None else field.to_representation(row[index])
+
+        if isinstance(field, serializers.Field) and not isinstance(field, serializers.RelatedField):
+            model_field = self._model_field(name, field)
+            index = self._column(model_field.attname)
+            if type(field) in PLAIN_FIELDS:
+                return lambda row, extra: row[index]
+            to_representation = field.to_representation
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if type(field) is serializers.DateTimeField and output_format and output_format.lower() == ISO_8601:
+                self.datetime_fields.append((name, field))
+                return lambda row, extra: _iso_datetime(row[index], extra[name], to_representation)
+            # like Serializer.to_representation, None is not passed to the field
+            return lambda row, extra: None if row[index] is None else to_representation(row[index])
+
+        raise ImproperlyConfigured(f"Can't compile field '{name}' ({type(field).__name__})")
+
+    def serialize(self, queryset):
+        """ Return the data of the rows of the queryset """
+        with timed('serializer'):
+            rows = list(self.annotate(queryset).values_list(*self.columns))
+            return self.serialize_rows(rows)
+
+    def annotate(self, queryset):
+        return queryset.annotate(**self.annotations) if self.annotations else queryset
+
+    def serialize_rows(self, rows):
+        extra = {}
+        for name, field in self.datetime_fields:
+            # the same lookup as DateTimeField.enforce_timezone
+            extra[name] = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        for name, related_model, index in self.string_relations:
+            ids = {row[index] for row in rows if row[index] is not None}
+            extra[name] = {pk: str(obj) for pk, obj in related_model._default_manager.in_bulk(ids).items()}
+        for name, child, foreign_key, hook in self.nested:
+            pks = [row[0] for row in rows]
+            queryset = child.model._default_manager.filter(**{f'{foreign_key}__in': pks})
+            if hook is not None:
+                queryset = hook(queryset)
+            extra[name] = child.serialize_grouped(queryset, foreign_key)
+
+        getters = self.getters
+        if not self.needs_row:
+            return [{name: getter(row, extra) for name, getter in getters} for row in rows]
+
+        data = []
+        for row in rows:
+            extra['row'] = _Row(self.columns, row)
+            data.append({name: getter(row, extra) for name, getter in getters})
+        return data
+
+    def serialize_grouped(self, queryset, foreign_key):
+        """ Serialize the rows and group them by the foreign_key column, for nested lists """
+        index = self.columns.index(foreign_key)
+        # the order of a prefetch without ordering, unless the queryset has its own
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        rows = list(self.annotate(queryset).values_list(*self.columns))
+        grouped = {}
+        for row, item in zip(rows, self.serialize_rows(rows)):
+            grouped.setdefault(row[index], []).append(item)
+        return grouped
+
+
+def compile_serializer(serializer_class, fields=None, expand=None):
+    """ Compile the serializer class once, the result is shared by every request.
+
+    fields and expand are a selection from watchlist.api.fields.get_selection().
+    """
+    if fields is None and expand is None:
+        return _compile(serializer_class)
+    return _compile_selection(serializer_class, fields, expand)
+
+
+@lru_cache(maxsize=None)
+def _compile(serializer_class):
+    return CompiledSerializer(serializer_class)
+
+
+@lru_cache(maxsize=256)
+def _compile_selection(serializer_class, fields, expand):
+    # bounded, the selections come from the query string
+    return CompiledSerializer(serializer_class, serializer=serializer_class(fields=fields, expand=expand))
@@ -0,0 +1,87 @@
+"""Conditional GET (ETag) for the watchlist api.
+
+The ETag comes from Max('updated_at') and Count('pk') of every model a
+response is built from, so a client that already has the current version
+gets a 304 before anything is serialized.
+The count catches deletes, which don't leave an updated_at behind.
+
+There is no Last-Modified: Max('updated_at') doesn't change when a row is
+deleted, and the header only has a precision of a second, so an
+If-Modified-Since alone would get a 304 for stale data. It is ignored, the
+clients revalidate with If-None-Match.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+def _state(queryset):
+    return queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+
+
+def streamplatform_list_state(**kwargs):
+    return [_state(StreamPlatform.objects.all()),
+            _state(WatchList.objects.all()),
+            _state(Review.objects.all())]
+
+
+def streamplatform_detail_state(pk, **kwargs):
+    return [_state(StreamPlatform.objects.filter(pk=pk)),
+            _state(WatchList.objects.filter(platform_id=pk)),
+            _state(Review.objects.filter(watchlist__platform_id=pk))]
+
+
+def watchlist_list_state(**kwargs):
+    return [_state(WatchList.objects.all()),
+            _state(Review.objects.all())]
+
+
+def watchlist_detail_state(pk, **kwargs):
+    return [_state(WatchList.objects.filter(pk=pk)),
+            _state(Review.objects.filter(watchlist_id=pk))]
+
+
+def review_list_state(watchlist_id=None, **kwargs):
+    queryset = Review.objects.all()
+    if watchlist_id is not None:
+        queryset = queryset.filter(watchlist_id=watchlist_id)
+    return [_state(queryset)]
+
+
+def review_detail_state(pk, **kwargs):
+    return [_state(Review.objects.filter(pk=pk))]
+
+
+def conditional_get(state_func):
+    """ Answer If-None-Match with a 304 before the view runs.
+
+    state_func is called with the url kwargs and returns the aggregates above.
+    The url (page, query params) and the media type are part of the ETag,
+    because they change the body too.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            states = state_func(**kwargs)
+            signature = repr([request.get_full_path(), getattr(request, 'accepted_media_type', None), states])
+            etag = quote_etag(hashlib.sha1(signature.encode()).hexdigest())
+
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response.headers.setdefault('ETag', etag)
+            return response
+
+        return wrapper
+
+    return decorator
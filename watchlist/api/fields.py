@@ -0,0 +1,117 @@
+"""Sparse fieldsets: ?fields= and ?expand= on the read endpoints.
+
+?fields=name,watchlist.title only returns these fields, dotted names reach
+into the nested serializers. ?expand=watchlist,watchlist.reviews lists the
+nested relations to embed. As soon as one of the two parameters is given,
+nested relations are opt-in: they are only rendered when they are expanded
+or named in ?fields=. Without either parameter the full tree is returned,
+as before.
+
+A selection is an immutable tree of (name, subtree) pairs, so it can be a
+key of the lru_caches of the prefetch plans and compiled serializers, and
+the queryset is pruned to match (see watchlist.api.prefetch).
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from watchlist.api.prefetch import prefetch_for_serializer
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_tree(value):
+    """ 'title,reviews.rating' -> (('reviews', (('rating', ()),)), ('title', ())) """
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name.strip(), {})
+    return _freeze(tree)
+
+
+def _freeze(tree):
+    return tuple(sorted((name, _freeze(subtree)) for name, subtree in tree.items()))
+
+
+def get_selection(request):
+    """ The (fields, expand) trees of the query string, (None, None) for the full output """
+    # DRF requests have query_params, the async views get the plain django request
+    params = getattr(request, 'query_params', request.GET)
+    fields = params.get(FIELDS_PARAM)
+    expand = params.get(EXPAND_PARAM)
+    if fields is None and expand is None:
+        return None, None
+    return (parse_tree(fields) if fields is not None else None,
+            parse_tree(expand) if expand is not None else ())
+
+
+def is_nested(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def select_fields(serializer, fields, expand, path=''):
+    """ Drop the fields of the serializer, and of its nested serializers, that are not selected """
+    field_names = dict(fields) if fields is not None else None
+    expand_names = dict(expand) if expand is not None else None
+
+    errors = {}
+    unknown_fields = [name for name in field_names or () if name not in serializer.fields]
+    if unknown_fields:
+        errors[FIELDS_PARAM] = [f'Unknown field "{path}{name}".' for name in unknown_fields]
+    # only nested serializers can be expanded
+    unknown_expand = [name for name in expand_names or ()
+                      if name not in serializer.fields or not is_nested(serializer.fields[name])]
+    if unknown_expand:
+        errors[EXPAND_PARAM] = [f'Unknown relation "{path}{name}".' for name in unknown_expand]
+    if errors:
+        raise ValidationError(errors)
+
+    for name, field in list(serializer.fields.items()):
+        if not is_nested(field):
+            if field_names is not None and name not in field_names:
+                del serializer.fields[name]
+            continue
+        in_fields = field_names is not None and name in field_names
+        in_expand = expand_names is not None and name in expand_names
+        if (field_names is not None or expand_names is not None) and not (in_fields or in_expand):
+            del serializer.fields[name]
+            continue
+        # ?fields=watchlist without sub fields returns every field of the movies
+        child_fields = field_names[name] or None if in_fields else None
+        child_expand = expand_names.get(name, ()) if expand_names is not None else ()
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        select_fields(child, child_fields, child_expand, path=f'{path}{name}.')
+
+
+class SelectableFieldsMixin:
+    """ A serializer that takes fields= and expand= trees from get_selection() """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None or expand is not None:
+            select_fields(self, fields, expand)
+
+
+class FieldSelectionMixin:
+    """ ?fields= / ?expand= for a generic view, the serializer and the queryset follow the selection """
+
+    def get_field_selection(self):
+        # writes always use and return the full serializer
+        if self.request.method not in SAFE_METHODS:
+            return None, None
+        return get_selection(self.request)
+
+    def get_queryset(self):
+        fields, expand = self.get_field_selection()
+        return prefetch_for_serializer(super().get_queryset(), self.get_serializer_class(), fields, expand)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_field_selection()
+        if fields is not None or expand is not None:
+            kwargs.update(fields=fields, expand=expand)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,229 @@
+"""Per request query and timing instrumentation.
+
+InstrumentationMiddleware measures a sample of the requests: the number of
+queries and the time spent in the database, in serializers and in
+rendering the response. The numbers are sent back in a Server-Timing
+header, so they show up in the browser dev tools, and logged as one line
+on the 'watchlist.instrumentation' logger, with the numbers as extra
+fields of the record.
+
+Queries are grouped by their shape, the SQL with the parameters and the
+IN (...) lists collapsed. A shape repeated N_PLUS_ONE_THRESHOLD times in
+one request is the sign of a missing select_related / prefetch_related and
+is logged as a warning.
+
+The serializers of this app count their time with TimedSerializerMixin
+(and TimedListSerializer for many=True), the compiled serializer with
+timed('serializer'): other serializers, DRF's own or of other apps, are
+left alone.
+
+Requests that are not sampled only pay for one random() call, and every
+query and serializer for one context variable lookup.
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+logger = logging.getLogger('watchlist.instrumentation')
+
+DEFAULT_SETTINGS = {
+    'SAMPLE_RATE': 0.1,  # share of the requests that are measured
+    'SERVER_TIMING': True,  # send the Server-Timing header
+    'N_PLUS_ONE_THRESHOLD': 5,  # repetitions of a query shape that are logged as a N+1
+}
+
+_current = ContextVar('watchlist_instrumentation', default=None)
+
+# quoted strings, numbers and lists of placeholders, what changes between two runs of the same query
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'REQUEST_INSTRUMENTATION', {})}
+
+
+def query_shape(sql):
+    """ The query without its values, two queries with the same shape differ only by their parameters """
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    return _LISTS.sub('(...)', sql)
+
+
+class RequestTimings:
+    """ What is measured during one request, times in seconds """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.shapes = Counter()
+        # the outermost timer only, a serializer nested in another isn't counted twice
+        self.timing = set()
+
+    def repeated_queries(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serializer_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+@contextmanager
+def timed(name):
+    """ Add the time spent in the block to the <name>_time of the request, if it is measured """
+    timings = _current.get()
+    if timings is None or name in timings.timing:
+        yield
+        return
+    timings.timing.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, f'{name}_time', getattr(timings, f'{name}_time') + time.perf_counter() - start)
+        timings.timing.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    """ execute_wrapper installed on every connection """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_time += time.perf_counter() - start
+        timings.queries += 1
+        timings.shapes[query_shape(sql)] += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # connections are per thread, the queries of the async views run on another one than the request
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """ Add the time spent building .data to the serialize time of the measured request """
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """ The many=True of a timed serializer, set it as its Meta.list_serializer_class """
+
+
+_installed = False
+
+
+def install():
+    """ Hook the query wrapper on every connection, once per process """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(install_query_wrapper, dispatch_uid='watchlist_instrumentation')
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(None, connection)
+
+
+class InstrumentationMiddleware:
+    """ Measure a sample of the requests, put it first in MIDDLEWARE to measure all the others too """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.settings = get_settings()
+        install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        timings = RequestTimings()
+        # the context is copied into the threads of sync_to_async, their queries are counted too
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def sampled(self):
+        rate = self.settings['SAMPLE_RATE']
+        return rate >= 1 or random.random() < rate
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns and after this hook
+        timings = _current.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.render_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timings, total):
+        """ Report the timings of a measured request, streamed bodies are only measured to the first byte """
+        if self.settings['SERVER_TIMING']:
+            response['Server-Timing'] = timings.server_timing(total)
+
+        # the same numbers as fields, for the JSON lines of the production logging (watchmate.log)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 1),
+            'queries': timings.queries,
+            'db_ms': round(timings.db_time * 1000, 1),
+            'serialize_ms': round(timings.serializer_time * 1000, 1),
+            'render_ms': round(timings.render_time * 1000, 1),
+        }
+        logger.info('%s %s %s %.1fms queries=%d db=%.1fms serialize=%.1fms render=%.1fms',
+                    request.method, request.path, response.status_code, total * 1000, timings.queries,
+                    timings.db_time * 1000, timings.serializer_time * 1000, timings.render_time * 1000,
+                    extra=fields)
+        for shape, count in timings.repeated_queries(self.settings['N_PLUS_ONE_THRESHOLD']):
+            logger.warning('Possible N+1 on %s %s: %d queries like %s', request.method, request.path, count, shape,
+                           extra={'method': request.method, 'path': request.path, 'repeated': count, 'shape': shape})
+        return response
@@ -0,0 +1,152 @@
+"""Pagination classes for the watchlist api."""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class WatchListCursorPagination(BasePagination):
+    """ Keyset (cursor) pagination for the watchlist, newest first.
+
+    The cursor holds the (created, id) of the row at the edge of the page,
+    so the next page is a range scan on the (created, id) index instead of
+    an OFFSET that has to walk over every row of the earlier pages.
+    """
+    # the datetime column of the (<ordering_field>, id) keyset
+    ordering_field = 'created'
+    page_size = 20
+    max_page_size = 100
+    # ?page_size=50 lets the client pick the size, up to max_page_size
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.get_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """ paginate_queryset for async views, the page is read with the async ORM """
+        queryset = self.get_page_queryset(queryset, request)
+        return self.get_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """ Filter and order the queryset from the cursor, the result is not evaluated """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        position, self.reverse = self.decode_cursor(request)
+        self.position = position
+        field = self.ordering_field
+        if self.reverse:
+            # walk backwards from the cursor, then flip the rows back
+            queryset = queryset.order_by(field, 'id')
+            if position is not None:
+                created, pk = position
+                queryset = queryset.filter(Q(**{f'{field}__gt': created}) | Q(**{field: created, 'id__gt': pk}))
+        else:
+            # id breaks the tie between rows created at the same instant
+            queryset = queryset.order_by(f'-{field}', '-id')
+            if position is not None:
+                created, pk = position
+                queryset = queryset.filter(Q(**{f'{field}__lt': created}) | Q(**{field: created, 'id__lt': pk}))
+
+        # fetch one extra row to know if there is anything after this page
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, rows):
+        """ Trim the rows read from get_page_queryset to the page and find the links """
+        position = self.position
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if self.reverse:
+            rows.reverse()
+            has_previous, has_next = has_more, position is not None
+        else:
+            has_previous, has_next = position is not None, has_more
+
+        self.next_position = self.get_position(rows[-1]) if has_next and rows else None
+        self.previous_position = self.get_position(rows[0]) if has_previous and rows else None
+        return rows
+
+    def get_position(self, row):
+        return getattr(row, self.ordering_field), row.pk
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        """ Build the url of a page, the cursor is opaque for the client """
+        created, pk = position
+        payload = {'c': created.isoformat(), 'i': pk}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        """ Return ((created, id), reverse) from the request cursor """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            position = (datetime.fromisoformat(payload['c']), int(payload['i']))
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ReviewCursorPagination(WatchListCursorPagination):
+    """ The reviews of a movie, newest first, on the (watchlist, active, created_at) index """
+    ordering_field = 'created_at'
+
+
+class SearchPagination(PageNumberPagination):
+    """ Search results are ranked by score, so they are paged by number """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
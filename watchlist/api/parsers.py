@@ -0,0 +1,82 @@
+"""Parsers for the watchlist api.
+
+orjson and msgpack are optional, see watchlist.api.renderers: JSON falls
+back to the stdlib and a MessagePack body is refused with a 415 when msgpack
+isn't installed.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def loads(data):
+    """ json.loads with orjson when it's installed """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ORJSONParser(JSONParser):
+    """ JSONParser with orjson, the bodies of the bulk endpoints can be large """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        # orjson only reads utf-8, and the strict constant handling is the stdlib's
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        if stream is None:
+            return None
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """ Newline delimited JSON, one item per line, parsed into a list """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return []
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        # read line by line, the body is never held as one string
+        for number, line in enumerate(iter(stream.readline, b''), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(loads(line.decode(encoding)))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {number} - {exc}')
+        return items
+
+
+class MessagePackParser(BaseParser):
+    """ application/msgpack, the same data as a JSON body """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise UnsupportedMediaType(media_type, detail='MessagePack is not supported by this server.')
+        if stream is None:
+            return None
+        try:
+            # raw=False: strings come back as str, like in JSON
+            return msgpack.unpackb(stream.read(), raw=False)
+        except ValueError as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
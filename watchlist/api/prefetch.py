@@ -0,0 +1,157 @@
+"""Plan select_related / prefetch_related from the fields of a serializer.
+
+Nested serializers read their related objects row by row, so listing
+platforms -> movies -> reviews -> reviewer runs a query for every row.
+The plan walks the serializer tree once and joins or prefetches every
+relation that it renders, so the query count stays fixed.
+
+With a field selection (see watchlist.api.fields) the plan only loads the
+relations that are rendered, and only() the columns that are read.
+
+A serializer can render values computed by the database: its
+get_annotations() returns {field source: expression}, the plan annotates
+the queryset with the ones that are rendered.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+# select_related: list of lookups joined in the same query
+# prefetch_related: list of (lookup, related model, plan of the related serializer, queryset hook)
+# where the hook is the get_prefetch_queryset() of a list serializer that only renders some of the rows
+# only: the model fields to load, None for all of them
+# annotations: {name: expression} of the rendered fields that aren't model fields
+PrefetchPlan = namedtuple('PrefetchPlan', ['select_related', 'prefetch_related', 'only', 'annotations'])
+
+
+def prefetch_for_serializer(queryset, serializer_class, fields=None, expand=None, required=()):
+    """ Return the queryset with the relations used by serializer_class loaded up front.
+
+    fields and expand are the selection passed to the serializer, required
+    are the fields the view reads itself (like the ordering of a cursor).
+    """
+    if fields is None and expand is None:
+        plan = get_prefetch_plan(serializer_class)
+    else:
+        plan = get_selection_plan(serializer_class, fields, expand)
+    if plan.only is not None and required:
+        plan = plan._replace(only=[*plan.only, *required])
+    return _apply_plan(queryset, plan)
+
+
+@lru_cache(maxsize=None)
+def get_prefetch_plan(serializer_class):
+    """ The plan only depends on the serializer class, so we build it once """
+    return _build_plan(serializer_class())
+
+
+@lru_cache(maxsize=256)
+def get_selection_plan(serializer_class, fields, expand):
+    """ The plan of a field selection, bounded because the selections come from the query string """
+    return _build_plan(serializer_class(fields=fields, expand=expand))
+
+
+def get_annotations(serializer):
+    """ The {name: expression} the serializer reads from an annotated queryset """
+    hook = getattr(serializer, 'get_annotations', None)
+    return hook() if hook is not None else {}
+
+
+def _build_plan(serializer):
+    model = serializer.Meta.model
+    select_related = []
+    prefetch_related = []
+    available = get_annotations(serializer)
+    annotations = {}
+    # the columns read by the fields, None once a field can read anything
+    only = {model._meta.pk.name}
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        # source '*' is the object itself (like the url of a hyperlinked serializer, it reads the pk)
+        if field.source == '*':
+            if not isinstance(field, serializers.HyperlinkedIdentityField):
+                only = None
+            continue
+        name = field.source_attrs[0]
+        if name in available:
+            annotations[name] = available[name]
+            continue
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # SerializerMethodField, properties, ...
+            only = None
+            continue
+        if model_field.concrete and only is not None:
+            only.add(name)
+        if not model_field.is_relation:
+            continue
+        to_many = model_field.one_to_many or model_field.many_to_many
+
+        if isinstance(field, serializers.BaseSerializer):
+            # nested serializer, we have to load what the child renders too
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(child, serializers.ModelSerializer):
+                related_model = child.Meta.model
+                child_plan = _build_plan(child)
+            else:
+                related_model = model_field.related_model
+                child_plan = PrefetchPlan([], [], None, {})
+
+            if to_many:
+                if model_field.one_to_many and child_plan.only is not None:
+                    # the foreign key is how the prefetched rows find their parent
+                    child_plan = child_plan._replace(only=[*child_plan.only, model_field.field.name])
+                prefetch_related.append((name, related_model, child_plan,
+                                         getattr(field, 'get_prefetch_queryset', None)))
+            else:
+                if child_plan.annotations:
+                    raise ImproperlyConfigured(f"Can't annotate '{name}', the rows of a to-one relation are joined")
+                select_related.append(name)
+                # the columns of joined rows aren't restricted
+                only = None
+                select_related.extend(f'{name}__{lookup}' for lookup in child_plan.select_related)
+                prefetch_related.extend((f'{name}__{lookup}', *prefetch)
+                                        for lookup, *prefetch in child_plan.prefetch_related)
+
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch_related.append((name, model_field.related_model, PrefetchPlan([], [], None, {}), None))
+
+        elif isinstance(field, serializers.RelatedField):
+            # PrimaryKeyRelatedField only needs the <name>_id column of the row itself
+            if field.use_pk_only_optimization() and model_field.concrete:
+                continue
+            if to_many:
+                prefetch_related.append((name, model_field.related_model, PrefetchPlan([], [], None, {}), None))
+            else:
+                select_related.append(name)
+                only = None
+
+    # every column is read anyway, only() would just make the query longer
+    if only is not None and len(only) == len(model._meta.concrete_fields):
+        only = None
+    return PrefetchPlan(select_related, prefetch_related, sorted(only) if only is not None else None, annotations)
+
+
+def _apply_plan(queryset, plan):
+    if plan.only is not None:
+        queryset = queryset.only(*plan.only)
+    if plan.annotations:
+        queryset = queryset.annotate(**plan.annotations)
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    # Prefetch objects are built on every call, django mutates them while prefetching
+    prefetches = []
+    for lookup, related_model, related_plan, hook in plan.prefetch_related:
+        related = _apply_plan(related_model._default_manager.all(), related_plan)
+        if hook is not None:
+            related = hook(related)
+        prefetches.append(Prefetch(lookup, queryset=related))
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
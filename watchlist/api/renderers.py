@@ -0,0 +1,72 @@
+"""Fast renderers for the watchlist api.
+
+ORJSONRenderer writes the same JSON as DRF's JSONRenderer with orjson, the
+stdlib encoder is most of the render time of the large lists.
+MessagePackRenderer is picked with Accept: application/msgpack, it's smaller
+than JSON and faster to decode for the clients that support it.
+
+orjson and msgpack are optional: without orjson the JSON renderer falls back
+to JSONRenderer, MessagePackRenderer is only listed in the settings when
+msgpack is installed.
+
+render_json() is the JSON response of the views that don't go through DRF,
+the async views of both apps, with the same bytes as ORJSONRenderer.
+"""
+from django.http import HttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# types DRF's encoder knows and the fast encoders don't: Decimal, lazy strings, querysets, ...
+_encoder = encoders.JSONEncoder()
+
+
+def encode_default(obj):
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """ JSONRenderer with orjson, the output only differs in the spelling of some floats (1e16 for 1e+16) """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # orjson only knows compact output and an indent of 2, the other options stay with the stdlib
+        if (orjson is None or not api_settings.UNICODE_JSON or not api_settings.COMPACT_JSON
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # datetimes go through encode_default, DRF writes UTC as 'Z' where orjson writes '+00:00'
+        ret = orjson.dumps(data, default=encode_default,
+                           option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        # JSONRenderer escapes these two, they are valid json but not valid javascript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """ application/msgpack, the same data as the JSON output """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+def render_json(data, status=200):
+    """ An HttpResponse with the bytes the DRF views would send """
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type='application/json')
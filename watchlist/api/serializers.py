@@ -1,6 +1,13 @@
 """Serializers for the watchlist app."""
+from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
+from watchlist.api.fields import SelectableFieldsMixin
+from watchlist.api.instrumentation import TimedListSerializer, TimedSerializerMixin
+from watchlist.api.pagination import ReviewCursorPagination
 from watchlist.models import StreamPlatform, Review, WatchList
 
 
@@ -57,12 +64,36 @@ class ManualWatchListSerializer(serializers.Serializer):
 ############################################################################################################
 
 
+class ActiveListSerializer(TimedListSerializer):
+    """The active rows of a nested list, like the active reviews of a movie."""
+
+    def get_prefetch_queryset(self, queryset):
+        """ Called by the prefetch plan and the compiled serializer with the rows of all the parents """
+        return queryset.filter(active=True)
+
+    def to_representation(self, data):
+        """ The nested rows that were not prefetched through get_prefetch_queryset, like the reviews of a movie
+        in the response of its PUT, are filtered here. A top level list holds the rows the view picked. """
+        if self.parent is None:
+            return super().to_representation(data)
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        if isinstance(data, models.QuerySet):
+            # a prefetched queryset is already evaluated
+            if data._result_cache is None:
+                data = self.get_prefetch_queryset(data)
+        else:
+            # the rows without an active column were read from a filtered queryset
+            data = [row for row in data if row.__dict__.get('active', True)]
+        return super().to_representation(data)
+
+
 # each Stream has a list of movies -> many movies to one stream
 # each movie has one stream -> one stream to many movies
 # also each movie has a list of reviews -> many reviews to one movie
 # each review has one movie -> one movie to many reviews
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the review model."""
     reviewer = serializers.StringRelatedField(read_only=True)
 
@@ -74,10 +105,14 @@ class ReviewSerializer(serializers.ModelSerializer):
         # we can exclude the watchlist field
         # because we pass it automatically in the generic views
         exclude = ('watchlist',)
+        # the reviews nested in the movies
+        list_serializer_class = ActiveListSerializer
 
 
 # we can use ModelSerializer to create a serializer
-class WatchListSerializer(serializers.ModelSerializer):
+# SelectableFieldsMixin adds the fields= / expand= arguments (?fields= and ?expand= of the views)
+# TimedSerializerMixin counts the time of .data in the request instrumentation
+class WatchListSerializer(TimedSerializerMixin, SelectableFieldsMixin, serializers.ModelSerializer):
     # we can add extra fields to the serializer
     len_name = serializers.SerializerMethodField()
     len_description = serializers.SerializerMethodField()
@@ -85,8 +120,14 @@ class WatchListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WatchList
-        fields = '__all__'
-        # exclude = ('active',)
+        # fields = '__all__'
+        # the bookkeeping columns of the rating aggregate, the leaderboards and the conditional GETs stay internal
+        exclude = ('updated_at', 'rating_sum', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+                   'rating_4_count', 'rating_5_count', 'bayesian_rating')
+        # the rating aggregate is maintained by the review views
+        read_only_fields = ('avg_rating', 'number_rating')
+        # the movies nested in the platforms
+        list_serializer_class = ActiveListSerializer
 
     # The naming convention for the method should be get_fieldname
     def get_len_name(self, object):
@@ -110,7 +151,7 @@ class WatchListSerializer(serializers.ModelSerializer):
         return value
 
 
-class StreamPlatformSerializer(serializers.HyperlinkedModelSerializer):
+class StreamPlatformSerializer(TimedSerializerMixin, SelectableFieldsMixin, serializers.HyperlinkedModelSerializer):
     """Serializer for the stream platform model."""
     # watchlist is the name of related_name in the WatchList model
     watchlist = WatchListSerializer(many=True, read_only=True)
@@ -131,7 +172,9 @@ class StreamPlatformSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = StreamPlatform
-        fields = "__all__"
+        # fields = "__all__"
+        # updated_at is for the conditional GETs
+        exclude = ('updated_at',)
         # This is because we are using the HyperlinkedModelSerializer
         # and we need to specify the view name and the lookup field
         # we need to attach <appname>:<url-name> to the view_name
@@ -141,6 +184,7 @@ class StreamPlatformSerializer(serializers.HyperlinkedModelSerializer):
         extra_kwargs = {
             'url': {'view_name': 'watchlist:streamplatform-detail', 'lookup_field': 'pk'}
         }
+        list_serializer_class = TimedListSerializer
 
     def validateـabout(self, value):
         if len(value) > 500:
@@ -158,3 +202,121 @@ class StreamPlatformSerializer(serializers.HyperlinkedModelSerializer):
             raise serializers.ValidationError("name already exists")
 
         return value
+
+
+############################################################################################################
+############################################################################################################
+# Bounded reviews
+############################################################################################################
+# ?reviews=latest embeds the latest active reviews of each movie instead of all of them,
+# with the total count and a link to the paginated review feed of the movie
+
+LATEST_REVIEWS_PARAM = 'reviews'
+
+
+class LatestReviewsSerializer(ActiveListSerializer):
+    """The latest `limit` active reviews of a movie."""
+    limit = 5
+
+    def get_prefetch_queryset(self, queryset):
+        """ Called by the prefetch plan and the compiled serializer with the reviews of all the movies.
+
+        One query for every movie of the page: the rows are numbered per movie
+        and only the first `limit` of each are kept.
+        """
+        newest_first = (F('created_at').desc(), F('id').desc())
+        return (super().get_prefetch_queryset(queryset)
+                .annotate(latest_rank=Window(RowNumber(), partition_by=F('watchlist_id'), order_by=newest_first))
+                .filter(latest_rank__lte=self.limit)
+                .order_by(*newest_first))
+
+
+class WatchListLatestReviewsSerializer(WatchListSerializer):
+    """A movie with only its latest reviews."""
+    reviews = LatestReviewsSerializer(child=ReviewSerializer(), read_only=True)
+    # every active review of the movie, counted by the database (see get_annotations)
+    reviews_count = serializers.IntegerField(read_only=True)
+    reviews_url = serializers.SerializerMethodField()
+
+    def get_annotations(self):
+        """ Read by the prefetch plan and the compiled serializer, one correlated COUNT per movie """
+        active_reviews = (Review.active_objects.filter(watchlist=OuterRef('pk')).order_by().values('watchlist')
+                          .annotate(count=Count('id')).values('count'))
+        return {'reviews_count': Coalesce(Subquery(active_reviews), Value(0))}
+
+    def get_reviews_url(self, object):
+        # object.id, the compiled serializer passes rows that only have the columns
+        url = reverse('watchlist:review-list', kwargs={'watchlist_id': object.id},
+                      request=self.context.get('request'))
+        return f'{url}?page_size={ReviewCursorPagination.page_size}'
+
+
+class StreamPlatformLatestReviewsSerializer(StreamPlatformSerializer):
+    """A stream platform whose movies only have their latest reviews."""
+    watchlist = WatchListLatestReviewsSerializer(many=True, read_only=True)
+
+
+def latest_reviews(request):
+    """ True when the request asks for the bounded reviews """
+    # DRF requests have query_params, the async views get the plain django request
+    params = getattr(request, 'query_params', request.GET)
+    return params.get(LATEST_REVIEWS_PARAM) == 'latest'
+
+
+def watchlist_serializer_class(request):
+    return WatchListLatestReviewsSerializer if latest_reviews(request) else WatchListSerializer
+
+
+def streamplatform_serializer_class(request):
+    return StreamPlatformLatestReviewsSerializer if latest_reviews(request) else StreamPlatformSerializer
+
+
+############################################################################################################
+############################################################################################################
+# Bulk Serializers
+############################################################################################################
+# these validate one item of a bulk write without touching the database,
+# the lookups (platform exists, name is unique, ...) are done once for the whole batch in the view
+
+class WatchListBulkSerializer(serializers.ModelSerializer):
+    """One movie of a bulk write, with an id to update it."""
+    id = serializers.IntegerField(required=False)
+    # a plain integer, PrimaryKeyRelatedField would run a query per item
+    platform = serializers.IntegerField(source='platform_id')
+
+    class Meta:
+        model = WatchList
+        fields = ('id', 'title', 'storyline', 'active', 'platform')
+
+    def validate(self, data):
+        if data['title'] == data['storyline']:
+            raise serializers.ValidationError('Name and description must be different')
+        return data
+
+
+class StreamPlatformBulkSerializer(serializers.ModelSerializer):
+    """One stream platform of a bulk write, with an id to update it."""
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = StreamPlatform
+        fields = ('id', 'name', 'about', 'website')
+
+    def validate_name(self, value):
+        if len(value) < 2:
+            raise serializers.ValidationError('name is too short')
+        return value
+
+
+############################################################################################################
+############################################################################################################
+# Leaderboard Serializers
+############################################################################################################
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    """One ranked movie of a leaderboard, without the nested reviews."""
+
+    class Meta:
+        model = WatchList
+        fields = ('id', 'title', 'platform', 'avg_rating', 'number_rating', 'bayesian_rating')
+        read_only_fields = fields
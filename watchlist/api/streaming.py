@@ -0,0 +1,78 @@
+"""Streaming JSON responses for the large list endpoints.
+
+The normal list builds serializer.data for every row and renders it as one
+string. The streaming mode reads the rows a chunk at a time and writes the
+JSON array as it goes, so memory stays bounded by the chunk size.
+It's opt-in (?stream=true): the clients of the lists get the same response
+as before unless they ask.
+
+The body is produced after the view returned, when the middlewares are
+done: the rows are read in the context variables of the view (the replica
+of the request, see watchmate.replicas), not in the ones left after them.
+"""
+import contextvars
+
+from django.http import StreamingHttpResponse
+
+
+def iterate_in_chunks(queryset, chunk_size):
+    """ Yield the rows of the queryset in pk order, chunk_size rows per query.
+
+    MySQL drivers load the whole result of a query into memory, even with
+    iterator(), so we page on the primary key instead, which is bounded on
+    every backend. prefetch_related still works, once per chunk.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1].pk
+
+
+def _in_context(context, iterator):
+    """ Run every step of the iterator in context """
+    while True:
+        try:
+            yield context.run(next, iterator)
+        except StopIteration:
+            return
+
+
+class StreamingListMixin:
+    """ Adds the streaming mode to a list view, ?stream=true turns it on or off """
+    stream_by_default = False
+    stream_chunk_size = 500
+    stream_query_param = 'stream'
+
+    def wants_stream(self, request):
+        # the browsable api needs the whole data, we only stream json
+        if request.accepted_renderer.format != 'json':
+            return False
+        value = request.query_params.get(self.stream_query_param)
+        if value is None:
+            return self.stream_by_default
+        return value.lower() in ('1', 'true', 'yes')
+
+    def stream_list(self, queryset, serializer):
+        """ serializer is a single (not many) serializer, used for every row """
+        body = self._json_array(queryset, serializer, self.request.accepted_renderer)
+        return StreamingHttpResponse(_in_context(contextvars.copy_context(), body), content_type='application/json')
+
+    def _json_array(self, queryset, serializer, renderer):
+        # every row is rendered by the json renderer of the request, the same bytes as the normal list
+        yield b'['
+        buffer = []
+        separator = b''
+        for obj in iterate_in_chunks(queryset, self.stream_chunk_size):
+            buffer.append(separator + renderer.render(serializer.to_representation(obj)))
+            separator = b','
+            if len(buffer) >= self.stream_chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        if buffer:
+            yield b''.join(buffer)
+        yield b']'
@@ -45,6 +45,30 @@ from watchlist.api.views import (
     StreamPlatformMVVR
 )
 
+# bulk create / update
+from watchlist.api.views import (
+    WatchListBulkAV,
+    StreamPlatformBulkAV
+)
+
+# search
+from watchlist.api.views import WatchListSearchGNV
+
+# leaderboards
+from watchlist.api.views import (
+    TopRatedAV,
+    MostReviewedAV
+)
+
+# similar titles
+from watchlist.api.views import SimilarTitlesAV
+
+# export
+from watchlist.api.views import ExportAV
+
+# async views for ASGI
+from watchlist.api import async_views
+
 app_name = 'watchlist'
 
 # routers help us to create urls for our models by combining the urls
@@ -86,6 +110,31 @@ urlpatterns = [
     path('stream/', StreamPlatformAV.as_view(), name='streamplatform-list'),
     path('stream/<int:pk>/', StreamPlatformDetailAV.as_view(), name='streamplatform-detail'),
     ##################################################################################
+    # Bulk views
+    ##################################################################################
+    path('list/bulk/', WatchListBulkAV.as_view(), name='watchlist-bulk'),
+    path('stream/bulk/', StreamPlatformBulkAV.as_view(), name='streamplatform-bulk'),
+    ##################################################################################
+    # Search
+    ##################################################################################
+    path('list/search/', WatchListSearchGNV.as_view(), name='watchlist-search'),
+    ##################################################################################
+    # Leaderboards
+    ##################################################################################
+    path('list/top-rated/', TopRatedAV.as_view(), name='watchlist-top-rated'),
+    path('list/most-reviewed/', MostReviewedAV.as_view(), name='watchlist-most-reviewed'),
+    path('stream/<int:pk>/top-rated/', TopRatedAV.as_view(), name='streamplatform-top-rated'),
+    path('stream/<int:pk>/most-reviewed/', MostReviewedAV.as_view(), name='streamplatform-most-reviewed'),
+    ##################################################################################
+    # Similar titles
+    ##################################################################################
+    path('list/<int:pk>/similar/', SimilarTitlesAV.as_view(), name='watchlist-similar'),
+    ##################################################################################
+    # Export
+    ##################################################################################
+    # export/review.ndjson, export/watchlist.csv, ... admins only
+    path('export/<slug:model>.<slug:extension>', ExportAV.as_view(), name='export'),
+    ##################################################################################
     # Mixins views
     ##################################################################################
     path('stream/review/', ReviewListMXV.as_view(), name='review-list'),
@@ -98,5 +147,14 @@ urlpatterns = [
     path('stream/<int:watchlist_id>/review/', ReviewListGNV.as_view(), name='review-list'),
     # path('stream/<int:watchlist_id>/review/<int:pk>/', ReviewDetailGNV.as_view(), name='review-detail'),
     path('stream/review/<int:pk>/', ReviewDetailGNV.as_view(), name='review-detail'),
+    ##################################################################################
+    ##################################################################################
+    # async views, the same read endpoints served natively under ASGI
+    ##################################################################################
+    path('async/list/', async_views.watchlist_list, name='async-watchlist-list'),
+    path('async/list/<int:pk>/', async_views.watchlist_detail, name='async-watchlist-detail'),
+    path('async/stream/', async_views.streamplatform_list, name='async-streamplatform-list'),
+    path('async/stream/<int:pk>/', async_views.streamplatform_detail, name='async-streamplatform-detail'),
+    path('async/stream/<int:watchlist_id>/review/', async_views.review_list, name='async-review-list'),
 ]
 urlpatterns += router.urls
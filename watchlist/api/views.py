@@ -1,22 +1,49 @@
 """Views for the API."""
-from django.http import Http404
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import status, generics, viewsets, mixins
 from rest_framework.decorators import api_view
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from watchlist.api.bulk import BulkUpsertView
+from watchlist.api.cache import cache_response
+from watchlist.api.compiled import compile_serializer
+from watchlist.api.conditional import (
+    conditional_get,
+    review_detail_state,
+    review_list_state,
+    streamplatform_detail_state,
+    streamplatform_list_state,
+    watchlist_detail_state,
+    watchlist_list_state
+)
+from watchlist.api.fields import FieldSelectionMixin, get_selection
+from watchlist.api.pagination import ReviewCursorPagination, SearchPagination, WatchListCursorPagination
+from watchlist.api.prefetch import prefetch_for_serializer
 from watchlist.api.permissions import (
     AdminOrReadOnly,
     ReviewUserOrReadOnly
 )
+from watchlist.api.streaming import StreamingListMixin
 from watchlist.api.serializers import (WatchListSerializer,
                                        StreamPlatformSerializer,
                                        ReviewSerializer,
-                                       ManualWatchListSerializer)
-from watchlist.models import WatchList, StreamPlatform, Review
+                                       ManualWatchListSerializer,
+                                       WatchListBulkSerializer,
+                                       StreamPlatformBulkSerializer,
+                                       LeaderboardEntrySerializer,
+                                       WatchListLatestReviewsSerializer,
+                                       StreamPlatformLatestReviewsSerializer,
+                                       latest_reviews,
+                                       streamplatform_serializer_class,
+                                       watchlist_serializer_class)
+from watchlist.export import CONTENT_TYPES, EXPORT_MODELS, FORMATS, export_chunks, export_queryset, parse_bound
+from watchlist.models import WatchList, StreamPlatform, Review, SimilarTitle
+from watchlist.search import index_watchlists, search, uses_fulltext
 from django.http import JsonResponse
 from watchlist.models import WatchList
 
@@ -27,7 +54,7 @@ from watchlist.models import WatchList
 ############################################################################################################
 
 def watch_list_manual_serializer_deserializer(request):
-    movies = WatchList.objects.all()
+    movies = WatchList.active_objects.all()
     # all returns a queryset, so we need to convert it to a list
     print(movies.values('name', 'description'))
     data = {
@@ -37,7 +64,7 @@ def watch_list_manual_serializer_deserializer(request):
 
 
 def single_watch_list_manual_serializer_deserializer(request, movie_id):
-    movie = WatchList.objects.get(pk=movie_id)
+    movie = WatchList.active_objects.get(pk=movie_id)
     # get returns a single object, so we can access its attributes directly
     data = {
         'movie': {
@@ -49,7 +76,7 @@ def single_watch_list_manual_serializer_deserializer(request, movie_id):
 
 
 def watch_list_detail_manual_serializer_deserializer(request, movie_id):
-    movie = WatchList.objects.filter(pk=movie_id)
+    movie = WatchList.active_objects.filter(pk=movie_id)
     # filter returns a queryset, so we need to convert it to a list
     data = {
         'movie':
@@ -64,9 +91,10 @@ def watch_list_detail_manual_serializer_deserializer(request, movie_id):
 @api_view(['GET', 'POST'])
 def watch_list_using_serializer_class(request):
     if request.method == 'GET':
-        movies = WatchList.objects.all()
+        paginator = WatchListCursorPagination()
+        movies = paginator.paginate_queryset(WatchList.active_objects.all(), request)
         serializer = ManualWatchListSerializer(movies, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     if request.method == 'POST':
         serializer = ManualWatchListSerializer(data=request.data)
         if serializer.is_valid():
@@ -80,7 +108,7 @@ def watch_list_using_serializer_class(request):
 def single_watch_list_using_serializer_class(request, movie_id):
     if request.method == 'GET':
         try:
-            movie = WatchList.objects.get(pk=movie_id)
+            movie = WatchList.active_objects.get(pk=movie_id)
         except WatchList.DoesNotExist:
             return Response(data={'Error': 'Movie not found'},
                             status=status.HTTP_404_NOT_FOUND)
@@ -106,7 +134,7 @@ def single_watch_list_using_serializer_class(request, movie_id):
 
 
 def watch_list_detail_using_serializer_class(request, movie_id):
-    movie = WatchList.objects.filter(pk=movie_id)
+    movie = WatchList.active_objects.filter(pk=movie_id)
     # filter returns a queryset, so we need to convert it to a list
     serializer = ManualWatchListSerializer(movie, many=True)
     # if I will use JsonResponse i need to pass safe=False
@@ -121,14 +149,29 @@ def watch_list_detail_using_serializer_class(request, movie_id):
 ############################################################################################################
 # ApiViewClass
 ############################################################################################################
-class WatchListAV(APIView):
+class WatchListAV(StreamingListMixin, APIView):
     """List all movies with ApiViewClass."""
     permission_classes = [AdminOrReadOnly]
+    # APIView doesn't paginate by itself, so we call the paginator in get
+    pagination_class = WatchListCursorPagination
 
+    @conditional_get(watchlist_list_state)
     def get(self, request):
-        movies = WatchList.objects.all()
-        serializer = WatchListSerializer(movies, many=True)
-        return Response(serializer.data)
+        # ?fields= / ?expand= only load what is returned, the cursor reads the created column
+        fields, expand = get_selection(request)
+        # ?reviews=latest only embeds the latest reviews of each movie
+        serializer_class = watchlist_serializer_class(request)
+        # served by the (active, created, id) index
+        queryset = prefetch_for_serializer(WatchList.active_objects.all(), serializer_class, fields, expand,
+                                           required=('created',))
+        context = {'request': request}
+        # ?stream=true returns the whole catalog as one streamed array instead of a page
+        if self.wants_stream(request):
+            return self.stream_list(queryset, serializer_class(context=context, fields=fields, expand=expand))
+        paginator = self.pagination_class()
+        movies = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(movies, many=True, context=context, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = WatchListSerializer(data=request.data)
@@ -150,10 +193,20 @@ class WatchListDetailAV(APIView):
         except WatchList.DoesNotExist:
             raise Http404
 
+    @conditional_get(watchlist_detail_state)
+    @cache_response('watchlist:{pk}')
     def get(self, request, pk):
-        movie = self.get_object(pk)
-        serializer = WatchListSerializer(movie)
-        return Response(serializer.data)
+        # read only output, the compiled serializer gives the same data from .values() rows
+        serializer_class = watchlist_serializer_class(request)
+        data = compile_serializer(serializer_class, *get_selection(request)).serialize(
+            WatchList.active_objects.filter(pk=pk))
+        if not data:
+            raise Http404
+        movie = data[0]
+        # the compiled serializer has no request, so the link to the reviews is relative
+        if 'reviews_url' in movie:
+            movie['reviews_url'] = request.build_absolute_uri(movie['reviews_url'])
+        return Response(movie)
 
     def put(self, request, pk):
         movie = self.get_object(pk)
@@ -173,18 +226,29 @@ class StreamPlatformAV(APIView):
     """List all stream platforms."""
     permission_classes = [AdminOrReadOnly]
 
+    # the list embeds every platform, movie and review
+    @conditional_get(streamplatform_list_state)
+    @cache_response('streamplatform', 'watchlist', 'review')
     def get(self, request):
-        stream_platforms = StreamPlatform.objects.all()
+        # load the movies, their reviews and the reviewers in a fixed number of queries,
+        # or only the fields and relations asked with ?fields= / ?expand=
+        fields, expand = get_selection(request)
+        serializer_class = streamplatform_serializer_class(request)
+        stream_platforms = prefetch_for_serializer(StreamPlatform.objects.all(), serializer_class,
+                                                   fields, expand)
         # we add context={'request': request} to get the url of the related objects in the serializer
         # that if we use the HyperlinkedModelSerializer
-        serializer = StreamPlatformSerializer(stream_platforms,
-                                              many=True,
-                                              context={'request': request})
+        serializer = serializer_class(stream_platforms,
+                                      many=True,
+                                      context={'request': request},
+                                      fields=fields,
+                                      expand=expand)
 
         return Response(serializer.data)
 
     def post(self, request):
-        serializer = StreamPlatformSerializer(data=request.data)
+        serializer = StreamPlatformSerializer(data=request.data,
+                                              context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -202,14 +266,20 @@ class StreamPlatformDetailAV(APIView):
         except StreamPlatform.DoesNotExist:
             raise Http404
 
+    @conditional_get(streamplatform_detail_state)
+    @cache_response('streamplatform:{pk}')
     def get(self, request, pk):
-        platform = self.get_object(pk)
-        serializer = StreamPlatformSerializer(platform, context={'request': request})
+        fields, expand = get_selection(request)
+        serializer_class = streamplatform_serializer_class(request)
+        queryset = prefetch_for_serializer(StreamPlatform.objects.all(), serializer_class, fields, expand)
+        platform = get_object_or_404(queryset, pk=pk)
+        serializer = serializer_class(platform, context={'request': request}, fields=fields, expand=expand)
         return Response(serializer.data)
 
     def put(self, request, pk):
         platform = self.get_object(pk)
-        serializer = StreamPlatformSerializer(platform, data=request.data)
+        serializer = StreamPlatformSerializer(platform, data=request.data,
+                                              context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -226,7 +296,44 @@ class StreamPlatformDetailAV(APIView):
 # Mixins
 ############################################################################################################
 
-class ReviewDetailMV(mixins.RetrieveModelMixin,
+def read_manager(request, model):
+    """ The active rows for the reads, every row for the writes: an inactive row can still be edited or deleted """
+    return model.active_objects if request.method in SAFE_METHODS else model.objects
+
+
+class ReviewRatingMixin:
+    """ Keep the rating aggregate of the movie in step with review edits and deletes """
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # lock the review so two edits of it can't both remove the same old rating
+            old_rating = Review.objects.select_for_update().values_list('rating', flat=True).get(
+                pk=serializer.instance.pk)
+            review = serializer.save()
+            if review.rating != old_rating:
+                WatchList.objects.filter(pk=review.watchlist_id).update_rating(added=review.rating,
+                                                                               removed=old_rating)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # delete() returns how many rows went away, 0 if someone else deleted it first
+            deleted, _ = Review.objects.filter(pk=instance.pk).delete()
+            if deleted:
+                WatchList.objects.filter(pk=instance.watchlist_id).update_rating(removed=instance.rating)
+
+
+class LatestReviewsMixin:
+    """ ?reviews=latest on the reads of a generic view, only the latest reviews of each movie are embedded """
+    latest_reviews_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.request.method in SAFE_METHODS and latest_reviews(self.request):
+            return self.latest_reviews_serializer_class
+        return super().get_serializer_class()
+
+
+class ReviewDetailMV(ReviewRatingMixin,
+                     mixins.RetrieveModelMixin,
                      mixins.UpdateModelMixin,
                      mixins.DestroyModelMixin,
                      generics.GenericAPIView):
@@ -238,6 +345,10 @@ class ReviewDetailMV(mixins.RetrieveModelMixin,
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
 
+    def get_queryset(self):
+        return read_manager(self.request, Review).all()
+
+    @conditional_get(review_detail_state)
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
 
@@ -248,19 +359,23 @@ class ReviewDetailMV(mixins.RetrieveModelMixin,
         return self.destroy(request, *args, **kwargs)
 
 
-class ReviewListMXV(mixins.ListModelMixin,
+class ReviewListMXV(StreamingListMixin,
+                    mixins.ListModelMixin,
                     mixins.CreateModelMixin,
                     generics.GenericAPIView):
     """List all reviews."""
     permission_classes = [AdminOrReadOnly]
 
-
     # These are attributes names and we can't change them
-    queryset = Review.objects.all()
+    queryset = prefetch_for_serializer(Review.active_objects.all(), ReviewSerializer)
     serializer_class = ReviewSerializer
 
+    @conditional_get(review_list_state)
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        if self.wants_stream(request):
+            return self.stream_list(self.filter_queryset(self.get_queryset()), self.get_serializer())
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(compile_serializer(ReviewSerializer).serialize(queryset))
 
     def post(self, request, *args, **kwargs):
         return self.create(request, *args, **kwargs)
@@ -302,37 +417,54 @@ class ReviewCreateGNV(generics.CreateAPIView):
     def perform_create(self, serializer):
         # the pk is the watchlist_id
         watchlist_id = self.kwargs['watchlist_id']
-        watchlist = WatchList.objects.get(pk=watchlist_id)
 
-        user = self.request.user
-        review_queryset = Review.objects.filter(watchlist=watchlist, reviewer=user)
-        if review_queryset.exists():
+        try:
+            with transaction.atomic():
+                # we need to pass the movie to the serializer to save it in the review model
+                # now we don't need to send the movie id and the reviewer id in the request
+                serializer.save(watchlist_id=watchlist_id, reviewer=self.request.user)
+                # the average is computed by the database in the same UPDATE,
+                # so concurrent reviews of the same movie don't lose each other
+                WatchList.objects.filter(pk=watchlist_id).update_rating(added=serializer.validated_data['rating'])
+        except IntegrityError:
+            # the insert broke the unique (watchlist, reviewer) constraint, or the movie doesn't exist;
+            # we only pay for this query on the error path
+            if not WatchList.objects.filter(pk=watchlist_id).exists():
+                raise Http404
             raise ValidationError('You have already reviewed this movie')
 
-        if watchlist.number_rating == 0:
-            # if the movie has no rating, we will set the rating to 5
-            watchlist.avg_rating = serializer.validated_data['rating']
-        else:
-            watchlist.avg_rating = (watchlist.avg_rating + serializer.validated_data['rating']) / 2
-        watchlist.number_rating = watchlist.number_rating + 1
-        watchlist.save()
-
-        # we need to pass the movie to the serializer to save it in the review model
-        # now we don't need to send the movie id and the reviewer id in the request
-        serializer.save(watchlist=watchlist, reviewer=user)
 
-
-class ReviewListGNV(generics.ListAPIView):
+class ReviewListGNV(StreamingListMixin, generics.ListAPIView):
     """List all reviews."""
     # ListCreate will give us the get and post methods
     permission_classes = [AdminOrReadOnly]
 
-    queryset = Review.objects.all()
+    queryset = Review.active_objects.all()
     serializer_class = ReviewSerializer
 
     def get_queryset(self):
         pk = self.kwargs['watchlist_id']
-        return Review.objects.filter(watchlist=pk)
+        # served by the (watchlist, active, created_at) index
+        return prefetch_for_serializer(Review.active_objects.filter(watchlist=pk), ReviewSerializer)
+
+    # ?cursor= / ?page_size= return one page of the reviews, newest first,
+    # this is the reviews_url of the movies listed with ?reviews=latest
+    pagination_class = ReviewCursorPagination
+
+    def wants_page(self, request):
+        paginator = self.pagination_class
+        return any(param in request.query_params
+                   for param in (paginator.cursor_query_param, paginator.page_size_query_param))
+
+    @conditional_get(review_list_state)
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.wants_page(request):
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        if self.wants_stream(request):
+            return self.stream_list(queryset, self.get_serializer())
+        return Response(compile_serializer(ReviewSerializer).serialize(queryset))
 
     # or
 
@@ -342,7 +474,7 @@ class ReviewListGNV(generics.ListAPIView):
     #     return Review.objects.all()
 
 
-class ReviewDetailGNV(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetailGNV(ReviewRatingMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a review."""
     permission_classes = [AdminOrReadOnly]
 
@@ -353,7 +485,39 @@ class ReviewDetailGNV(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         watch_list = self.kwargs['watchlist_id']
-        return Review.objects.filter(watchlist=watch_list)
+        # served by the (watchlist, active, created_at) index
+        return read_manager(self.request, Review).filter(watchlist=watch_list)
+
+
+class WatchListSearchGNV(LatestReviewsMixin, FieldSelectionMixin, generics.ListAPIView):
+    """Search the movies by title and storyline, best match first.
+
+    ?q= is the text to search, ?platform=<id> and ?active=true|false filter the results.
+    Only the active movies are searched, unless an admin asks for ?active=false.
+    """
+    permission_classes = [AdminOrReadOnly]
+    serializer_class = WatchListSerializer
+    latest_reviews_serializer_class = WatchListLatestReviewsSerializer
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+
+        queryset = WatchList.active_objects.all()
+        active = self.request.query_params.get('active')
+        if active is not None:
+            # the admins can search the inactive movies too
+            manager = WatchList.objects if self.request.user.is_staff else WatchList.active_objects
+            queryset = manager.filter(active=active.lower() in ('1', 'true', 'yes'))
+        platform = self.request.query_params.get('platform')
+        if platform is not None:
+            if not platform.isdigit():
+                raise ValidationError({'platform': 'A valid integer is required.'})
+            queryset = queryset.filter(platform_id=platform)
+        fields, expand = self.get_field_selection()
+        return prefetch_for_serializer(search(queryset, query), self.get_serializer_class(), fields, expand)
 
 
 ############################################################################################################
@@ -365,17 +529,25 @@ class StreamPlatformVSV(viewsets.ViewSet):
     """List all stream platforms."""
     permission_classes = [AdminOrReadOnly]
 
+    @conditional_get(streamplatform_list_state)
     def list(self, request):
-        queryset = StreamPlatform.objects.all()
-        serializer = StreamPlatformSerializer(queryset, many=True,
-                                              context={'request': request})
+        fields, expand = get_selection(request)
+        serializer_class = streamplatform_serializer_class(request)
+        queryset = prefetch_for_serializer(StreamPlatform.objects.all(), serializer_class, fields, expand)
+        serializer = serializer_class(queryset, many=True,
+                                      context={'request': request},
+                                      fields=fields, expand=expand)
         return Response(serializer.data)
 
+    @conditional_get(streamplatform_detail_state)
     def retrieve(self, request, pk=None):
-        queryset = StreamPlatform.objects.all()
+        fields, expand = get_selection(request)
+        serializer_class = streamplatform_serializer_class(request)
+        queryset = prefetch_for_serializer(StreamPlatform.objects.all(), serializer_class, fields, expand)
         platform = get_object_or_404(queryset, pk=pk)
-        serializer = StreamPlatformSerializer(platform,
-                                              context={'request': request})
+        serializer = serializer_class(platform,
+                                      context={'request': request},
+                                      fields=fields, expand=expand)
         return Response(serializer.data)
 
     def create(self, request):
@@ -405,17 +577,220 @@ class StreamPlatformVSV(viewsets.ViewSet):
 ############################################################################################################
 # model viewSet
 ############################################################################################################
-class StreamPlatformMVV(viewsets.ModelViewSet):
+class StreamPlatformMVV(LatestReviewsMixin, FieldSelectionMixin, viewsets.ModelViewSet):
     """List all stream platforms."""
     permission_classes = [AdminOrReadOnly]
 
+    # FieldSelectionMixin prefetches what the serializer renders
     queryset = StreamPlatform.objects.all()
     serializer_class = StreamPlatformSerializer
+    latest_reviews_serializer_class = StreamPlatformLatestReviewsSerializer
+
+    @conditional_get(streamplatform_list_state)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(streamplatform_detail_state)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
-class StreamPlatformMVVR(viewsets.ReadOnlyModelViewSet):
+class StreamPlatformMVVR(LatestReviewsMixin, FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
     """List all stream platforms."""
     permission_classes = [AdminOrReadOnly]
 
+    # FieldSelectionMixin prefetches what the serializer renders
     queryset = StreamPlatform.objects.all()
     serializer_class = StreamPlatformSerializer
+    latest_reviews_serializer_class = StreamPlatformLatestReviewsSerializer
+
+    @conditional_get(streamplatform_list_state)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(streamplatform_detail_state)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+############################################################################################################
+############################################################################################################
+# Bulk views
+############################################################################################################
+
+class WatchListBulkAV(BulkUpsertView):
+    """Create or update many movies, from a json list or ndjson."""
+    permission_classes = [AdminOrReadOnly]
+
+    model = WatchList
+    serializer_class = WatchListBulkSerializer
+    update_fields = ('title', 'storyline', 'active', 'platform')
+
+    def validate_batch(self, items):
+        platform_ids = {data['platform_id'] for _, data in items}
+        found = set(StreamPlatform.objects.filter(pk__in=platform_ids).values_list('pk', flat=True))
+        return {index: {'platform': [f'Invalid pk "{data["platform_id"]}" - object does not exist.']}
+                for index, data in items if data['platform_id'] not in found}
+
+    def after_write(self, objects):
+        if not uses_fulltext():
+            index_watchlists(objects)
+
+    def version_names(self, obj):
+        names = ['watchlist', f'streamplatform:{obj.platform_id}']
+        if obj.pk is not None:
+            names.append(f'watchlist:{obj.pk}')
+        return names
+
+
+class StreamPlatformBulkAV(BulkUpsertView):
+    """Create or update many stream platforms, from a json list or ndjson."""
+    permission_classes = [AdminOrReadOnly]
+
+    model = StreamPlatform
+    serializer_class = StreamPlatformBulkSerializer
+    update_fields = ('name', 'about', 'website')
+
+    def validate_batch(self, items):
+        errors = {}
+        # one query for every name of the batch, instead of an exists() per item
+        taken = dict(StreamPlatform.objects.filter(name__in={data['name'] for _, data in items})
+                     .values_list('name', 'pk'))
+        seen = set()
+        for index, data in items:
+            name = data['name']
+            owner = taken.get(name)
+            if (owner is not None and owner != data.get('id')) or name in seen:
+                errors[index] = {'name': ['name already exists']}
+            seen.add(name)
+        return errors
+
+    def version_names(self, obj):
+        names = ['streamplatform']
+        if obj.pk is not None:
+            names.append(f'streamplatform:{obj.pk}')
+        return names
+
+
+############################################################################################################
+############################################################################################################
+# Leaderboards
+############################################################################################################
+
+class WatchListLeaderboardAV(APIView):
+    """The top ?limit= active movies, globally or of one platform.
+
+    The ranking column is kept up to date by every review write (see WatchList.objects.update_rating),
+    and each leaderboard reads the first rows of its (platform, active, <column>, id) index.
+    """
+    permission_classes = [AdminOrReadOnly]
+
+    # the WatchList column the movies are ranked by, highest first
+    ranking = None
+    default_limit = 10
+    max_limit = 100
+
+    def get_limit(self, request):
+        value = request.query_params.get('limit')
+        if value is None:
+            return self.default_limit
+        if not value.isdigit() or int(value) < 1:
+            raise ValidationError({'limit': 'A positive integer is required.'})
+        return min(int(value), self.max_limit)
+
+    # every review write bumps 'review', every movie write 'watchlist'
+    @cache_response('watchlist', 'review')
+    def get(self, request, pk=None):
+        limit = self.get_limit(request)
+        queryset = WatchList.active_objects.filter(**{f'{self.ranking}__gt': 0})
+        if pk is not None:
+            queryset = queryset.filter(platform_id=pk)
+        queryset = queryset.order_by(f'-{self.ranking}', '-id')[:limit]
+        data = compile_serializer(LeaderboardEntrySerializer).serialize(queryset)
+        # the platform is only looked up when the leaderboard is empty
+        if not data and pk is not None and not StreamPlatform.objects.filter(pk=pk).exists():
+            raise Http404
+        for rank, entry in enumerate(data, start=1):
+            entry['rank'] = rank
+        return Response(data)
+
+
+class TopRatedAV(WatchListLeaderboardAV):
+    """Movies ranked by their bayesian average, so a few 5 star reviews don't top the list."""
+    ranking = 'bayesian_rating'
+
+
+class MostReviewedAV(WatchListLeaderboardAV):
+    """Movies ranked by their number of reviews."""
+    ranking = 'number_rating'
+
+
+############################################################################################################
+############################################################################################################
+# Similar titles
+############################################################################################################
+
+class SimilarTitlesAV(APIView):
+    """The active movies whose reviewers rated them like this one, most similar first.
+
+    The neighbours are computed offline by manage.py refresh_similar_titles (see watchlist.similarity),
+    a response reads the rows of the movie from the (watchlist, rank) index of SimilarTitle.
+    """
+    permission_classes = [AdminOrReadOnly]
+
+    # the fields of the similar movies, next to their rank and score
+    fields = ('id', 'title', 'platform', 'avg_rating', 'number_rating')
+
+    # every refresh bumps 'similar', every movie write 'watchlist', every review write 'review'
+    # (the ratings of the similar movies)
+    @cache_response('watchlist', 'review', 'similar')
+    def get(self, request, pk):
+        rows = (SimilarTitle.objects.filter(watchlist_id=pk, watchlist__active=True, similar__active=True)
+                .order_by('rank')
+                .values_list('score', *(f'similar__{name}' for name in self.fields)))
+        data = []
+        # the ranks of the inactive movies are skipped
+        for rank, (score, *values) in enumerate(rows, start=1):
+            data.append({**dict(zip(self.fields, values)), 'score': round(score, 4), 'rank': rank})
+        # the movie is only looked up when it has no similar titles
+        if not data and not WatchList.active_objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(data)
+
+
+############################################################################################################
+############################################################################################################
+# Export
+############################################################################################################
+
+class ExportAV(APIView):
+    """Stream every row of a model as NDJSON or CSV, for the admins.
+
+    /watch/export/review.ndjson?created_after=2024-01-01&created_before=2024-01-02&gzip=true,
+    the ranges are [after, before), on created_after / created_before and updated_after / updated_before.
+    """
+    permission_classes = [IsAdminUser]
+    bound_params = ('created_after', 'created_before', 'updated_after', 'updated_before')
+
+    def perform_content_negotiation(self, request, force=False):
+        # the export isn't rendered, an Accept: text/csv must not end in a 406
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, model, extension):
+        model_class = EXPORT_MODELS.get(model)
+        if model_class is None or extension not in FORMATS:
+            raise Http404
+        params = request.query_params
+        try:
+            bounds = {name: parse_bound(params[name]) for name in self.bound_params if params.get(name)}
+            queryset = export_queryset(model_class, **bounds)
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+
+        compress = params.get('gzip', '').lower() in ('1', 'true', 'yes')
+        filename = f'{model}.{extension}.gz' if compress else f'{model}.{extension}'
+        # the rows are read and encoded a chunk at a time while the response is sent
+        response = StreamingHttpResponse(export_chunks(queryset, extension, compress),
+                                         content_type='application/gzip' if compress else CONTENT_TYPES[extension])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,62 @@
+"""Synthetic data for the benchmark commands."""
+import random
+
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from watchlist.models import Review, StreamPlatform, WatchList
+from watchlist.search import index_watchlists, uses_fulltext
+
+WORDS = ('space war love city night river ghost king queen dark light road home last first '
+         'secret island storm winter summer dream story family friend hunter killer legend').split()
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate_data(platforms=5, movies=500, reviews=5000, users=100, seed=0):
+    """ Fill the database with a catalog of the given size, the same seed gives the same data.
+
+    Everything is written with bulk_create, then the rating aggregate and the
+    search index are built once for all the movies.
+    Returns a dict with the generated users and movies.
+    """
+    rng = random.Random(seed)
+    # each review needs its own (movie, user) pair
+    reviews = min(reviews, movies * users)
+
+    StreamPlatform.objects.bulk_create(
+        StreamPlatform(name=f'platform {i}', about=sentence(rng, 20), website=f'https://platform{i}.example.com')
+        for i in range(platforms))
+    platform_ids = list(StreamPlatform.objects.order_by('pk').values_list('pk', flat=True))
+
+    WatchList.objects.bulk_create(
+        (WatchList(title=sentence(rng, 3)[:50], storyline=sentence(rng, 40),
+                   active=rng.random() > 0.1, platform_id=rng.choice(platform_ids))
+         for _ in range(movies)),
+        batch_size=1000)
+    # fetched again, MySQL doesn't return the ids of a bulk insert
+    movie_list = list(WatchList.objects.order_by('pk'))
+
+    # unusable passwords are fast to create, only one user needs a real one for the login benchmark
+    User.objects.bulk_create(
+        (User(username=f'benchmark-{i}', email=f'benchmark-{i}@example.com', password='!') for i in range(users)),
+        batch_size=1000)
+    user_list = list(User.objects.filter(username__startswith='benchmark-').order_by('pk'))
+    user_list[0].set_password(BENCHMARK_PASSWORD)
+    user_list[0].save(update_fields=['password'])
+    Token.objects.bulk_create(Token(key=Token.generate_key(), user=user) for user in user_list)
+
+    Review.objects.bulk_create(
+        (Review(watchlist_id=movie_list[i % movies].pk, reviewer_id=user_list[i // movies].pk,
+                rating=rng.randint(1, 5), review=sentence(rng, 10), active=rng.random() > 0.1)
+         for i in range(reviews)),
+        batch_size=1000)
+
+    WatchList.objects.all().recompute_ratings()
+    if not uses_fulltext():
+        index_watchlists(movie_list)
+    return {'users': user_list, 'movies': movie_list}
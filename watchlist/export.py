@@ -0,0 +1,181 @@
+"""NDJSON / CSV export of the catalog and the reviews.
+
+Used by the export management command and the admin export endpoint, the
+import commands read the same files back with read_rows().
+The rows are read in keyset chunks on the primary key (like the streaming
+lists, see watchlist.api.streaming): MySQL drivers buffer the whole result
+of a query, even with iterator(), so chunks of pk ranges are the constant
+memory read on every backend. Each chunk is encoded, optionally gzipped,
+and handed out before the next one is read.
+
+A CSV text cell that starts like a formula (=, +, -, @) gets a leading
+quote, so a spreadsheet opening the export shows it as text instead of
+running it. read_rows() removes the quote.
+"""
+import csv
+import gzip
+import io
+import zlib
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from watchlist.api.parsers import loads
+from watchlist.api.renderers import ORJSONRenderer, encode_default
+from watchlist.models import Review, StreamPlatform, WatchList
+
+EXPORT_MODELS = {
+    'streamplatform': StreamPlatform,
+    'watchlist': WatchList,
+    'review': Review,
+}
+# the creation date of the rows, StreamPlatform doesn't have one
+CREATED_FIELDS = {
+    WatchList: 'created',
+    Review: 'created_at',
+}
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+DEFAULT_CHUNK_SIZE = 2000
+# the first characters spreadsheets read as a formula, tab and carriage return included
+CSV_QUOTED_PREFIXES = ('=', '+', '-', '@', '\t', '\r', "'")
+
+
+def export_columns(model):
+    """ The columns of the export, foreign keys are their <name>_id column """
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def parse_bound(value):
+    """ The datetime of an ISO date or datetime, a date is its midnight in the current timezone """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'"{value}" is not an ISO date or datetime')
+        moment = datetime.combine(day, time())
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(model, created_after=None, created_before=None, updated_after=None, updated_before=None):
+    """ The rows to export, the ranges are [after, before) so consecutive exports don't overlap """
+    queryset = model._default_manager.all()
+    if created_after is not None or created_before is not None:
+        created = CREATED_FIELDS.get(model)
+        if created is None:
+            raise ValueError(f'{model.__name__} has no creation date, filter it on the updated dates')
+        if created_after is not None:
+            queryset = queryset.filter(**{f'{created}__gte': created_after})
+        if created_before is not None:
+            queryset = queryset.filter(**{f'{created}__lt': created_before})
+    if updated_after is not None:
+        queryset = queryset.filter(updated_at__gte=updated_after)
+    if updated_before is not None:
+        queryset = queryset.filter(updated_at__lt=updated_before)
+    return queryset
+
+
+def iterate_rows(queryset, columns, chunk_size):
+    """ Yield lists of value tuples, chunk_size rows per query, in pk order """
+    pk_index = columns.index(queryset.model._meta.pk.attname)
+    queryset = queryset.order_by('pk').values_list(*columns)
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][pk_index]
+
+
+def csv_value(value):
+    # the same text as the json export: ISO dates with 'Z', lowercase booleans, empty for null
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return encode_default(value)
+    # a text starting with a quote is quoted too, so read_rows can always remove the first quote
+    if isinstance(value, str) and value.startswith(CSV_QUOTED_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_text(value):
+    """ The text of a CSV cell as it was exported, without the quote added by csv_value """
+    if isinstance(value, str) and value.startswith("'"):
+        return value[1:]
+    return value
+
+
+def encode_ndjson(columns, rows, renderer=ORJSONRenderer()):
+    return b''.join(renderer.render(dict(zip(columns, row))) + b'\n' for row in rows)
+
+
+def encode_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def export_chunks(queryset, file_format, compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Yield the export as bytes, one piece per chunk of rows, gzipped when compress is True """
+    columns = export_columns(queryset.model)
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31: with the gzip header
+
+    def pieces():
+        if file_format == 'csv':
+            yield encode_csv(columns, [columns])
+        encode = encode_csv if file_format == 'csv' else encode_ndjson
+        for rows in iterate_rows(queryset, columns, chunk_size):
+            yield encode(columns, rows)
+
+    for piece in pieces():
+        if compressor is None:
+            yield piece
+        elif compressed := compressor.compress(piece):
+            yield compressed
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def file_format_of(path):
+    """ 'csv' for a .csv or .csv.gz path, 'ndjson' otherwise """
+    return 'csv' if path.removesuffix('.gz').endswith('.csv') else 'ndjson'
+
+
+def open_text(path):
+    """ Open an export to read it as text, gunzipped when the path ends with .gz """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='', encoding='utf-8')
+    return open(path, newline='', encoding='utf-8')
+
+
+def read_rows(file, file_format):
+    """ Yield a dict per row of an open file, read line by line.
+
+    The values of a CSV file are the text of the cells, raises ValueError on an invalid NDJSON line.
+    """
+    if file_format == 'csv':
+        for row in csv.DictReader(file):
+            yield {column: csv_text(value) for column, value in row.items()}
+        return
+    for number, line in enumerate(file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except ValueError as exc:
+            raise ValueError(f'NDJSON parse error on line {number} - {exc}')
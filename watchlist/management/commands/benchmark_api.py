@@ -0,0 +1,293 @@
+"""Latency, throughput and query count of every route of the watchlist and user apis."""
+import json
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import resolve
+
+from user.api import urls as user_urls
+from watchlist.api import urls as watchlist_urls
+from watchlist.api.cache import get_backend
+from watchlist.benchmark import BENCHMARK_PASSWORD, generate_data
+from watchlist.models import Review, WatchList
+from watchlist.similarity import refresh_similar_titles
+
+
+class Scenario:
+    """ One route to benchmark, build(i) returns the path and the client kwargs of the i-th request """
+
+    def __init__(self, method, build, max_requests=None):
+        self.method = method
+        self.build = build
+        # routes that hash a password or use up a token can't run as many requests
+        self.max_requests = max_requests
+
+
+# routes left out of the benchmark, written in the results with the reason
+BROKEN_ROUTES = {
+    route: 'broken upstream: ManualWatchListSerializer reads name and description, WatchList has '
+           'title and storyline, every request fails with a 500'
+    for route in ('watch/fbv-watchlist-list', 'watch/fbv-watchlist-detail/<int:movie_id>',
+                  'watch/fbv-watchlist-more-detail/<int:movie_id>')
+}
+
+
+def _join_route(prefix, pattern):
+    # the same join as ResolverMatch.route
+    return prefix + str(pattern.pattern).lstrip('^')
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every route of watchlist/api/urls.py and user/api/urls.py on a test database '
+            'filled with synthetic data, and write the results as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platforms', type=int, default=5)
+        parser.add_argument('--movies', type=int, default=500)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50, help='measured requests per route')
+        parser.add_argument('--warmup', type=int, default=3, help='requests per route before measuring')
+        parser.add_argument('--cold', action='store_true', help='clear the response cache before every request')
+        parser.add_argument('--output', default='benchmark.json', help='where to write the results')
+        parser.add_argument('--compare', help='results of a previous run to compare with')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Can't read {options['compare']}: {exc}")
+
+        # the benchmark runs on a test database, never on the configured one
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # like the test runner, the replicas read the test database
+        for alias in connections:
+            if connections[alias].settings_dict['TEST'].get('MIRROR') == connection.alias:
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            # a shared cache backend could hold responses of the real database
+            get_backend.cache_clear()
+            with override_settings(WATCHLIST_RESPONSE_CACHE={'BACKEND': 'watchlist.api.cache.LocMemLRUBackend',
+                                                             'OPTIONS': {}}):
+                results = self.run(options)
+            get_backend.cache_clear()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            self.compare(baseline, results)
+
+    def run(self, options):
+        counts = {key: options[key] for key in ('platforms', 'movies', 'reviews', 'users', 'seed')}
+        start = time.perf_counter()
+        data = generate_data(**counts)
+        self.stdout.write(f'Generated data in {time.perf_counter() - start:.1f}s')
+
+        scenarios = self.scenarios(data)
+        self.check_coverage(scenarios)
+
+        # a failing route is reported with its 500s, it doesn't stop the run
+        client = Client(raise_request_exception=False)
+        routes = {}
+        for name, scenario in scenarios.items():
+            requests, warmup = options['requests'], options['warmup']
+            if scenario.max_requests is not None:
+                warmup = min(warmup, scenario.max_requests // 5)
+                requests = min(requests, scenario.max_requests - warmup)
+            routes[name] = self.measure(client, scenario, warmup, requests, options['cold'])
+            result = routes[name]
+            self.stdout.write(f"{name:55} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                              f"{result['throughput_rps']:8.1f} req/s  {result['queries_mean']:5.1f} queries")
+
+        return {
+            'meta': {
+                'commit': self.git_commit(),
+                'created': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'data': counts,
+                'requests': options['requests'],
+                'cold': options['cold'],
+                'excluded': BROKEN_ROUTES,
+            },
+            'routes': routes,
+        }
+
+    def measure(self, client, scenario, warmup, requests, cold):
+        for i in range(warmup):
+            self.request(client, scenario, i)
+
+        latencies, queries, statuses = [], [], {}
+        started = time.perf_counter()
+        for i in range(warmup, warmup + requests):
+            if cold:
+                get_backend().clear()
+            with ExitStack() as stack:
+                # the queries of the primary and of the replicas
+                contexts = [stack.enter_context(CaptureQueriesContext(db)) for db in connections.all()]
+                start = time.perf_counter()
+                response = self.request(client, scenario, i)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(sum(len(context) for context in contexts))
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        elapsed = time.perf_counter() - started
+
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        else:
+            percentiles = latencies * 99
+        return {
+            'route': resolve(scenario.build(0)[0]).route,
+            'requests': len(latencies),
+            'status': statuses,
+            'errors': sum(count for status, count in statuses.items() if status.startswith('5')),
+            'mean_ms': statistics.fmean(latencies),
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+            'queries_mean': statistics.fmean(queries),
+            'queries_max': max(queries),
+        }
+
+    def request(self, client, scenario, i):
+        path, kwargs = scenario.build(i)
+        response = getattr(client, scenario.method)(path, **kwargs)
+        if response.streaming:
+            # the time to the last byte, not to the first one
+            b''.join(response.streaming_content)
+        return response
+
+    def scenarios(self, data):
+        users = data['users']
+        movie = data['movies'][0].pk
+        platform = data['movies'][0].platform_id
+        review = Review.objects.filter(watchlist_id=movie).values_list('pk', flat=True).first() or 0
+        # the similar titles are computed offline, once for the generated catalog
+        refresh_similar_titles(full=True)
+
+        admin = users[0]
+        admin.is_staff = True
+        admin.save(update_fields=['is_staff'])
+        tokens = [user.auth_token.key for user in users]
+        # a movie nobody reviewed yet, every request creates a review with another user
+        review_target = WatchList.objects.create(title='benchmark target', storyline='reviewed by the benchmark',
+                                                 platform_id=platform)
+
+        def get(path, **kwargs):
+            return Scenario('get', lambda i: (path, kwargs))
+
+        def as_admin():
+            return {'HTTP_AUTHORIZATION': f'Token {tokens[0]}'}
+
+        stream_names = iter(range(10 ** 9))
+        # ordered: the reads first, the writes can't change what the reads measure
+        return {
+            'GET /watch/list/': get('/watch/list/'),
+            'GET /watch/list/?stream=true': get('/watch/list/', data={'stream': 'true'}),
+            'GET /watch/list/?reviews=latest': get('/watch/list/', data={'reviews': 'latest'}),
+            'GET /watch/list/<pk>/': get(f'/watch/list/{movie}/'),
+            'GET /watch/list/search/': get('/watch/list/search/', data={'q': 'space dream'}),
+            'GET /watch/list/top-rated/': get('/watch/list/top-rated/'),
+            'GET /watch/list/most-reviewed/': get('/watch/list/most-reviewed/'),
+            'GET /watch/stream/<pk>/top-rated/': get(f'/watch/stream/{platform}/top-rated/'),
+            'GET /watch/stream/<pk>/most-reviewed/': get(f'/watch/stream/{platform}/most-reviewed/'),
+            'GET /watch/list/<pk>/similar/': get(f'/watch/list/{movie}/similar/'),
+            'GET /watch/stream/': get('/watch/stream/'),
+            'GET /watch/stream/?reviews=latest': get('/watch/stream/', data={'reviews': 'latest'}),
+            'GET /watch/stream/<pk>/': get(f'/watch/stream/{platform}/'),
+            'GET /watch/stream/review/': get('/watch/stream/review/'),
+            'GET /watch/stream/review/<pk>/': get(f'/watch/stream/review/{review}/'),
+            'GET /watch/stream/<watchlist_id>/review/': get(f'/watch/stream/{movie}/review/'),
+            'GET /watch/stream/<watchlist_id>/review/?page_size=20': get(f'/watch/stream/{movie}/review/',
+                                                                         data={'page_size': 20}),
+            'GET /watch/async/list/': get('/watch/async/list/'),
+            'GET /watch/async/list/<pk>/': get(f'/watch/async/list/{movie}/'),
+            'GET /watch/async/stream/': get('/watch/async/stream/'),
+            'GET /watch/async/stream/<pk>/': get(f'/watch/async/stream/{platform}/'),
+            'GET /watch/async/stream/<watchlist_id>/review/': get(f'/watch/async/stream/{movie}/review/'),
+            'GET /watch/': get('/watch/'),
+            'GET /watch/stream-viewset/': get('/watch/stream-viewset/'),
+            'GET /watch/stream-viewset/<pk>/': get(f'/watch/stream-viewset/{platform}/'),
+            'GET /watch/stream-modelviewset/': get('/watch/stream-modelviewset/'),
+            'GET /watch/stream-modelviewset/<pk>/': get(f'/watch/stream-modelviewset/{platform}/'),
+            'GET /watch/stream-read/': get('/watch/stream-read/'),
+            'GET /watch/stream-read/<pk>/': get(f'/watch/stream-read/{platform}/'),
+            'GET /watch/export/review.ndjson': get('/watch/export/review.ndjson', **as_admin()),
+            'POST /watch/list/bulk/': Scenario('post', lambda i: ('/watch/list/bulk/', {
+                'data': [{'title': f'bulk {i}', 'storyline': 'a benchmark movie', 'platform': platform}],
+                'content_type': 'application/json', **as_admin()})),
+            'POST /watch/stream/bulk/': Scenario('post', lambda i: ('/watch/stream/bulk/', {
+                'data': [{'name': f'bulk {next(stream_names)}', 'about': 'benchmark',
+                          'website': 'https://example.com'}],
+                'content_type': 'application/json', **as_admin()})),
+            'POST /watch/stream/<watchlist_id>/review-create/': Scenario('post', lambda i: (
+                f'/watch/stream/{review_target.pk}/review-create/',
+                {'data': {'rating': 1 + i % 5, 'review': 'benchmark'},
+                 'HTTP_AUTHORIZATION': f'Token {tokens[i % len(tokens)]}'}), max_requests=len(tokens)),
+            'POST /account/login/': Scenario('post', lambda i: (
+                '/account/login/', {'data': {'username': admin.username, 'password': BENCHMARK_PASSWORD}}),
+                max_requests=10),
+            'POST /account/register/': Scenario('post', lambda i: (
+                '/account/register/', {'data': {'username': f'registered-{i}', 'email': f'registered-{i}@example.com',
+                                                'password': BENCHMARK_PASSWORD, 'password2': BENCHMARK_PASSWORD}}),
+                max_requests=10),
+            'POST /account/async/register/': Scenario('post', lambda i: (
+                '/account/async/register/', {'data': {'username': f'async-registered-{i}',
+                                                      'email': f'async-registered-{i}@example.com',
+                                                      'password': BENCHMARK_PASSWORD,
+                                                      'password2': BENCHMARK_PASSWORD}}),
+                max_requests=10),
+            # last, every request deletes the token it uses
+            'POST /account/logout/': Scenario('post', lambda i: (
+                '/account/logout/', {'HTTP_AUTHORIZATION': f'Token {tokens[-1 - i]}'}),
+                max_requests=len(tokens) - 1),
+        }
+
+    def check_coverage(self, scenarios):
+        """ Warn about the routes of the two urlconfs that have no scenario and are not in BROKEN_ROUTES """
+        routes = {_join_route('watch/', pattern) for pattern in watchlist_urls.urlpatterns}
+        routes |= {_join_route('account/', pattern) for pattern in user_urls.urlpatterns}
+        routes -= set(BROKEN_ROUTES)
+        # the .json / .api variants of the router urls are the same views
+        routes = {route for route in routes if 'format' not in route}
+        covered = {resolve(scenario.build(0)[0]).route for scenario in scenarios.values()}
+        for route in sorted(routes - covered):
+            self.stderr.write(f'No benchmark for the route {route}')
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, baseline, results):
+        self.stdout.write(f"\nCompared with {baseline['meta'].get('commit')}:")
+        for name, result in results['routes'].items():
+            before = baseline['routes'].get(name)
+            if before is None:
+                self.stdout.write(f'{name:55} new')
+                continue
+            p50 = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+            p95 = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            queries = result['queries_mean'] - before['queries_mean']
+            self.stdout.write(f'{name:55} p50 {p50:+7.1f}%  p95 {p95:+7.1f}%  queries {queries:+6.1f}')
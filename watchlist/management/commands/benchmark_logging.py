@@ -0,0 +1,148 @@
+"""Compare the throughput of the logging profiles of settings.LOGGING_PROFILES."""
+import logging.config
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.log import DEFAULT_LOGGING, configure_logging
+
+from watchlist.benchmark import generate_data
+from watchlist.models import Review, WatchList
+
+logger = logging.getLogger('watchlist.instrumentation')
+
+
+class Rollback(Exception):
+    """ Raised to roll back the sample data """
+
+
+class SlowStream:
+    """ A file whose writes wait latency seconds, sleeping like a blocked write() it lets the other threads run """
+
+    def __init__(self, file, latency):
+        self.file = file
+        self.latency = latency
+
+    def write(self, text):
+        time.sleep(self.latency)
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+
+class Command(BaseCommand):
+    help = ('Run the queries of a movie detail page (the movie, its platform and its reviews) with every '
+            'logging profile of settings.LOGGING_PROFILES, with the SQL logging of DEBUG on, and report the '
+            'requests per second. The records are written to a file, like a log file or a pipe, and the time '
+            'the production listener needs to write what is queued at the end is reported apart.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='simulated requests per profile')
+        parser.add_argument('--repeat', type=int, default=3, help='runs per profile, the best one is reported')
+        parser.add_argument('--output', help='where the records are written, a temporary file by default')
+        parser.add_argument('--write-latency', type=float, default=0.0,
+                            help='seconds every write of a record waits, like a terminal or a pipe to a log '
+                                 'collector that is slower than the api')
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0 or options['repeat'] <= 0:
+            raise CommandError('--requests and --repeat must be positive')
+        if options['write_latency'] < 0:
+            raise CommandError('--write-latency must not be negative')
+        output = options['output'] or os.path.join(tempfile.gettempdir(), 'benchmark_logging.log')
+        results = {}
+        self.reset_logging()
+        try:
+            with transaction.atomic():
+                generate_data(platforms=2, movies=50, users=20, reviews=500)
+                movie_ids = list(WatchList.objects.values_list('pk', flat=True))
+                # the profiles take turns, a slower period of the machine doesn't fall on one of them
+                for _ in range(options['repeat']):
+                    for name, config in settings.LOGGING_PROFILES.items():
+                        result = self.run(config, movie_ids, options['requests'], output,
+                                          options['write_latency'])
+                        if name not in results or result[0] < results[name][0]:
+                            results[name] = result
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+
+        baseline = results.get('development', next(iter(results.values())))[0]
+        for name, (elapsed, drain, size) in results.items():
+            self.stdout.write(f"{name:<12} {options['requests'] / elapsed:8.0f} req/s  "
+                              f"{options['requests'] / (elapsed + drain):8.0f} req/s with the drain  "
+                              f'{size / 1024:9.1f} KiB of logs  {baseline / elapsed:5.1f}x')
+
+    def run(self, config, movie_ids, requests, output, write_latency):
+        """ (seconds of the requests, seconds to write the queued records, bytes written) """
+        with open(output, 'w') as file, self.debug_cursor():
+            stream = SlowStream(file, write_latency) if write_latency else file
+            with self.stderr_to(stream):
+                return self.measure(config, movie_ids, requests, output, file)
+
+    def measure(self, config, movie_ids, requests, output, file):
+        # like django.setup(), the stream of the handlers of DEFAULT_LOGGING is the file too
+        configure_logging('logging.config.dictConfig', config)
+        # the listener threads are started by the first record, out of the measure
+        logging.getLogger('django').warning('benchmark_logging: %s', output)
+        start = time.perf_counter()
+        for i in range(requests):
+            self.request(movie_ids[i % len(movie_ids)])
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        # the handlers are closed, the listener writes the records still queued before it stops
+        self.reset_logging()
+        drain = time.perf_counter() - start
+        file.flush()
+        return elapsed, drain, file.tell()
+
+    def reset_logging(self):
+        """ Close the handlers and undo the levels and filters of the profiles, the next one starts clean """
+        logging.config.dictConfig({'version': 1, 'disable_existing_loggers': False})
+        names = {name for config in [DEFAULT_LOGGING, *settings.LOGGING_PROFILES.values()]
+                 for name in config.get('loggers', {})}
+        for name in names:
+            profile_logger = logging.getLogger(name)
+            profile_logger.setLevel(logging.NOTSET)
+            profile_logger.filters.clear()
+            profile_logger.handlers.clear()
+            profile_logger.propagate = True
+        # dictConfig() closes the handlers of the root logger but leaves them on it
+        logging.root.handlers.clear()
+        logging.root.setLevel(logging.WARNING)
+
+    def request(self, movie_id):
+        """ The queries and the instrumentation record of GET /watch/list/<pk>/ """
+        start = time.perf_counter()
+        movie = WatchList.objects.select_related('platform').get(pk=movie_id)
+        reviews = list(Review.objects.filter(watchlist=movie).select_related('reviewer')[:20])
+        total = time.perf_counter() - start
+        logger.info('%s %s %s %.1fms queries=%d', 'GET', f'/watch/list/{movie_id}/', 200, total * 1000, 2,
+                    extra={'method': 'GET', 'path': f'/watch/list/{movie_id}/', 'status': 200,
+                           'duration_ms': round(total * 1000, 1), 'queries': 2, 'reviews': len(reviews)})
+
+    @contextmanager
+    def stderr_to(self, stream):
+        # the handlers write to ext://sys.stderr, resolved when they are configured
+        saved, sys.stderr = sys.stderr, stream
+        try:
+            yield
+        finally:
+            sys.stderr = saved
+
+    @contextmanager
+    def debug_cursor(self):
+        # django.db.backends only logs the queries with DEBUG on
+        saved, connection.force_debug_cursor = connection.force_debug_cursor, True
+        try:
+            yield
+        finally:
+            connection.force_debug_cursor = saved
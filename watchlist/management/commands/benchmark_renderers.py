@@ -0,0 +1,108 @@
+"""Compare DRF's JSONRenderer / JSONParser with the orjson and MessagePack ones."""
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from watchlist.api import parsers, renderers
+from watchlist.api.compiled import compile_serializer
+from watchlist.api.serializers import ReviewSerializer, StreamPlatformSerializer, WatchListSerializer
+from watchlist.benchmark import generate_data
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class Rollback(Exception):
+    """ Raised to roll back the sample data """
+
+
+class Command(BaseCommand):
+    help = ('Time the JSON renderer and parser of DRF against the orjson and MessagePack ones '
+            'on the payloads of the api, built from generated data that is rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platforms', type=int, default=5)
+        parser.add_argument('--movies', type=int, default=500)
+        parser.add_argument('--reviews-per-movie', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5, help='runs per renderer, the best one is reported')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError('orjson is not installed, ORJSONRenderer is JSONRenderer')
+        try:
+            with transaction.atomic():
+                generate_data(platforms=options['platforms'], movies=options['movies'],
+                              users=options['reviews_per_movie'],
+                              reviews=options['movies'] * options['reviews_per_movie'])
+                payloads = self.build_payloads()
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name, data in payloads.items():
+            self.compare_renderers(name, data, options['repeat'])
+        # the bulk endpoints parse the request body
+        bulk = [{'title': f'movie {i}', 'storyline': 'a movie of the bulk import', 'platform': 1, 'active': True}
+                for i in range(options['movies'])]
+        self.compare_parsers('bulk movies', bulk, options['repeat'])
+
+    def build_payloads(self):
+        """ The data of the list endpoints, as the views give it to the renderer """
+        movies = WatchList.objects.all()
+        return {
+            'movie page (20)': compile_serializer(WatchListSerializer).serialize(movies.order_by('-created')[:20]),
+            'movies': compile_serializer(WatchListSerializer).serialize(movies),
+            'reviews': compile_serializer(ReviewSerializer).serialize(Review.objects.all()),
+            # the nested tree, the hyperlinked serializer needs no request for a relative url
+            'platforms': StreamPlatformSerializer(StreamPlatform.objects.all(), many=True,
+                                                  context={'request': None}).data,
+        }
+
+    def compare_renderers(self, name, data, repeat):
+        candidates = [('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', renderers.ORJSONRenderer())]
+        if renderers.msgpack is not None:
+            candidates.append(('MessagePackRenderer', renderers.MessagePackRenderer()))
+
+        results = []
+        for label, renderer in candidates:
+            elapsed, body = self.best_of(lambda: renderer.render(data), repeat)
+            results.append((label, elapsed, body))
+        baseline_time, baseline = results[0][1], results[0][2]
+        if json.loads(results[1][2]) != json.loads(baseline):
+            raise CommandError(f'{name}: ORJSONRenderer gives different data')
+
+        self.stdout.write(f'{name} ({len(data)} items):')
+        for label, elapsed, body in results:
+            self.stdout.write(f'  {label:<20} {elapsed * 1000:8.2f} ms  {len(body) / 1024:9.1f} KiB  '
+                              f'{baseline_time / elapsed:5.1f}x')
+        if len(results) == 2:
+            self.stdout.write('  MessagePackRenderer  skipped, msgpack is not installed')
+
+    def compare_parsers(self, name, data, repeat):
+        body = JSONRenderer().render(data)
+        candidates = [('JSONParser', JSONParser(), body), ('ORJSONParser', parsers.ORJSONParser(), body)]
+        if parsers.msgpack is not None:
+            candidates.append(('MessagePackParser', parsers.MessagePackParser(),
+                               renderers.MessagePackRenderer().render(data)))
+
+        self.stdout.write(f'{name} ({len(data)} items):')
+        baseline_time = None
+        for label, parser, raw in candidates:
+            elapsed, parsed = self.best_of(lambda: parser.parse(io.BytesIO(raw), parser_context={}), repeat)
+            if parsed != data:
+                raise CommandError(f'{name}: {label} gives different data')
+            baseline_time = baseline_time or elapsed
+            self.stdout.write(f'  {label:<20} {elapsed * 1000:8.2f} ms  {len(raw) / 1024:9.1f} KiB  '
+                              f'{baseline_time / elapsed:5.1f}x')
+
+    def best_of(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
@@ -0,0 +1,65 @@
+"""Compare the DRF serializers with their compiled read-only version."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from watchlist.api.compiled import compile_serializer
+from watchlist.api.prefetch import prefetch_for_serializer
+from watchlist.api.serializers import ReviewSerializer, WatchListSerializer
+from watchlist.benchmark import generate_data
+from watchlist.models import Review, WatchList
+
+
+class Rollback(Exception):
+    """ Raised to roll back the sample data """
+
+
+class Command(BaseCommand):
+    help = ('Time WatchListSerializer and ReviewSerializer against the compiled serializers '
+            'on generated data, the data is rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=500)
+        parser.add_argument('--reviews-per-movie', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5, help='runs per serializer, the best one is reported')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                generate_data(platforms=1, movies=options['movies'], users=options['reviews_per_movie'],
+                              reviews=options['movies'] * options['reviews_per_movie'])
+                for serializer_class, model in ((WatchListSerializer, WatchList), (ReviewSerializer, Review)):
+                    self.compare(serializer_class, model.objects.all(), options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def compare(self, serializer_class, queryset, repeat):
+        renderer = JSONRenderer()
+        compiled = compile_serializer(serializer_class)
+
+        def drf():
+            return serializer_class(prefetch_for_serializer(queryset, serializer_class), many=True).data
+
+        def fast():
+            return compiled.serialize(queryset)
+
+        drf_time, drf_data = self.best_of(drf, repeat)
+        fast_time, fast_data = self.best_of(fast, repeat)
+        if renderer.render(drf_data) != renderer.render(fast_data):
+            raise CommandError(f'{serializer_class.__name__}: the compiled output is different')
+
+        self.stdout.write(f'{serializer_class.__name__} ({len(drf_data)} rows): '
+                          f'drf {drf_time * 1000:.1f} ms, compiled {fast_time * 1000:.1f} ms, '
+                          f'{drf_time / fast_time:.1f}x faster, same output')
+
+    def best_of(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
@@ -0,0 +1,55 @@
+"""Export the catalog or the reviews as NDJSON or CSV, in constant memory."""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from watchlist.export import (DEFAULT_CHUNK_SIZE, EXPORT_MODELS, FORMATS, export_chunks, export_queryset,
+                              file_format_of, parse_bound)
+
+
+class Command(BaseCommand):
+    help = ('Write every row of a model as NDJSON or CSV to a file or to stdout. The rows are read in chunks '
+            'on the primary key, so memory doesn\'t grow with the table. The date ranges are [after, before).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(EXPORT_MODELS))
+        parser.add_argument('--format', choices=FORMATS,
+                            help='ndjson by default, csv when the output ends with .csv or .csv.gz')
+        parser.add_argument('--output', default='-', help='the file to write, - for stdout')
+        parser.add_argument('--gzip', action='store_true',
+                            help='gzip the output, the default when the output ends with .gz')
+        parser.add_argument('--created-after', type=parse_bound)
+        parser.add_argument('--created-before', type=parse_bound)
+        parser.add_argument('--updated-after', type=parse_bound)
+        parser.add_argument('--updated-before', type=parse_bound)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows per query')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or file_format_of(output)
+        compress = options['gzip'] or output.endswith('.gz')
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+        try:
+            queryset = export_queryset(EXPORT_MODELS[options['model']],
+                                       created_after=options['created_after'],
+                                       created_before=options['created_before'],
+                                       updated_after=options['updated_after'],
+                                       updated_before=options['updated_before'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        start = time.perf_counter()
+        written = 0
+        file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for piece in export_chunks(queryset, file_format, compress, options['chunk_size']):
+                file.write(piece)
+                written += len(piece)
+        finally:
+            if file is not sys.stdout.buffer:
+                file.close()
+        # stderr, stdout can be the export itself
+        self.stderr.write(f"Exported {options['model']} as {file_format}{' (gzip)' if compress else ''}: "
+                          f'{written / 1024:.0f} KiB in {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,284 @@
+"""Load stream platforms, movies and reviews from NDJSON / CSV files, in bulk."""
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from watchlist.api.cache import bump_versions, local_bump_warning
+from watchlist.export import file_format_of, open_text, read_rows
+from watchlist.models import Review, StreamPlatform, WatchList
+from watchlist.search import index_watchlists, uses_fulltext
+
+# skipped rows reported one by one, per model, the others are only counted
+MAX_REPORTED = 20
+BOOLEANS = {'true': True, 't': True, '1': True, 'false': False, 'f': False, '0': False}
+
+
+def field_value(field, value):
+    """ The python value of a column, the values of a CSV file are text (see watchlist.export.csv_value) """
+    # a NULL of the export, clean() would reject it for the fields that are null but not blank (Review.review)
+    if value is None and field.null:
+        return None
+    if isinstance(value, str):
+        if value == '' and field.null:
+            return None
+        if isinstance(field, models.BooleanField):
+            value = BOOLEANS.get(value.lower(), value)
+    # the foreign keys are checked against the id maps, clean() would query them one by one
+    if field.is_relation:
+        return field.to_python(value)
+    return field.clean(value, None)
+
+
+@contextmanager
+def keep_dates(*model_classes):
+    """ Insert the dates of the files instead of now(): auto_now / auto_now_add are turned off meanwhile """
+    fields = [field for model in model_classes for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield [field.attname for field in fields]
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Load StreamPlatform, WatchList and Review rows from NDJSON or CSV files, like the ones written by '
+            'export_data, with bulk_create batches. The files keep their own ids: the foreign keys are mapped '
+            'to the rows created in the database through in-memory id maps. A platform whose name exists is '
+            'reused, reviews must point to an existing user id and duplicate reviews are skipped. '
+            'The ratings of the loaded movies, and of the existing movies that got reviews, are recomputed '
+            'once at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platforms', help='file of StreamPlatform rows')
+        parser.add_argument('--movies', help='file of WatchList rows')
+        parser.add_argument('--reviews', help='file of Review rows')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='the format of the files, by default from their extension (.csv, .ndjson, .gz)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='rows per INSERT and transaction')
+        parser.add_argument('--drop-indexes', action='store_true',
+                            help='drop the secondary indexes of the movies and reviews during the load '
+                                 'and build them once at the end')
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('platforms', 'movies', 'reviews')):
+            raise CommandError('Give at least one of --platforms, --movies and --reviews')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        self.options = options
+        # file id -> database id, the rows of the database map to themselves when there is no file
+        self.platform_ids = self.movie_ids = None
+        # existing movies that get new reviews
+        self.touched_movies = set()
+
+        start = time.perf_counter()
+        with self.dropped_indexes(options['drop_indexes']), \
+                keep_dates(StreamPlatform, WatchList, Review) as date_columns:
+            self.date_columns = date_columns
+            if options['platforms']:
+                self.platform_ids = self.load('platforms', StreamPlatform, self.platform_batch)
+            if options['movies']:
+                self.movie_ids = self.load('movies', WatchList, self.movie_batch)
+            if options['reviews']:
+                self.reviewer_ids = set(User.objects.values_list('pk', flat=True))
+                self.load('reviews', Review, self.review_batch)
+        self.reset_sequences()
+
+        step = time.perf_counter()
+        # set-based UPDATEs instead of the rating logic of every review, only for the movies the load changed
+        loaded_movies = set(self.movie_ids.values()) if options['movies'] else set()
+        # the loaded movies keep the updated_at of the file, the existing ones did change now
+        self.recompute_ratings(loaded_movies, touch=False)
+        self.recompute_ratings(self.touched_movies, touch=True)
+        self.stdout.write(f'Recomputed the ratings of {len(loaded_movies) + len(self.touched_movies)} movies '
+                          f'in {time.perf_counter() - step:.2f}s')
+
+        # bulk_create sends no signals, the cached responses are dropped here: the platforms nest their movies
+        # and the movies their reviews, so every platform that got a movie or a review is bumped
+        platforms = self.platforms_of(loaded_movies | self.touched_movies)
+        if self.platform_ids is not None:
+            platforms.update(self.platform_ids.values())
+        bump_versions(['streamplatform', 'watchlist', 'review',
+                       *(f'watchlist:{pk}' for pk in self.touched_movies),
+                       *(f'streamplatform:{pk}' for pk in platforms)])
+        if warning := local_bump_warning():
+            self.stderr.write(warning)
+        self.stdout.write(f'Done in {time.perf_counter() - start:.2f}s')
+
+    def platforms_of(self, movie_ids):
+        """ The platform ids of the movies, batch_size movies per query """
+        platforms = set()
+        movie_ids = iter(sorted(movie_ids))
+        while batch := list(islice(movie_ids, self.options['batch_size'])):
+            platforms.update(WatchList.objects.filter(pk__in=batch).values_list('platform_id', flat=True))
+        return platforms
+
+    def recompute_ratings(self, movie_ids, touch):
+        """ The rating aggregate of the movies, batch_size movies per UPDATE """
+        movie_ids = iter(sorted(movie_ids))
+        while batch := list(islice(movie_ids, self.options['batch_size'])):
+            WatchList.objects.filter(pk__in=batch).recompute_ratings(touch=touch)
+
+    def load(self, name, model, make_batch):
+        """ Read the file of the model in batches, make_batch(rows) returns (objects, id map, skipped rows) """
+        path = self.options[name]
+        file_format = self.options['format'] or file_format_of(path)
+        ids = {}
+        read = skipped = 0
+        start = time.perf_counter()
+        # the reviews that already exist are ignored by the INSERT, so the rows are counted
+        count_before = model.objects.count()
+        with open_text(path) as file:
+            rows = read_rows(file, file_format)
+            try:
+                while batch := list(islice(rows, self.options['batch_size'])):
+                    objects, batch_ids, batch_skipped = make_batch(batch)
+                    with transaction.atomic():
+                        # reviews can collide with existing ones on (watchlist, reviewer), they are skipped
+                        model.objects.bulk_create(objects, ignore_conflicts=model is Review)
+                        if model is WatchList and not uses_fulltext():
+                            index_watchlists(objects)
+                    ids.update(batch_ids)
+                    read += len(batch)
+                    for row, reason in batch_skipped:
+                        if skipped < MAX_REPORTED:
+                            self.stderr.write(f"Skipped {name} row {row.get('id')!r}: {reason}")
+                        skipped += 1
+            except ValueError as exc:
+                raise CommandError(f'{path}: {exc}')
+
+        elapsed = time.perf_counter() - start
+        created = model.objects.count() - count_before
+        self.stdout.write(f'{name}: {read} rows read, {created} inserted, {skipped} skipped in {elapsed:.2f}s '
+                          f'({read / elapsed if elapsed else 0:.0f} rows/s)')
+        return ids
+
+    def parse(self, model, row):
+        """ (id in the file, values of the other fields) of a row, unknown columns are ignored """
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        values = {}
+        for column, value in row.items():
+            field = fields.get(column)
+            if field is None:
+                continue
+            try:
+                values[column] = field_value(field, value)
+            except ValidationError as exc:
+                raise ValidationError(f"{column}: {' '.join(exc.messages)}")
+        for column in self.date_columns:
+            # a file without the dates gets the ones django would set
+            if column in fields and values.get(column) is None:
+                values[column] = timezone.now()
+        return values.pop('id', None), values
+
+    def next_ids(self, model, count):
+        """ Ids for the new rows, set on the objects so every backend knows them without reading them back.
+
+        The command expects to be the only writer of the table while it runs.
+        """
+        start = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        return iter(range(start, start + count))
+
+    def platform_batch(self, rows):
+        skipped, parsed = [], []
+        for row in rows:
+            try:
+                parsed.append((row, *self.parse(StreamPlatform, row)))
+            except ValidationError as exc:
+                skipped.append((row, exc.messages[0]))
+        existing = dict(StreamPlatform.objects.filter(name__in={values.get('name') for _, _, values in parsed})
+                        .values_list('name', 'pk'))
+        objects, ids = [], {}
+        new_ids = self.next_ids(StreamPlatform, len(parsed))
+        for row, source_id, values in parsed:
+            name = values.get('name')
+            if name in existing:
+                ids[source_id] = existing[name]
+                continue
+            platform = StreamPlatform(pk=next(new_ids), **values)
+            # the same name twice in the file is one platform
+            existing[name] = ids[source_id] = platform.pk
+            objects.append(platform)
+        return objects, ids, skipped
+
+    def movie_batch(self, rows):
+        skipped, objects, ids = [], [], {}
+        if self.platform_ids is None:
+            self.platform_ids = {pk: pk for pk in StreamPlatform.objects.values_list('pk', flat=True)}
+        new_ids = self.next_ids(WatchList, len(rows))
+        for row in rows:
+            try:
+                source_id, values = self.parse(WatchList, row)
+            except ValidationError as exc:
+                skipped.append((row, exc.messages[0]))
+                continue
+            platform_id = self.platform_ids.get(values.get('platform_id'))
+            if platform_id is None:
+                skipped.append((row, f"unknown platform {values.get('platform_id')}"))
+                continue
+            movie = WatchList(pk=next(new_ids), **{**values, 'platform_id': platform_id})
+            ids[source_id] = movie.pk
+            objects.append(movie)
+        return objects, ids, skipped
+
+    def review_batch(self, rows):
+        skipped, objects = [], []
+        existing_movies = not self.options['movies']
+        if self.movie_ids is None:
+            self.movie_ids = {pk: pk for pk in WatchList.objects.values_list('pk', flat=True)}
+        for row in rows:
+            try:
+                # the reviews aren't referenced by other rows, they get the ids of the database
+                _, values = self.parse(Review, row)
+            except ValidationError as exc:
+                skipped.append((row, exc.messages[0]))
+                continue
+            watchlist_id = self.movie_ids.get(values.get('watchlist_id'))
+            if watchlist_id is None:
+                skipped.append((row, f"unknown movie {values.get('watchlist_id')}"))
+                continue
+            if values.get('reviewer_id') not in self.reviewer_ids:
+                skipped.append((row, f"unknown user {values.get('reviewer_id')}"))
+                continue
+            if existing_movies:
+                self.touched_movies.add(watchlist_id)
+            objects.append(Review(**{**values, 'watchlist_id': watchlist_id}))
+        return objects, {}, skipped
+
+    @contextmanager
+    def dropped_indexes(self, drop):
+        """ Without the secondary indexes every INSERT is cheaper, they are built once at the end """
+        if not drop:
+            yield
+            return
+        indexes = [(model, index) for model in (WatchList, Review) for index in model._meta.indexes]
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        try:
+            yield
+        finally:
+            start = time.perf_counter()
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            self.stdout.write(f'Rebuilt {len(indexes)} indexes in {time.perf_counter() - start:.2f}s')
+
+    def reset_sequences(self):
+        """ The ids were set by the command, PostgreSQL sequences have to catch up (a no-op elsewhere) """
+        statements = connection.ops.sequence_reset_sql(no_style(), [StreamPlatform, WatchList])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -0,0 +1,34 @@
+"""Rebuild the rating aggregate and the leaderboard ranking of every movie."""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg
+
+from watchlist.api.cache import bump_versions, local_bump_warning
+from watchlist.models import DEFAULT_LEADERBOARD, Review, StreamPlatform, WatchList
+
+
+class Command(BaseCommand):
+    help = ('Recompute avg_rating, number_rating, the star counts and bayesian_rating of every movie '
+            'from its reviews, in one UPDATE. Run it after changing WATCHLIST_LEADERBOARD.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            updated = WatchList.objects.all().recompute_ratings()
+            # every movie, and every platform that embeds them, may have a new rating
+            names = ['watchlist', *(f'watchlist:{pk}' for pk in WatchList.objects.values_list('pk', flat=True)),
+                     *(f'streamplatform:{pk}' for pk in StreamPlatform.objects.values_list('pk', flat=True))]
+            transaction.on_commit(lambda: bump_versions(names))
+        self.stdout.write(f'Recomputed {updated} movies in {time.perf_counter() - start:.2f}s')
+        if warning := local_bump_warning():
+            self.stderr.write(warning)
+
+        # the prior of the bayesian average should be close to the mean of the catalog
+        mean = Review.objects.aggregate(mean=Avg('rating'))['mean']
+        config = {**DEFAULT_LEADERBOARD, **getattr(settings, 'WATCHLIST_LEADERBOARD', {})}
+        if mean is not None:
+            self.stdout.write(f"Mean rating of the reviews: {mean:.2f}, "
+                              f"WATCHLIST_LEADERBOARD['PRIOR_MEAN']: {config['PRIOR_MEAN']}")
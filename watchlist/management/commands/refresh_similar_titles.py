@@ -0,0 +1,27 @@
+"""Recompute the similar titles of the movies (watchlist.similarity)."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from watchlist.api.cache import local_bump_warning
+from watchlist.similarity import refresh_similar_titles, vectorized
+
+
+class Command(BaseCommand):
+    help = ('Recompute the SimilarTitle rows read by /watch/list/<pk>/similar/ from the ratings of the reviews. '
+            'By default only the movies moved by the changes since the last run are recomputed, run it '
+            'periodically. The first run, or one with --full, recomputes every movie.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='recompute every movie')
+        parser.add_argument('--pure-python', action='store_true',
+                            help='compute the scores without NumPy / SciPy, even when they are installed')
+
+    def handle(self, *args, **options):
+        use_numpy = vectorized() and not options['pure_python']
+        start = time.perf_counter()
+        movies, rows = refresh_similar_titles(full=options['full'], use_numpy=use_numpy)
+        self.stdout.write(f"Recomputed {movies} movies, {rows} similar titles in {time.perf_counter() - start:.2f}s "
+                          f"({'numpy' if use_numpy else 'pure python'})")
+        if warning := local_bump_warning():
+            self.stderr.write(warning)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist', '0003_watchlist_avg_rating_watchlist_number_rating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['created', 'id'], name='watchlist_created_id_idx'),
+        ),
+    ]
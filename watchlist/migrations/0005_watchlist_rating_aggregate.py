@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:37
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_aggregate(apps, schema_editor):
+    """ Fill the new aggregate from the existing reviews, this also fixes avg_rating """
+    WatchList = apps.get_model('watchlist', 'WatchList')
+    Review = apps.get_model('watchlist', 'Review')
+    stars = {f'rating_{n}_count': Count('id', filter=Q(rating=n)) for n in range(1, 6)}
+    totals = Review.objects.values('watchlist').annotate(number_rating=Count('id'),
+                                                         rating_sum=Sum('rating'),
+                                                         **stars)
+    # movies without reviews start from zero
+    WatchList.objects.update(avg_rating=0, number_rating=0)
+    for row in totals.order_by():
+        watchlist_id = row.pop('watchlist')
+        row['avg_rating'] = row['rating_sum'] / row['number_rating']
+        WatchList.objects.filter(pk=watchlist_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist', '0004_watchlist_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    """ Keep the first review of each (watchlist, reviewer), the unique constraint can't be added otherwise """
+    WatchList = apps.get_model('watchlist', 'WatchList')
+    Review = apps.get_model('watchlist', 'Review')
+    duplicates = (Review.objects.values('watchlist', 'reviewer').order_by()
+                  .annotate(first=Min('id'), count=Count('id')).filter(count__gt=1))
+    movies = set()
+    for row in duplicates:
+        Review.objects.filter(watchlist=row['watchlist'], reviewer=row['reviewer']).exclude(pk=row['first']).delete()
+        movies.add(row['watchlist'])
+
+    # the rating aggregate of those movies has to lose the deleted reviews
+    stars = {f'rating_{n}_count': Count('id', filter=Q(rating=n)) for n in range(1, 6)}
+    for watchlist_id in movies:
+        row = Review.objects.filter(watchlist=watchlist_id).aggregate(number_rating=Count('id'),
+                                                                      rating_sum=Sum('rating'), **stars)
+        row['avg_rating'] = row['rating_sum'] / row['number_rating']
+        WatchList.objects.filter(pk=watchlist_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist', '0006_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['watchlist', 'active', 'created_at'], name='review_watchlist_active_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('watchlist', 'reviewer'), name='review_unique_watchlist_reviewer'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:47
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# a copy of watchlist.search as of this migration, the app code can change after it
+TITLE_WEIGHT = 3
+STORYLINE_WEIGHT = 1
+MAX_TERM_LENGTH = 50
+TOKEN_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has he in is it its of on or that the to was were will with'.split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower())
+            if 1 < len(token) <= MAX_TERM_LENGTH and token not in STOP_WORDS]
+
+
+def index_watchlists(movies, SearchTerm):
+    entries = []
+    for movie in movies:
+        terms = Counter()
+        for token in tokenize(movie.title):
+            terms[token] += TITLE_WEIGHT
+        for token in tokenize(movie.storyline):
+            terms[token] += STORYLINE_WEIGHT
+        entries.extend(SearchTerm(term=term, weight=weight, watchlist_id=movie.pk) for term, weight in terms.items())
+    SearchTerm.objects.bulk_create(entries, batch_size=1000)
+
+
+def add_fulltext_index(apps, schema_editor):
+    """ MySQL searches with a FULLTEXT index, the other databases with the SearchTerm table """
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE watchlist_watchlist '
+                              'ADD FULLTEXT INDEX watchlist_fulltext_idx (title, storyline)')
+        return
+    WatchList = apps.get_model('watchlist', 'WatchList')
+    SearchTerm = apps.get_model('watchlist', 'SearchTerm')
+    movies = WatchList.objects.only('title', 'storyline').order_by('pk')
+    # a thousand movies at a time, the catalog can be big
+    for start in range(0, movies.count(), 1000):
+        index_watchlists(movies[start:start + 1000], SearchTerm)
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE watchlist_watchlist DROP INDEX watchlist_fulltext_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist', '0007_review_unique_and_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.PositiveIntegerField()),
+                ('watchlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='watchlist.watchlist')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'watchlist'), name='searchterm_unique_term_watchlist')],
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
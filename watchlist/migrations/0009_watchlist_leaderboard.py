@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+# a copy of watchlist.models.DEFAULT_LEADERBOARD as of this migration, the app code can change after it
+DEFAULT_LEADERBOARD = {
+    'MIN_VOTES': 10,
+    'PRIOR_MEAN': 3.0,
+}
+
+
+def backfill_bayesian_rating(apps, schema_editor):
+    """ Rank the existing movies from their rating aggregate, in one UPDATE """
+    WatchList = apps.get_model('watchlist', 'WatchList')
+    config = {**DEFAULT_LEADERBOARD, **getattr(settings, 'WATCHLIST_LEADERBOARD', {})}
+    min_votes, prior_mean = config['MIN_VOTES'], config['PRIOR_MEAN']
+    # (rating_sum + m * C) / (number_rating + m), 0 for a movie without reviews
+    WatchList.objects.update(bayesian_rating=Case(
+        When(number_rating__gt=0,
+             then=Cast(F('rating_sum') + Value(min_votes * prior_mean), FloatField()) / (F('number_rating') + min_votes)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist', '0008_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlist',
+            name='bayesian_rating',
+            field=models.FloatField(default=0),
+        ),
+        # before the indexes, so they are built once from the final values
+        migrations.RunPython(backfill_bayesian_rating, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['active', 'bayesian_rating', 'id'], name='watchlist_top_rated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['platform', 'active', 'bayesian_rating', 'id'], name='watchlist_plat_top_rated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['active', 'number_rating', 'id'], name='watchlist_most_reviewed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['platform', 'active', 'number_rating', 'id'], name='watchlist_plat_reviewed_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist', '0010_watchlist_active_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarTitle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='watchlist.watchlist')),
+                ('watchlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_titles', to='watchlist.watchlist')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('watchlist', 'rank'), name='similartitle_unique_watchlist_rank')],
+            },
+        ),
+    ]
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import Avg, Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now
+from django.db.models.lookups import GreaterThan
 
 
 class StreamPlatform(models.Model):
@@ -8,25 +12,152 @@ class StreamPlatform(models.Model):
     name = models.CharField(max_length=30)
     about = models.TextField()
     website = models.URLField()
+    # indexed, so the conditional GETs can read Max('updated_at') from the index
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
 
+DEFAULT_LEADERBOARD = {
+    # votes a movie needs before its own average outweighs the prior
+    'MIN_VOTES': 10,
+    # the rating of a movie without votes, about the mean rating of the catalog
+    'PRIOR_MEAN': 3.0,
+}
+
+
+def bayesian_rating(rating_sum, number_rating):
+    """ Expression of the bayesian average (sum + m * C) / (count + m), 0 for a movie without reviews.
+
+    rating_sum and number_rating are expressions, so the same formula serves
+    the incremental update_rating() and recompute_ratings().
+    """
+    config = {**DEFAULT_LEADERBOARD, **getattr(settings, 'WATCHLIST_LEADERBOARD', {})}
+    min_votes, prior_mean = config['MIN_VOTES'], config['PRIOR_MEAN']
+    return Case(
+        When(GreaterThan(number_rating, 0),
+             then=Cast(rating_sum + Value(min_votes * prior_mean), FloatField()) / (number_rating + min_votes)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+class WatchListQuerySet(models.QuerySet):
+
+    def update_rating(self, added=None, removed=None):
+        """ Move one review rating in and/or out of the running aggregate.
+
+        added is the rating of a new review, removed the rating of a deleted one,
+        and an edited review passes both. Everything is done in a single UPDATE,
+        so concurrent reviews of the same movie can't overwrite each other.
+        """
+        count_delta = (added is not None) - (removed is not None)
+        sum_delta = (added or 0) - (removed or 0)
+
+        # avg_rating and bayesian_rating have to be the first assignments: MySQL evaluates
+        # the SET list from left to right, so later assignments would already see the new sum
+        updates = {
+            'avg_rating': Case(
+                When(number_rating__lte=-count_delta, then=Value(0.0)),
+                default=Cast(F('rating_sum') + sum_delta, FloatField()) / (F('number_rating') + count_delta),
+                output_field=FloatField(),
+            ),
+            'bayesian_rating': bayesian_rating(F('rating_sum') + sum_delta, F('number_rating') + count_delta),
+            'rating_sum': F('rating_sum') + sum_delta,
+            'number_rating': F('number_rating') + count_delta,
+            # update() doesn't touch auto_now fields
+            'updated_at': Now(),
+        }
+        if added != removed:
+            if added is not None:
+                updates[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+            if removed is not None:
+                updates[f'rating_{removed}_count'] = F(f'rating_{removed}_count') - 1
+        return self.update(**updates)
+
+    def recompute_ratings(self, touch=True):
+        """ Rebuild the rating aggregate of the movies from their reviews.
+
+        One UPDATE with correlated subqueries for every movie of the queryset,
+        for loads that write reviews without going through update_rating().
+        touch=False keeps updated_at, like for movies loaded with the dates of a file.
+        """
+        reviews = Review.objects.filter(watchlist=OuterRef('pk')).order_by().values('watchlist')
+
+        def per_movie(aggregate, output_field, default, **filters):
+            subquery = reviews.filter(**filters).annotate(value=aggregate).values('value')
+            return Coalesce(Subquery(subquery, output_field=output_field), Value(default), output_field=output_field)
+
+        number_rating = per_movie(Count('id'), IntegerField(), 0)
+        rating_sum = per_movie(Sum('rating'), IntegerField(), 0)
+        updates = {
+            'avg_rating': per_movie(Avg('rating'), FloatField(), 0.0),
+            'bayesian_rating': bayesian_rating(rating_sum, number_rating),
+            'number_rating': number_rating,
+            'rating_sum': rating_sum,
+        }
+        if touch:
+            updates['updated_at'] = Now()
+        for star in range(1, 6):
+            updates[f'rating_{star}_count'] = per_movie(Count('id'), IntegerField(), 0, rating=star)
+        return self.update(**updates)
+
+
+class ActiveManager(models.Manager):
+    """ Only the active rows, what the public read views return """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(active=True)
+
+
 class WatchList(models.Model):
     """A movie."""
     title = models.CharField(max_length=50)
     storyline = models.TextField()
     active = models.BooleanField(default=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     avg_rating = models.FloatField(default=0)
     number_rating = models.IntegerField(default=0)
+    # running aggregate of the reviews, avg_rating = rating_sum / number_rating
+    # and rating_<n>_count is how many reviews gave n stars
+    rating_sum = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    # the rating the leaderboards rank by, see bayesian_rating()
+    bayesian_rating = models.FloatField(default=0)
     # each stream platform has many watchlist items
     # and each watchlist item has one stream platform
     platform = models.ForeignKey(StreamPlatform,
                                  on_delete=models.CASCADE,
                                  related_name='watchlist')
 
+    # every row, the default manager: the writes, the admin, the exports and the related managers
+    objects = WatchListQuerySet.as_manager()
+    # the movies the api lists
+    active_objects = ActiveManager.from_queryset(WatchListQuerySet)()
+
+    class Meta:
+        indexes = [
+            # keyset pagination walks the list in (created, id) order
+            models.Index(fields=['created', 'id'], name='watchlist_created_id_idx'),
+            # the same walk over the active movies only, the public list
+            models.Index(fields=['active', 'created', 'id'], name='watchlist_active_created_idx'),
+            # the active movies of the platforms, nested in the platform responses
+            models.Index(fields=['platform', 'active', 'created'], name='watchlist_plat_active_idx'),
+            # the leaderboards read the top k rows of these indexes, globally and per platform
+            models.Index(fields=['active', 'bayesian_rating', 'id'], name='watchlist_top_rated_idx'),
+            models.Index(fields=['platform', 'active', 'bayesian_rating', 'id'],
+                         name='watchlist_plat_top_rated_idx'),
+            models.Index(fields=['active', 'number_rating', 'id'], name='watchlist_most_reviewed_idx'),
+            models.Index(fields=['platform', 'active', 'number_rating', 'id'],
+                         name='watchlist_plat_reviewed_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.created.year})"
 
@@ -41,12 +172,71 @@ class Review(models.Model):
     active = models.BooleanField(default=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     # each review has one movie
     # and each movie has many reviews
     watchlist = models.ForeignKey(WatchList,
                                   on_delete=models.CASCADE,
                                   related_name='reviews')
 
+    objects = models.Manager()
+    # the reviews the api lists
+    active_objects = ActiveManager()
+
+    class Meta:
+        constraints = [
+            # one review per user and movie, enforced by the database so concurrent posts can't both win
+            models.UniqueConstraint(fields=['watchlist', 'reviewer'], name='review_unique_watchlist_reviewer'),
+        ]
+        indexes = [
+            # the reviews of a movie, filtered by active and ordered by date
+            models.Index(fields=['watchlist', 'active', 'created_at'], name='review_watchlist_active_idx'),
+        ]
+
     def __str__(self):
         return f"{self.watchlist.title} ({self.rating})"
+
+
+class SearchTerm(models.Model):
+    """One entry of the inverted index used to search movies when MySQL FULLTEXT isn't available."""
+    term = models.CharField(max_length=50)
+    # how much the term counts for the movie, a word in the title counts more than in the storyline
+    weight = models.PositiveIntegerField()
+    watchlist = models.ForeignKey(WatchList,
+                                  on_delete=models.CASCADE,
+                                  related_name='search_terms')
+
+    class Meta:
+        constraints = [
+            # (term, watchlist) is also the index a search reads
+            models.UniqueConstraint(fields=['term', 'watchlist'], name='searchterm_unique_term_watchlist'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.weight})"
+
+
+class SimilarTitle(models.Model):
+    """One of the movies most similar to a movie, from the ratings of their common reviewers.
+
+    The rows are computed offline by watchlist.similarity, rank 1 is the most similar.
+    """
+    watchlist = models.ForeignKey(WatchList,
+                                  on_delete=models.CASCADE,
+                                  related_name='similar_titles')
+    rank = models.PositiveSmallIntegerField()
+    similar = models.ForeignKey(WatchList,
+                                on_delete=models.CASCADE,
+                                related_name='similar_to')
+    score = models.FloatField()
+    # when the rows of the movie were computed, the next refresh starts from the latest one
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            # (watchlist, rank) is also the index /watch/list/<pk>/similar/ reads
+            models.UniqueConstraint(fields=['watchlist', 'rank'], name='similartitle_unique_watchlist_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.watchlist_id} -> {self.similar_id} ({self.score:.3f})"
@@ -0,0 +1,80 @@
+"""Full-text search over the title and storyline of the movies.
+
+On MySQL the search uses a FULLTEXT index (added by a migration). The other
+databases use our own inverted index, the SearchTerm table, which is
+updated for a movie every time it is saved (see watchlist.signals).
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.expressions import RawSQL
+
+from watchlist.models import SearchTerm
+
+TITLE_WEIGHT = 3
+STORYLINE_WEIGHT = 1
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+TOKEN_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has he in is it its of on or that the to was were will with'.split())
+
+
+def uses_fulltext():
+    """ True when the database has the FULLTEXT index """
+    return connection.vendor == 'mysql'
+
+
+def tokenize(text):
+    """ The lowercase words of the text, without stop words and one letter words """
+    return [token for token in TOKEN_RE.findall(text.lower())
+            if 1 < len(token) <= MAX_TERM_LENGTH and token not in STOP_WORDS]
+
+
+def index_terms(movie):
+    """ term -> weight of a movie """
+    weights = Counter()
+    for token in tokenize(movie.title):
+        weights[token] += TITLE_WEIGHT
+    for token in tokenize(movie.storyline):
+        weights[token] += STORYLINE_WEIGHT
+    return weights
+
+
+def index_watchlists(movies):
+    """ Replace the index entries of the movies, two queries whatever the number of movies """
+    movies = [movie for movie in movies if movie.pk is not None]
+    if not movies:
+        return
+    SearchTerm.objects.filter(watchlist__in=[movie.pk for movie in movies]).delete()
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(term=term, weight=weight, watchlist_id=movie.pk)
+         for movie in movies
+         for term, weight in index_terms(movie).items()],
+        batch_size=1000)
+
+
+def search(queryset, query):
+    """ The movies of the queryset matching the query, annotated with a score and best first """
+    if uses_fulltext():
+        score = RawSQL('MATCH (watchlist_watchlist.title, watchlist_watchlist.storyline) '
+                       'AGAINST (%s IN NATURAL LANGUAGE MODE)', (query,))
+        return queryset.annotate(score=score).filter(score__gt=0).order_by('-score', '-id')
+
+    terms = set(tokenize(query))
+    if not terms:
+        return queryset.none()
+    # rare terms count more than common ones (idf), the counts are one small query on the term index
+    total = max(queryset.model.objects.count(), 1)
+    frequencies = dict(SearchTerm.objects.filter(term__in=terms).values_list('term')
+                       .annotate(movies=Count('id')).order_by())
+    idf = [When(search_terms__term=term, then=F('search_terms__weight') * math.log(1 + total / movies))
+           for term, movies in frequencies.items()]
+    if not idf:
+        return queryset.none()
+    score = Sum(Case(*idf, default=0.0, output_field=FloatField()))
+    return (queryset.filter(search_terms__term__in=terms)
+            .annotate(score=score)
+            .order_by('-score', '-id'))
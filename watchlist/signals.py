@@ -0,0 +1,61 @@
+"""Signal receivers of the watchlist app."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from watchlist.api.cache import bump_versions
+from watchlist.models import Review, StreamPlatform, WatchList
+from watchlist.search import index_watchlists, uses_fulltext
+
+
+def bump_after_commit(names):
+    # bump once the data is visible to other connections, otherwise a request
+    # could cache the old rows under the new version before we commit
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver(post_save, sender=StreamPlatform)
+@receiver(post_delete, sender=StreamPlatform)
+def streamplatform_changed(sender, instance, **kwargs):
+    bump_after_commit(['streamplatform', f'streamplatform:{instance.pk}'])
+
+
+@receiver(pre_save, sender=WatchList)
+def watchlist_moving(sender, instance, **kwargs):
+    """ Remember the old platform, a movie moved to another platform changes both """
+    if instance.pk is None:
+        instance._old_platform_id = None
+    else:
+        instance._old_platform_id = WatchList.objects.filter(pk=instance.pk).values_list(
+            'platform_id', flat=True).first()
+
+
+@receiver(post_save, sender=WatchList)
+@receiver(post_delete, sender=WatchList)
+def watchlist_changed(sender, instance, **kwargs):
+    names = ['watchlist', f'watchlist:{instance.pk}', f'streamplatform:{instance.platform_id}']
+    old_platform_id = getattr(instance, '_old_platform_id', None)
+    if old_platform_id is not None and old_platform_id != instance.platform_id:
+        names.append(f'streamplatform:{old_platform_id}')
+    bump_after_commit(names)
+
+
+@receiver(post_save, sender=WatchList)
+def watchlist_search_index(sender, instance, update_fields=None, **kwargs):
+    """ Keep the search index of the movie up to date, deleting a movie cascades to its terms """
+    if uses_fulltext():
+        return
+    if update_fields is not None and not {'title', 'storyline'} & set(update_fields):
+        return
+    index_watchlists([instance])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    # the review is embedded in its movie, and the movie in its platform
+    platform_id = WatchList.objects.filter(pk=instance.watchlist_id).values_list('platform_id', flat=True).first()
+    names = ['review', f'watchlist:{instance.watchlist_id}']
+    if platform_id is not None:
+        names.append(f'streamplatform:{platform_id}')
+    bump_after_commit(names)
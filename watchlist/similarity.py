@@ -0,0 +1,208 @@
+"""Item-item "similar titles", computed offline from the ratings of the reviews.
+
+Every active review of an active movie is a (reviewer, movie, rating)
+triple. The ratings of a movie are centered on its mean, so a movie that
+everybody likes isn't close to every other one, and two movies are as
+similar as the cosine of their centered rating vectors, shrunk by
+n / (n + SHRINKAGE) where n is the number of reviewers they have in common:
+two reviewers are weak evidence. Only the movies with MIN_CO_RATINGS
+reviewers in common and a positive score are neighbours.
+
+The TOP_K neighbours of each movie are stored in the SimilarTitle table,
+/watch/list/<pk>/similar/ reads them from its (watchlist, rank) index.
+
+With NumPy and SciPy installed the scores are products of the sparse
+movies x reviewers matrix, without them the same sums are done in plain
+Python, which is much slower on a large catalog.
+
+refresh_similar_titles() only recomputes the movies a change can move: the
+movies edited or whose reviews changed since the last build, the movies
+that share a reviewer with them and the ones that list them as neighbours.
+The reviews deleted through the api touch their movie (see
+WatchList.objects.update_rating), the ones deleted with their user don't:
+those, and the lists a deleted movie was removed from by the foreign key,
+are only caught up by a full build.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from watchlist.api.cache import bump_versions
+from watchlist.models import Review, SimilarTitle, WatchList
+
+try:
+    import numpy as np
+    import scipy.sparse
+except ImportError:  # pragma: no cover
+    np = None
+
+DEFAULT_SIMILARITY = {
+    # neighbours kept per movie
+    'TOP_K': 20,
+    # reviewers two movies need in common to be neighbours
+    'MIN_CO_RATINGS': 2,
+    # the score is multiplied by n / (n + SHRINKAGE), n the reviewers in common
+    'SHRINKAGE': 10,
+}
+
+
+def get_config():
+    return {**DEFAULT_SIMILARITY, **getattr(settings, 'WATCHLIST_SIMILARITY', {})}
+
+
+def vectorized():
+    """ True when NumPy and SciPy are installed """
+    return np is not None
+
+
+def rated_reviews():
+    """ The reviews the scores are computed from """
+    return Review.active_objects.filter(watchlist__active=True).order_by()
+
+
+def movie_stats():
+    """ movie id -> (mean rating, norm of the centered ratings) of the movies with reviews, in one GROUP BY """
+    rows = (rated_reviews().values('watchlist_id')
+            .annotate(count=Count('id'), total=Sum('rating'), squares=Sum(F('rating') * F('rating')))
+            .values_list('watchlist_id', 'count', 'total', 'squares'))
+    stats = {}
+    for movie_id, count, total, squares in rows:
+        # sum((r - mean)^2) = (n * sum(r^2) - sum(r)^2) / n, exact in integers: 0 when every rating is the same
+        stats[movie_id] = (total / count, math.sqrt((count * squares - total * total) / count))
+    return stats
+
+
+def compute_neighbours(reviews, stats, targets, config, use_numpy=None):
+    """ [(movie, rank, similar movie, score)] of the target movies, rank 1 is the most similar.
+
+    reviews are (reviewer, movie, rating) triples: every review of the reviewers of the targets,
+    stats is movie_stats().
+    """
+    if use_numpy is None:
+        use_numpy = vectorized()
+    # a review written after movie_stats() ran waits for the next refresh
+    reviews = [review for review in reviews if review[1] in stats]
+    targets = sorted(target for target in targets if target in stats)
+    if not reviews or not targets:
+        return []
+    if use_numpy:
+        return _neighbours_numpy(reviews, stats, targets, config)
+    return _neighbours_python(reviews, stats, targets, config)
+
+
+def _neighbours_numpy(reviews, stats, targets, config):
+    reviewers, movies, ratings = (np.asarray(column) for column in zip(*reviews))
+    movie_ids, movie_index = np.unique(movies, return_inverse=True)
+    _, reviewer_index = np.unique(reviewers, return_inverse=True)
+    means = np.array([stats[movie_id][0] for movie_id in movie_ids.tolist()])
+    norms = np.array([stats[movie_id][1] for movie_id in movie_ids.tolist()])
+
+    shape = (len(movie_ids), reviewer_index.max() + 1)
+    centered = scipy.sparse.csr_matrix((ratings - means[movie_index], (movie_index, reviewer_index)), shape=shape)
+    rated = scipy.sparse.csr_matrix((np.ones(len(ratings)), (movie_index, reviewer_index)), shape=shape)
+
+    # the targets are rows of the matrices, the products give their scores against every movie
+    rows = np.searchsorted(movie_ids, targets)
+    dots = (centered[rows] @ centered.T).tocsr()
+    positive = dots > 0
+    # both on the pattern of the positive dot products, so their data arrays line up
+    dots = dots.multiply(positive).tocsr()
+    counts = (rated[rows] @ rated.T).multiply(positive).tocsr()
+    dots.sort_indices()
+    counts.sort_indices()
+
+    row = np.repeat(np.arange(len(rows)), np.diff(dots.indptr))
+    column = dots.indices
+    shared = counts.data
+    scores = dots.data / (norms[rows][row] * norms[column]) * shared / (shared + config['SHRINKAGE'])
+    keep = (shared >= config['MIN_CO_RATINGS']) & (column != rows[row])
+    row, column, scores = row[keep], column[keep], scores[keep]
+
+    # best first within every row, ties by movie id, then the first TOP_K of each row
+    order = np.lexsort((movie_ids[column], -scores, row))
+    row, column, scores = row[order], column[order], scores[order]
+    rank = np.arange(len(row)) - np.searchsorted(row, row)
+    keep = rank < config['TOP_K']
+    return list(zip(np.asarray(targets)[row[keep]].tolist(), (rank[keep] + 1).tolist(),
+                    movie_ids[column[keep]].tolist(), scores[keep].tolist()))
+
+
+def _neighbours_python(reviews, stats, targets, config):
+    by_movie, by_reviewer = defaultdict(list), defaultdict(list)
+    for reviewer, movie, rating in reviews:
+        value = rating - stats[movie][0]
+        by_movie[movie].append((reviewer, value))
+        by_reviewer[reviewer].append((movie, value))
+
+    neighbours = []
+    for movie in targets:
+        dots, counts = defaultdict(float), defaultdict(int)
+        for reviewer, value in by_movie[movie]:
+            for other, other_value in by_reviewer[reviewer]:
+                dots[other] += value * other_value
+                counts[other] += 1
+        scored = []
+        for other, dot in dots.items():
+            shared = counts[other]
+            if other == movie or dot <= 0 or shared < config['MIN_CO_RATINGS']:
+                continue
+            score = dot / (stats[movie][1] * stats[other][1]) * shared / (shared + config['SHRINKAGE'])
+            scored.append((-score, other))
+        scored.sort()
+        neighbours.extend((movie, rank, other, -score)
+                          for rank, (score, other) in enumerate(scored[:config['TOP_K']], start=1))
+    return neighbours
+
+
+def changed_movies(since):
+    """ The movies a refresh has to recompute for the changes made since the given time """
+    changed = set(WatchList.objects.filter(updated_at__gte=since).values_list('pk', flat=True))
+    # the rating aggregate of the movie is updated with its reviews, but not when a review is only deactivated
+    changed |= set(Review.objects.filter(updated_at__gte=since).values_list('watchlist_id', flat=True))
+    if not changed:
+        return changed
+    reviewers = Review.objects.filter(watchlist__in=changed).values('reviewer')
+    co_rated = rated_reviews().filter(reviewer__in=reviewers).values_list('watchlist_id', flat=True).distinct()
+    listing = SimilarTitle.objects.filter(similar__in=changed).values_list('watchlist_id', flat=True)
+    return changed | set(co_rated) | set(listing)
+
+
+def refresh_similar_titles(full=False, use_numpy=None):
+    """ Recompute the SimilarTitle rows, of every movie or of the ones moved by the changes since the last build.
+
+    The rows are stamped with the start of the build, the next refresh looks for the changes made since.
+    Returns (movies recomputed, rows written).
+    """
+    config = get_config()
+    started = timezone.now()
+    since = None if full else SimilarTitle.objects.aggregate(last=Max('computed_at'))['last']
+    stats = movie_stats()
+    reviews = rated_reviews()
+    if since is not None:
+        targets = changed_movies(since)
+        if not targets:
+            return 0, 0
+        # past half of the catalog, reading every review is cheaper than the IN lists
+        if len(targets) * 2 < len(stats):
+            reviews = reviews.filter(reviewer__in=Review.objects.filter(watchlist__in=targets).values('reviewer'))
+        else:
+            since = None
+    if since is None:
+        targets = set(stats)
+
+    rows = compute_neighbours(reviews.values_list('reviewer_id', 'watchlist_id', 'rating').iterator(),
+                              stats, targets, config, use_numpy)
+    with transaction.atomic():
+        # a full build also drops the rows of the movies without reviews anymore
+        stale = SimilarTitle.objects.all() if since is None else SimilarTitle.objects.filter(watchlist__in=targets)
+        stale.delete()
+        SimilarTitle.objects.bulk_create(
+            (SimilarTitle(watchlist_id=movie, rank=rank, similar_id=similar, score=score, computed_at=started)
+             for movie, rank, similar, score in rows),
+            batch_size=getattr(settings, 'WATCHLIST_BULK_BATCH_SIZE', 500))
+        transaction.on_commit(lambda: bump_versions(['similar']))
+    return len(targets), len(rows)
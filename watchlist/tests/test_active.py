@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class ActiveRowsTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='shown', storyline='story', platform=self.platform)
+        self.hidden = WatchList.objects.create(title='hidden', storyline='story', platform=self.platform,
+                                               active=False)
+        self.review = Review.objects.create(reviewer=User.objects.create(username='shown'), watchlist=self.movie,
+                                            rating=4, review='shown')
+        self.hidden_review = Review.objects.create(reviewer=User.objects.create(username='hidden'),
+                                                   watchlist=self.movie, rating=1, review='hidden', active=False)
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(f'watchlist:{name}', args=args), params)
+        return response.status_code, response.json() if response.status_code == 200 else None
+
+    def test_managers(self):
+        self.assertEqual(list(WatchList.active_objects.all()), [self.movie])
+        self.assertEqual(list(Review.active_objects.all()), [self.review])
+        self.assertEqual(WatchList.objects.count(), 2)
+        # the queryset methods are there on the active rows too
+        self.assertEqual(WatchList.active_objects.recompute_ratings(), 1)
+
+    def test_movies(self):
+        movies = self.get('watchlist-list')[1]
+        self.assertEqual([movie['title'] for movie in movies['results']], ['shown'])
+        self.assertEqual(self.get('watchlist-detail', self.hidden.pk)[0], 404)
+        platform = self.get('streamplatform-detail', self.platform.pk)[1]
+        self.assertEqual([movie['title'] for movie in platform['watchlist']], ['shown'])
+
+    def test_reviews(self):
+        reviews = self.get('review-list', self.movie.pk, stream='false')[1]
+        self.assertEqual([review['review'] for review in reviews], ['shown'])
+        self.assertEqual(self.get('review-detail', self.hidden_review.pk)[0], 404)
+        self.assertEqual(self.get('review-detail', self.review.pk)[0], 200)
+
+    def test_inactive_rows_can_still_be_edited(self):
+        url = reverse('watchlist:review-detail', args=[self.hidden_review.pk])
+        response = self.admin.put(url, {'rating': 2, 'review': 'edited', 'active': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get('review-detail', self.hidden_review.pk)[0], 200)
+        response = self.admin.put(reverse('watchlist:watchlist-detail', args=[self.hidden.pk]),
+                                  {'title': 'shown again', 'storyline': 'story', 'active': True,
+                                   'platform': self.platform.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get('watchlist-detail', self.hidden.pk)[1]['title'], 'shown again')
+        self.assertEqual(self.admin.delete(url).status_code, 204)
+
+    def test_write_responses_nest_only_the_active_rows(self):
+        # the nested rows of a saved instance are not prefetched
+        response = self.admin.put(reverse('watchlist:watchlist-detail', args=[self.movie.pk]),
+                                  {'title': 'shown', 'storyline': 'edited', 'active': True,
+                                   'platform': self.platform.pk})
+        self.assertEqual([review['review'] for review in response.json()['reviews']], ['shown'])
+        response = self.admin.put(reverse('watchlist:streamplatform-detail', args=[self.platform.pk]),
+                                  {'name': 'renamed', 'about': 'edited', 'website': 'https://a.example'})
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual([movie['title'] for movie in response.json()['watchlist']], ['shown'])
+        self.assertEqual([review['review'] for review in response.json()['watchlist'][0]['reviews']], ['shown'])
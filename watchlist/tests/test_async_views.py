@@ -0,0 +1,51 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        for index in range(3):
+            movie = WatchList.objects.create(title=f'movie {index}', storyline='story', platform=self.platform)
+            Review.objects.create(reviewer=User.objects.create(username=f'reviewer {index}'), watchlist=movie,
+                                  rating=index + 1, review=f'review {index}')
+        self.movie = movie
+
+    def assert_same(self, name, *args, **params):
+        """ The async view returns what the sync one does """
+        sync = self.client.get(reverse(f'watchlist:{name}', args=args), params)
+        native = self.client.get(reverse(f'watchlist:async-{name}', args=args), params)
+        self.assertEqual(native.status_code, sync.status_code)
+        # the page links point to the view that served the page
+        self.assertEqual(json.loads(native.content.decode().replace('/watch/async/', '/watch/')), sync.json())
+        return native.json()
+
+    def test_movies(self):
+        self.assertEqual(len(self.assert_same('watchlist-list')['results']), 3)
+        self.assert_same('watchlist-list', page_size=2, fields='title,reviews.rating')
+        self.assertEqual(self.assert_same('watchlist-detail', self.movie.pk)['title'], 'movie 2')
+        self.assert_same('watchlist-detail', self.movie.pk, reviews='latest')
+
+    def test_platforms(self):
+        self.assert_same('streamplatform-list')
+        self.assert_same('streamplatform-detail', self.platform.pk, expand='')
+
+    def test_next_page(self):
+        first = self.client.get(reverse('watchlist:async-watchlist-list'), {'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([movie['title'] for movie in first['results'] + second['results']],
+                         ['movie 2', 'movie 1', 'movie 0'])
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse('watchlist:async-watchlist-detail', args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('watchlist:async-watchlist-list'), {'fields': 'nope'}).status_code,
+                         400)
+        self.assertEqual(self.client.post(reverse('watchlist:async-watchlist-list')).status_code, 405)
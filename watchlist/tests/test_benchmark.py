@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+
+from watchlist.api.cache import get_backend
+from watchlist.benchmark import generate_data
+from watchlist.management.commands.benchmark_api import Command
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class GenerateDataTests(TestCase):
+
+    def catalog(self):
+        return (list(WatchList.objects.order_by('pk').values_list('title', 'storyline', 'active')),
+                list(Review.objects.order_by('pk').values_list('rating', 'review', 'active')))
+
+    def test_sizes(self):
+        data = generate_data(platforms=2, movies=10, reviews=1000, users=5, seed=1)
+        self.assertEqual((len(data['movies']), len(data['users'])), (10, 5))
+        self.assertEqual(StreamPlatform.objects.count(), 2)
+        # one review per (movie, user) pair at most
+        self.assertEqual(Review.objects.count(), 50)
+        self.assertTrue(data['users'][0].check_password('benchmark-password'))
+
+    def test_the_aggregate_is_built(self):
+        generate_data(platforms=1, movies=5, reviews=20, users=4)
+        for movie in WatchList.objects.all():
+            reviews = Review.objects.filter(watchlist=movie)
+            self.assertEqual(movie.number_rating, reviews.count())
+            self.assertEqual(movie.rating_sum, sum(review.rating for review in reviews))
+
+    def test_same_seed_same_data(self):
+        generate_data(platforms=2, movies=10, reviews=30, users=5, seed=7)
+        first = self.catalog()
+        for model in (Review, WatchList, StreamPlatform, User):
+            model.objects.all().delete()
+        generate_data(platforms=2, movies=10, reviews=30, users=5, seed=7)
+        self.assertEqual(self.catalog(), first)
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.stdout, self.stderr = StringIO(), StringIO()
+        self.command = Command(stdout=self.stdout, stderr=self.stderr)
+
+    def test_every_route_has_a_working_scenario(self):
+        scenarios = self.command.scenarios(generate_data(platforms=2, movies=10, reviews=30, users=10))
+        self.command.check_coverage(scenarios)
+        self.assertEqual(self.stderr.getvalue(), '')
+        client = Client(raise_request_exception=False)
+        for name, scenario in scenarios.items():
+            with self.subTest(name=name):
+                result = self.command.measure(client, scenario, warmup=0, requests=1, cold=False)
+                self.assertEqual(result['errors'], 0, result['status'])
+                self.assertEqual(result['requests'], 1)
+
+    def test_compare(self):
+        def results(p50, queries):
+            return {'meta': {'commit': 'abc'},
+                    'routes': {'GET /watch/list/': {'p50_ms': p50, 'p95_ms': p50 * 2, 'queries_mean': queries}}}
+
+        self.command.compare(results(10.0, 3), results(5.0, 2))
+        self.assertIn('Compared with abc', self.stdout.getvalue())
+        self.assertRegex(self.stdout.getvalue(), r'p50\s+-50\.0%\s+p95\s+-50\.0%\s+queries\s+-1\.0')
+        self.command.compare({'meta': {}, 'routes': {}}, results(5.0, 2))
+        self.assertRegex(self.stdout.getvalue(), r'GET /watch/list/\s+new')
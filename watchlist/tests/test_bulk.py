@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.views import WatchListBulkAV
+from watchlist.models import StreamPlatform, WatchList
+
+
+class BulkUpsertTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+
+    def without_returning_inserts(self):
+        # like MySQL, bulk_create leaves the pks unset
+        return mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                                 new_callable=mock.PropertyMock, return_value=False)
+
+    def movie(self, title, **extra):
+        return {'title': title, 'storyline': f'the story of {title}', 'platform': self.platform.pk, **extra}
+
+    def post(self, name, items):
+        return self.client.post(reverse(f'watchlist:{name}'), items, format='json')
+
+    def assert_created_ids(self, response):
+        self.assertEqual(response.status_code, 201)
+        for result in response.json():
+            movie = WatchList.objects.get(pk=result['id'])
+            self.assertEqual(movie.title, f"movie {result['index']}")
+
+    def test_created_and_updated_in_order(self):
+        existing = WatchList.objects.create(title='old', storyline='old story', platform=self.platform)
+        response = self.post('watchlist-bulk', [self.movie('new'), self.movie('renamed', id=existing.pk)])
+        self.assertEqual(response.status_code, 201)
+        created, updated = response.json()
+        self.assertEqual(created['status'], 'created')
+        self.assertEqual(WatchList.objects.get(pk=created['id']).title, 'new')
+        self.assertEqual(updated, {'index': 1, 'status': 'updated', 'id': existing.pk})
+        existing.refresh_from_db()
+        self.assertEqual(existing.title, 'renamed')
+
+    def test_ids_are_returned(self):
+        self.assert_created_ids(self.post('watchlist-bulk', [self.movie(f'movie {i}') for i in range(3)]))
+
+    def test_ids_are_allocated_when_the_insert_doesnt_return_them(self):
+        WatchList.objects.create(title='before', storyline='before', platform=self.platform)
+        with self.without_returning_inserts():
+            items = [self.movie(f'movie {i}') for i in range(3)]
+            # the same movie twice gets two ids, in the order of the request
+            items.append({**items[0]})
+            response = self.post('watchlist-bulk', items)
+        self.assertEqual(response.status_code, 201)
+        ids = [result['id'] for result in response.json()]
+        self.assertNotIn(None, ids)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 4)
+        for index, pk in enumerate(ids):
+            self.assertEqual(WatchList.objects.get(pk=pk).title, f'movie {index % 3}')
+
+    def test_platform_ids_are_allocated(self):
+        with self.without_returning_inserts():
+            response = self.post('streamplatform-bulk', [
+                {'name': name, 'about': 'about', 'website': 'https://b.example'} for name in ('bee', 'cat')])
+        self.assertEqual(response.status_code, 201)
+        for result, name in zip(response.json(), ('bee', 'cat')):
+            self.assertEqual(StreamPlatform.objects.get(pk=result['id']).name, name)
+
+    def test_an_id_taken_by_another_writer_is_not_reported(self):
+        allocate_ids = WatchListBulkAV.allocate_ids
+        taken = []
+
+        def concurrent_insert(view, objects):
+            allocate_ids(view, objects)
+            if not taken:
+                # another request inserts a movie with the same values and the first allocated id
+                taken.append(WatchList.objects.create(pk=objects[0].pk, platform=self.platform,
+                                                      title='movie 0', storyline='the story of movie 0'))
+
+        with self.without_returning_inserts(), \
+                mock.patch.object(WatchListBulkAV, 'allocate_ids', autospec=True, side_effect=concurrent_insert):
+            response = self.post('watchlist-bulk', [self.movie(f'movie {i}') for i in range(2)])
+        self.assert_created_ids(response)
+        self.assertNotIn(taken[0].pk, [result['id'] for result in response.json()])
+        self.assertEqual(WatchList.objects.filter(title='movie 0').count(), 2)
+
+    def test_invalid_items_are_reported_and_the_others_written(self):
+        taken = StreamPlatform.objects.create(name='taken', about='about', website='https://c.example')
+        StreamPlatform.objects.create(name='other', about='about', website='https://c.example')
+        response = self.post('streamplatform-bulk', [
+            {'name': 'other', 'about': 'about', 'website': 'https://d.example'},
+            {'name': 'fresh', 'about': 'about', 'website': 'https://d.example'},
+            {'name': 'fresh', 'about': 'about', 'website': 'https://d.example'},
+            {'id': 999999, 'name': 'missing', 'about': 'about', 'website': 'https://d.example'},
+            {'id': taken.pk, 'name': 'taken', 'about': 'new about', 'website': 'https://d.example'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        statuses = [result['status'] for result in response.json()]
+        self.assertEqual(statuses, ['error', 'created', 'error', 'error', 'updated'])
+        self.assertEqual(response.json()[3]['errors'], {'id': ['Not found.']})
+        self.assertEqual(StreamPlatform.objects.filter(name='fresh').count(), 1)
+
+    def test_unknown_platform(self):
+        response = self.post('watchlist-bulk', [self.movie('movie 0', platform=999999)])
+        self.assertEqual(response.status_code, 207)
+        self.assertIn('platform', response.json()[0]['errors'])
+        self.assertFalse(WatchList.objects.exists())
+
+    def test_readers_cant_write(self):
+        self.client.force_authenticate(User.objects.create(username='reader'))
+        self.assertEqual(self.post('watchlist-bulk', [self.movie('movie 0')]).status_code, 403)
@@ -0,0 +1,165 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from watchlist.api.cache import DjangoCacheBackend, LocMemLRUBackend, bump_versions, get_backend, get_versions
+from watchlist.models import StreamPlatform, WatchList
+from watchmate.replicas import PrimaryReplicaRouter, _replica
+
+
+class LocMemLRUBackendTests(TestCase):
+
+    def test_entries_expire_after_the_timeout(self):
+        backend = LocMemLRUBackend(timeout=10)
+        with mock.patch('watchlist.api.cache.time.monotonic', return_value=100):
+            backend.set('key', 'value')
+        with mock.patch('watchlist.api.cache.time.monotonic', return_value=110):
+            self.assertEqual(backend.get('key'), 'value')
+        with mock.patch('watchlist.api.cache.time.monotonic', return_value=111):
+            self.assertIsNone(backend.get('key'))
+            # an expired key can be added again
+            self.assertTrue(backend.add('key', 'new'))
+        self.assertEqual(backend._size, len(backend._data['key'][1]))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        backend = LocMemLRUBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertEqual(backend.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+    def test_values_are_copies(self):
+        backend = LocMemLRUBackend()
+        value = {'title': 'a'}
+        backend.set('key', value)
+        value['title'] = 'b'
+        backend.get('key')['title'] = 'c'
+        self.assertEqual(backend.get('key'), {'title': 'a'})
+
+    def test_not_shared(self):
+        self.assertFalse(LocMemLRUBackend.shared)
+
+
+class DefaultBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        get_backend.cache_clear()
+        self.addCleanup(get_backend.cache_clear)
+
+    def test_per_process_without_redis(self):
+        # no REDIS_URL here: nothing of the response cache goes to the database
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        backend = get_backend()
+        self.assertIsInstance(backend, LocMemLRUBackend)
+        self.assertFalse(backend.shared)
+        self.assertEqual(backend.timeout, 60)
+
+
+# a file based cache is shared by the processes like Redis, without a server
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                       'LOCATION': os.path.join(tempfile.gettempdir(), 'watchmate-test-cache')}},
+                   WATCHLIST_RESPONSE_CACHE={'BACKEND': 'watchlist.api.cache.DjangoCacheBackend',
+                                             'OPTIONS': {'alias': 'default'}})
+class SharedVersionsTests(TestCase):
+
+    def setUp(self):
+        get_backend.cache_clear()
+        self.addCleanup(get_backend.cache_clear)
+        caches['default'].clear()
+
+    def test_backend_is_shared(self):
+        backend = get_backend()
+        self.assertIsInstance(backend, DjangoCacheBackend)
+        self.assertTrue(backend.shared)
+
+    def test_commands_warn_about_a_per_process_backend(self):
+        stderr = StringIO()
+        call_command('refresh_similar_titles', stdout=StringIO(), stderr=stderr)
+        self.assertEqual(stderr.getvalue(), '')
+        get_backend.cache_clear()
+        with override_settings(WATCHLIST_RESPONSE_CACHE={'BACKEND': 'watchlist.api.cache.LocMemLRUBackend'}):
+            call_command('refresh_similar_titles', stdout=StringIO(), stderr=stderr)
+        self.assertIn('per process', stderr.getvalue())
+
+    def test_bump_of_another_process_is_seen(self):
+        # a management command bumps through its own backend instance, the workers read the same cache
+        before = get_versions(['watchlist'])
+        DjangoCacheBackend(alias='default').set('watchlist:version:watchlist', 'from another process')
+        self.assertNotEqual(get_versions(['watchlist']), before)
+        self.assertEqual(get_versions(['watchlist']), ['from another process'])
+
+    def test_stale_response_isnt_served_after_a_bump(self):
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://example.com')
+        movie = WatchList.objects.create(title='old title', storyline='storyline', platform=platform)
+        url = reverse('watchlist:watchlist-detail', kwargs={'pk': movie.pk})
+        self.assertEqual(self.client.get(url).json()['title'], 'old title')
+        # update() sends no signal, like a write of another process before its bump
+        WatchList.objects.filter(pk=movie.pk).update(title='new title')
+        self.assertEqual(self.client.get(url).json()['title'], 'old title')
+        bump_versions([f'watchlist:{movie.pk}'])
+        self.assertEqual(self.client.get(url).json()['title'], 'new title')
+
+
+@override_settings(DATABASE_REPLICAS={'ALIASES': ['replica_1']})
+class CacheRoutingTests(SimpleTestCase):
+    # outside of a transaction, a read in one always goes to the primary
+
+    def test_database_cache_is_read_from_the_primary(self):
+        router = PrimaryReplicaRouter()
+        token = _replica.set('replica_1')
+        try:
+            self.assertEqual(router.db_for_read(WatchList), 'replica_1')
+            self.assertEqual(router.db_for_read(DatabaseCache('cache', {}).cache_model_class), 'default')
+        finally:
+            _replica.reset(token)
+
+
+class SignalInvalidationTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://example.com')
+        self.movie = WatchList.objects.create(title='old title', storyline='storyline', platform=self.platform)
+
+    def titles(self):
+        detail = self.client.get(reverse('watchlist:watchlist-detail', kwargs={'pk': self.movie.pk})).json()
+        platform = self.client.get(reverse('watchlist:streamplatform-detail', kwargs={'pk': self.platform.pk})).json()
+        return detail['title'], [movie['title'] for movie in platform['watchlist']]
+
+    def test_saving_a_movie_refreshes_its_responses(self):
+        self.assertEqual(self.titles(), ('old title', ['old title']))
+        self.movie.title = 'new title'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.save()
+        self.assertEqual(self.titles(), ('new title', ['new title']))
+
+    def test_the_bump_waits_for_the_commit(self):
+        self.titles()
+        self.movie.title = 'new title'
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.movie.save()
+        # not committed yet: the versions are the old ones
+        self.assertEqual(self.titles(), ('old title', ['old title']))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.titles(), ('new title', ['new title']))
+
+    def test_moving_a_movie_refreshes_both_platforms(self):
+        other = StreamPlatform.objects.create(name='other', about='about', website='https://example.com')
+        url = reverse('watchlist:streamplatform-detail', kwargs={'pk': other.pk})
+        self.assertEqual(self.client.get(url).json()['watchlist'], [])
+        self.titles()
+        self.movie.platform = other
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.save()
+        self.assertEqual([movie['title'] for movie in self.client.get(url).json()['watchlist']], ['old title'])
+        self.assertEqual(self.titles()[1], [])
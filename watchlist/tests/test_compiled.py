@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from watchlist.api.compiled import compile_serializer
+from watchlist.api.fields import parse_tree
+from watchlist.api.prefetch import prefetch_for_serializer
+from watchlist.api.serializers import ReviewSerializer, WatchListSerializer
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class CompiledSerializerTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='a long story', platform=platform)
+        WatchList.objects.create(title='empty', storyline='no reviews', platform=platform)
+        for index, rating in enumerate((5, 3, 4)):
+            reviewer = User.objects.create(username=f'reviewer {index}')
+            Review.objects.create(reviewer=reviewer, watchlist=self.movie, rating=rating,
+                                  review=f'review {index}', active=index != 1)
+
+    def assert_same_bytes(self, serializer_class, queryset, fields=None, expand=None):
+        compiled = compile_serializer(serializer_class, fields, expand).serialize(queryset.order_by('pk'))
+        drf = serializer_class(prefetch_for_serializer(queryset.order_by('pk'), serializer_class, fields, expand),
+                               many=True, fields=fields, expand=expand).data
+        self.assertEqual(JSONRenderer().render(compiled), JSONRenderer().render(drf))
+
+    def test_same_bytes_as_drf(self):
+        self.assert_same_bytes(WatchListSerializer, WatchList.objects.all())
+        compiled = compile_serializer(ReviewSerializer).serialize(Review.objects.order_by('pk'))
+        drf = ReviewSerializer(Review.objects.order_by('pk'), many=True).data
+        self.assertEqual(JSONRenderer().render(compiled), JSONRenderer().render(drf))
+
+    def test_same_bytes_as_drf_with_a_selection(self):
+        self.assert_same_bytes(WatchListSerializer, WatchList.objects.all(), parse_tree('len_name,title'))
+        self.assert_same_bytes(WatchListSerializer, WatchList.objects.all(), parse_tree('len_description'))
+
+    def test_method_field_alone_in_the_selection(self):
+        url = reverse('watchlist:watchlist-detail', args=[self.movie.pk])
+        response = self.client.get(url, {'fields': 'len_name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'len_name': len('movie')})
+
+    def test_nested_lists_only_have_the_active_rows(self):
+        movie = compile_serializer(WatchListSerializer).serialize(WatchList.objects.filter(pk=self.movie.pk))[0]
+        self.assertEqual([review['review'] for review in movie['reviews']], ['review 0', 'review 2'])
+
+    def test_same_bytes_in_another_time_zone(self):
+        with self.settings(TIME_ZONE='America/New_York'):
+            self.assert_same_bytes(WatchListSerializer, WatchList.objects.all())
+
+    def test_one_query_per_level(self):
+        compiled = compile_serializer(WatchListSerializer)
+        # the movies, their reviews and the names of the reviewers
+        with self.assertNumQueries(3):
+            compiled.serialize(WatchList.objects.all())
+
+    def test_unsupported_fields(self):
+        class UnsupportedSerializer(serializers.ModelSerializer):
+            platform_name = serializers.CharField(source='platform.name')
+
+            class Meta:
+                model = WatchList
+                fields = ('title', 'platform_name')
+
+        with self.assertRaises(ImproperlyConfigured):
+            compile_serializer(UnsupportedSerializer)
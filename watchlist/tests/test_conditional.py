@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='story', platform=self.platform)
+        self.url = reverse('watchlist:watchlist-detail', args=[self.movie.pk])
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(url, headers={'If-None-Match': response['ETag'], **headers})
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # answered from the aggregates, before the view runs
+        with self.assertNumQueries(2):
+            self.assertEqual(self.revalidate(self.url, response).status_code, 304)
+
+    def test_if_modified_since_is_ignored(self):
+        # a delete leaves Max(updated_at) as it was, only the ETag sees it
+        Review.objects.create(reviewer=User.objects.create(username='reviewer'), watchlist=self.movie, rating=4)
+        platform_url = reverse('watchlist:streamplatform-detail', args=[self.platform.pk])
+        response = self.client.get(platform_url)
+        self.assertNotIn('Last-Modified', response)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = WatchList.objects.create(title='other', storyline='story', platform=self.platform)
+        since = {'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}
+        response = self.client.get(platform_url, headers=since)
+        self.assertEqual([movie['title'] for movie in response.json()['watchlist']], ['movie', 'other'])
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        response = self.client.get(platform_url, headers=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([movie['title'] for movie in response.json()['watchlist']], ['movie'])
+
+    def test_writes_change_the_etag(self):
+        response = self.client.get(self.url)
+        Review.objects.create(reviewer=User.objects.create(username='reviewer'), watchlist=self.movie, rating=4)
+        self.assertEqual(self.revalidate(self.url, response).status_code, 200)
+        response = self.client.get(self.url)
+        Review.objects.all().delete()
+        # a delete leaves no updated_at behind, the count changes
+        self.assertEqual(self.revalidate(self.url, response).status_code, 200)
+
+    def test_other_movies_do_not_change_the_etag(self):
+        response = self.client.get(self.url)
+        WatchList.objects.create(title='other', storyline='story', platform=self.platform)
+        self.assertEqual(self.revalidate(self.url, response).status_code, 304)
+
+    def test_the_query_and_media_type_are_part_of_the_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.revalidate(f'{self.url}?fields=title', response).status_code, 200)
+        self.assertNotEqual(self.client.get(self.url, HTTP_ACCEPT='text/html')['ETag'], response['ETag'])
+
+    def test_lists(self):
+        for name in ('watchlist-list', 'streamplatform-list'):
+            with self.subTest(name=name):
+                url = reverse(f'watchlist:{name}')
+                self.assertEqual(self.revalidate(url, self.client.get(url)).status_code, 304)
@@ -0,0 +1,130 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.export import export_chunks, export_columns, export_queryset, parse_bound, read_rows
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+def day(number):
+    return datetime(2024, 1, number, tzinfo=timezone.utc)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        movie = WatchList.objects.create(title='movie', storyline='story', platform=self.platform)
+        for number in range(1, 6):
+            Review.objects.create(reviewer=User.objects.create(username=f'reviewer {number}'), watchlist=movie,
+                                  rating=number, review=None if number == 3 else f'review, "{number}"')
+            Review.objects.filter(reviewer__username=f'reviewer {number}').update(created_at=day(number))
+
+    def ndjson(self, queryset, **options):
+        content = b''.join(export_chunks(queryset, 'ndjson', **options))
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_ndjson_chunks(self):
+        rows = self.ndjson(Review.objects.all(), chunk_size=2)
+        self.assertEqual([row['rating'] for row in rows], [1, 2, 3, 4, 5])
+        self.assertEqual(list(rows[0]), export_columns(Review))
+        self.assertIsNone(rows[2]['review'])
+        self.assertEqual(rows[0]['created_at'], '2024-01-01T00:00:00Z')
+        # inactive rows are exported too
+        Review.objects.filter(rating=1).update(active=False)
+        self.assertEqual(len(self.ndjson(Review.objects.all(), chunk_size=5)), 5)
+
+    def test_csv_holds_the_same_rows(self):
+        content = b''.join(export_chunks(Review.objects.all(), 'csv', chunk_size=2)).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        expected = self.ndjson(Review.objects.all())
+        self.assertEqual([row['review'] for row in rows], [row['review'] or '' for row in expected])
+        self.assertEqual(rows[0]['active'], 'true')
+        self.assertEqual(rows[0]['created_at'], expected[0]['created_at'])
+
+    def test_csv_formulas_are_quoted(self):
+        texts = ['=HYPERLINK("https://a.example")', '+1', '-1', '@SUM(A1)', "'quoted"]
+        for rating, text in enumerate(texts, start=1):
+            Review.objects.filter(rating=rating).update(review=text)
+        content = b''.join(export_chunks(Review.objects.all(), 'csv')).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['review'] for row in rows], ["'" + text for text in texts])
+        # numbers and dates are left alone
+        self.assertEqual(rows[0]['rating'], '1')
+        # the import reads the exported text back
+        self.assertEqual([row['review'] for row in read_rows(io.StringIO(content), 'csv')], texts)
+
+    def test_gzip(self):
+        content = b''.join(export_chunks(WatchList.objects.all(), 'ndjson', compress=True))
+        self.assertEqual(json.loads(gzip.decompress(content))['title'], 'movie')
+
+    def test_date_ranges(self):
+        queryset = export_queryset(Review, created_after=day(2), created_before=day(4))
+        self.assertEqual(sorted(queryset.values_list('rating', flat=True)), [2, 3])
+        with self.assertRaises(ValueError):
+            export_queryset(StreamPlatform, created_after=day(1))
+        self.assertEqual(export_queryset(StreamPlatform, updated_after=day(1)).count(), 1)
+
+    def test_parse_bound(self):
+        self.assertEqual(parse_bound('2024-01-02'), day(2))
+        self.assertEqual(parse_bound('2024-01-02T10:00:00+00:00'), day(2).replace(hour=10))
+        with self.assertRaises(ValueError):
+            parse_bound('yesterday')
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'review.csv.gz')
+            call_command('export_data', 'review', '--created-after=2024-01-04', output=path, stderr=io.StringIO())
+            with gzip.open(path, 'rt', newline='') as file:
+                self.assertEqual([row['rating'] for row in csv.DictReader(file)], ['4', '5'])
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'streamplatform', '--created-after=2024-01-01', stderr=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'review', chunk_size=0, stderr=io.StringIO())
+
+
+class ExportViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        WatchList.objects.create(title='movie', storyline='story', platform=platform)
+
+    def export(self, model, extension, **params):
+        return self.client.get(reverse('watchlist:export', args=[model, extension]), params)
+
+    def test_stream(self):
+        response = self.export('watchlist', 'ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['title'], 'movie')
+
+    def test_csv_gzip(self):
+        response = self.client.get(reverse('watchlist:export', args=['watchlist', 'csv']), {'gzip': 'true'},
+                                   HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="watchlist.csv.gz"')
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(b''.join(response.streaming_content)).decode())))
+        self.assertEqual(rows[0]['title'], 'movie')
+
+    def test_errors(self):
+        self.assertEqual(self.export('user', 'ndjson').status_code, 404)
+        self.assertEqual(self.export('review', 'xml').status_code, 404)
+        self.assertEqual(self.export('review', 'ndjson', created_after='nope').status_code, 400)
+        self.assertEqual(self.export('streamplatform', 'ndjson', created_after='2024-01-01').status_code, 400)
+
+    def test_admins_only(self):
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.assertEqual(self.export('review', 'ndjson').status_code, 403)
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, StreamPlatform, WatchList
+
+OLD = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+# the columns that hold the same values after a round trip, the ids and foreign keys are remapped
+MOVIE_COLUMNS = ('title', 'storyline', 'active', 'created', 'updated_at', 'avg_rating', 'number_rating',
+                 'rating_sum', 'rating_5_count', 'bayesian_rating')
+
+
+class ImportDataTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.reviewers = [User.objects.create(username=f'reviewer {index}') for index in range(3)]
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        for title, ratings in (('rated', (5, 4, 5)), ('unrated', ())):
+            movie = WatchList.objects.create(title=title, storyline=f'the story of {title}', platform=platform)
+            # a review without text is exported as null
+            Review.objects.bulk_create(Review(reviewer=reviewer, watchlist=movie, rating=rating,
+                                              review=None if rating == 4 else 'great')
+                                       for reviewer, rating in zip(self.reviewers, ratings))
+        WatchList.objects.all().recompute_ratings()
+        WatchList.objects.update(created=OLD, updated_at=OLD)
+        Review.objects.update(created_at=OLD, updated_at=OLD)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def export(self, *formats):
+        for model, extension in zip(('streamplatform', 'watchlist', 'review'), formats):
+            call_command('export_data', model, output=self.path(f'{model}.{extension}'),
+                         stdout=StringIO(), stderr=StringIO())
+
+    def import_data(self, **files):
+        call_command('import_data', **{name: self.path(file) for name, file in files.items()},
+                     stdout=StringIO(), stderr=StringIO())
+
+    def movies(self):
+        return sorted(WatchList.objects.values_list(*MOVIE_COLUMNS))
+
+    def reviews(self):
+        return sorted(Review.objects.values_list('watchlist__title', 'reviewer_id', 'rating', 'review', 'created_at'))
+
+    def test_round_trip(self):
+        # quoted in the CSV files
+        Review.objects.filter(review='great').update(review='=great')
+        for formats in (('ndjson',) * 3, ('csv',) * 3, ('ndjson.gz', 'csv.gz', 'ndjson')):
+            with self.subTest(formats=formats):
+                self.export(*formats)
+                movies = self.movies()
+                reviews = self.reviews()
+                StreamPlatform.objects.all().delete()
+                self.import_data(platforms=f'streamplatform.{formats[0]}', movies=f'watchlist.{formats[1]}',
+                                 reviews=f'review.{formats[2]}')
+                # the dates of the files are kept, the ratings recomputed from the loaded reviews
+                self.assertEqual(self.movies(), movies)
+                self.assertEqual(self.reviews(), reviews)
+
+    def test_existing_movies_are_left_alone(self):
+        self.export('ndjson', 'ndjson', 'ndjson')
+        other = StreamPlatform.objects.create(name='other', about='about', website='https://b.example')
+        existing = WatchList.objects.create(title='existing', storyline='story', platform=other,
+                                            number_rating=7, rating_sum=35)
+        WatchList.objects.filter(pk=existing.pk).update(updated_at=OLD)
+        self.import_data(movies='watchlist.ndjson', reviews='review.ndjson')
+        existing.refresh_from_db()
+        # not one of the imported movies: its (wrong) aggregate isn't recomputed
+        self.assertEqual((existing.number_rating, existing.updated_at), (7, OLD))
+
+    def test_reviews_of_existing_movies(self):
+        movie = WatchList.objects.get(title='unrated')
+        reviewer = User.objects.create(username='new reviewer')
+        with open(self.path('reviews.ndjson'), 'w') as file:
+            file.write(f'{{"watchlist_id": {movie.pk}, "reviewer_id": {reviewer.pk}, "rating": 2}}\n')
+        self.import_data(reviews='reviews.ndjson')
+        movie.refresh_from_db()
+        self.assertEqual((movie.number_rating, movie.rating_sum), (1, 2))
+        # the movie changed now, its updated_at moves
+        self.assertGreater(movie.updated_at, OLD)
+        self.assertEqual(WatchList.objects.get(title='rated').updated_at, OLD)
+
+    def test_platform_responses_are_refreshed(self):
+        platform = StreamPlatform.objects.get()
+        url = reverse('watchlist:streamplatform-detail', args=[platform.pk])
+        get_backend().clear()
+        self.assertEqual(len(self.client.get(url).json()['watchlist']), 2)
+        # movies of the file loaded into the existing platform, without --platforms
+        with open(self.path('movies.ndjson'), 'w') as file:
+            file.write(f'{{"id": 1, "title": "imported", "storyline": "story", "platform_id": {platform.pk}}}\n')
+        with open(self.path('reviews.ndjson'), 'w') as file:
+            file.write(f'{{"watchlist_id": 1, "reviewer_id": {self.reviewers[0].pk}, "rating": 3}}\n')
+        self.import_data(movies='movies.ndjson', reviews='reviews.ndjson')
+        movies = {movie['title']: movie for movie in self.client.get(url).json()['watchlist']}
+        self.assertEqual(sorted(movies), ['imported', 'rated', 'unrated'])
+        self.assertEqual(movies['imported']['number_rating'], 1)
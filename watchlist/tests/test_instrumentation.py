@@ -0,0 +1,62 @@
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from watchlist.api import instrumentation
+from watchlist.api.serializers import StreamPlatformSerializer, WatchListSerializer
+from watchlist.models import StreamPlatform, WatchList
+
+
+@override_settings(REQUEST_INSTRUMENTATION={'SAMPLE_RATE': 1})
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='story', platform=self.platform)
+
+    def measure(self, serializer):
+        timings = instrumentation.RequestTimings()
+        token = instrumentation._current.set(timings)
+        try:
+            serializer.data
+        finally:
+            instrumentation._current.reset(token)
+        return timings
+
+    def test_drf_serializers_are_not_patched(self):
+        data = serializers.BaseSerializer.__dict__['data']
+        instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+        self.assertIs(serializers.BaseSerializer.__dict__['data'], data)
+
+    def test_app_serializers_are_timed(self):
+        self.assertGreater(self.measure(WatchListSerializer(self.movie)).serializer_time, 0)
+        many = StreamPlatformSerializer([self.platform], many=True, context={'request': None})
+        self.assertIsInstance(many, instrumentation.TimedListSerializer)
+        self.assertGreater(self.measure(many).serializer_time, 0)
+
+    def test_other_serializers_are_not_timed(self):
+        class PlainSerializer(serializers.Serializer):
+            title = serializers.CharField()
+
+        self.assertEqual(self.measure(PlainSerializer(self.movie)).serializer_time, 0)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('watchlist:watchlist-detail', args=[self.movie.pk]))
+        self.assertEqual(response.status_code, 200)
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+
+    def test_repeated_queries_are_logged(self):
+        with self.assertLogs('watchlist.instrumentation', 'WARNING') as logs:
+            timings = instrumentation.RequestTimings()
+            for pk in range(5):
+                timings.shapes[instrumentation.query_shape(f'SELECT * FROM movie WHERE id = {pk}')] += 1
+            middleware = instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+            middleware.finish(RequestFactory().get('/watch/list/'), HttpResponse(), timings, 0.01)
+        self.assertIn('Possible N+1', logs.output[0])
+        self.assertIn('SELECT * FROM movie WHERE id = ?', logs.output[0])
@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.api.pagination import ReviewCursorPagination
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class LatestReviewsTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='story', platform=self.platform)
+        WatchList.objects.create(title='no reviews', storyline='story', platform=self.platform)
+        for index in range(7):
+            Review.objects.create(reviewer=User.objects.create(username=f'reviewer {index}'), watchlist=self.movie,
+                                  rating=4, review=f'review {index}', active=index != 3)
+        self.movie.refresh_from_db()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(f'watchlist:{name}', args=args), {'reviews': 'latest', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assert_latest(self, movie):
+        self.assertEqual([review['review'] for review in movie['reviews']],
+                         ['review 6', 'review 5', 'review 4', 'review 2', 'review 1'])
+        # the inactive review isn't counted
+        self.assertEqual(movie['reviews_count'], 6)
+        self.assertTrue(movie['reviews_url'].endswith(
+            f'/watch/stream/{self.movie.pk}/review/?page_size={ReviewCursorPagination.page_size}'))
+
+    def movie_of(self, movies):
+        return next(movie for movie in movies if movie['id'] == self.movie.pk)
+
+    def test_list(self):
+        movies = self.get('watchlist-list')['results']
+        self.assert_latest(self.movie_of(movies))
+        self.assertEqual([movie['reviews_count'] for movie in movies if movie['id'] != self.movie.pk], [0])
+
+    def test_detail(self):
+        self.assert_latest(self.get('watchlist-detail', self.movie.pk))
+
+    def test_async_views(self):
+        self.assert_latest(self.movie_of(self.get('async-watchlist-list')['results']))
+        self.assert_latest(self.get('async-watchlist-detail', self.movie.pk))
+
+    def test_nested_in_the_platforms(self):
+        platform = self.get('streamplatform-detail', self.platform.pk)
+        self.assert_latest(self.movie_of(platform['watchlist']))
+
+    def test_count_alone_in_the_selection(self):
+        self.assertEqual(self.get('watchlist-detail', self.movie.pk, fields='reviews_count'), {'reviews_count': 6})
+        movies = self.get('watchlist-list', fields='id,reviews_count')['results']
+        self.assertEqual(self.movie_of(movies), {'id': self.movie.pk, 'reviews_count': 6})
+
+    def test_deactivated_review(self):
+        Review.objects.filter(review='review 6').update(active=False)
+        movie = self.get('watchlist-detail', self.movie.pk)
+        self.assertEqual(movie['reviews_count'], 5)
+        self.assertEqual(movie['reviews'][0]['review'], 'review 5')
@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+@override_settings(WATCHLIST_LEADERBOARD={'MIN_VOTES': 10, 'PRIOR_MEAN': 3.0})
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+
+    def movie_with_reviews(self, title, *ratings):
+        movie = WatchList.objects.create(title=title, storyline=f'the story of {title}', platform=self.platform)
+        # written without update_rating(), like a bulk load, the aggregate is left to recompute_ratings
+        Review.objects.bulk_create(
+            Review(reviewer=User.objects.create(username=f'{title} {index}'), watchlist=movie, rating=rating)
+            for index, rating in enumerate(ratings))
+        return movie
+
+    def recompute(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recompute_ratings', stdout=StringIO())
+
+    def test_bayesian_rating_is_read_only(self):
+        response = self.client.post(reverse('watchlist:watchlist-list'), {
+            'title': 'movie', 'storyline': 'story', 'platform': self.platform.pk, 'bayesian_rating': 5.0,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(WatchList.objects.get().bayesian_rating, 0)
+
+    def test_bayesian_average(self):
+        movie = self.movie_with_reviews('movie', *[5] * 10)
+        self.recompute()
+        movie.refresh_from_db()
+        # (50 + 10 * 3.0) / (10 + 10)
+        self.assertAlmostEqual(movie.bayesian_rating, 4.0)
+        self.assertEqual(movie.number_rating, 10)
+
+    def test_few_reviews_do_not_top_the_list(self):
+        self.movie_with_reviews('one review', 5)
+        self.movie_with_reviews('many reviews', *[5, 4] * 20)
+        self.recompute()
+        ranking = self.client.get(reverse('watchlist:watchlist-top-rated')).json()
+        self.assertEqual([(entry['rank'], entry['title']) for entry in ranking],
+                         [(1, 'many reviews'), (2, 'one review')])
+
+    def test_recompute_ratings_refreshes_the_cached_responses(self):
+        movie = self.movie_with_reviews('movie', 4, 5)
+        top_rated = reverse('watchlist:watchlist-top-rated')
+        detail = reverse('watchlist:watchlist-detail', args=[movie.pk])
+        self.assertEqual(self.client.get(top_rated).json(), [])
+        self.assertEqual(self.client.get(detail).json()['number_rating'], 0)
+        self.recompute()
+        self.assertEqual([entry['title'] for entry in self.client.get(top_rated).json()], ['movie'])
+        self.assertEqual(self.client.get(detail).json()['number_rating'], 2)
@@ -0,0 +1,118 @@
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from watchmate.log import JSONFormatter, QueueListenerHandler, SQLSampleFilter
+
+
+def make_record(message='message %s', args=('value',), name='watchlist', level=logging.INFO, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class BlockingStream(io.StringIO):
+    """ A stream whose first write waits for release """
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.released = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.released.wait(5)
+        return super().write(text)
+
+
+class JSONFormatterTests(SimpleTestCase):
+
+    def test_record(self):
+        line = JSONFormatter().format(make_record(method='GET', duration_ms=1.5))
+        entry = json.loads(line)
+        self.assertEqual({key: entry[key] for key in ('level', 'logger', 'message', 'method', 'duration_ms')},
+                         {'level': 'INFO', 'logger': 'watchlist', 'message': 'message value', 'method': 'GET',
+                          'duration_ms': 1.5})
+        self.assertNotIn('args', entry)
+
+    def test_one_line(self):
+        try:
+            raise ValueError('failed')
+        except ValueError:
+            record = logging.LogRecord('watchlist', logging.ERROR, __file__, 1, 'two\nlines', (), True)
+            record.exc_info = sys.exc_info()
+        line = JSONFormatter().format(record)
+        self.assertNotIn('\n', line)
+        self.assertIn('ValueError: failed', json.loads(line)['exception'])
+        # integers json can't hold in 64 bits
+        self.assertEqual(json.loads(JSONFormatter().format(make_record(big=2 ** 70)))['big'], 2 ** 70)
+
+
+class QueueListenerHandlerTests(SimpleTestCase):
+
+    def handler(self, stream, queue_size=100):
+        handler = QueueListenerHandler(stream, queue_size=queue_size)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_written_by_the_listener(self):
+        stream = io.StringIO()
+        handler = self.handler(stream)
+        args = ['before']
+        handler.handle(make_record('value %s', (args,)))
+        # the message is built when the record is logged
+        args[0] = 'after'
+        handler.stop()
+        self.assertEqual(stream.getvalue(), "value ['before']\n")
+
+    def test_full_queue_drops_and_counts(self):
+        stream = BlockingStream()
+        handler = self.handler(stream, queue_size=2)
+        handler.handle(make_record('first', ()))
+        self.assertTrue(stream.writing.wait(5))
+        # the listener is stuck writing the first record, the queue holds two more
+        for message in ('second', 'third', 'fourth', 'fifth'):
+            handler.handle(make_record(message, ()))
+        self.assertEqual(handler.dropped, 2)
+        stream.released.set()
+        # stopping on a full queue waits for the listener to write what is queued
+        handler.stop()
+        handler.handle(make_record('sixth', ()))
+        handler.stop()
+        self.assertEqual(stream.getvalue().splitlines(),
+                         ['first', 'second', 'third', 'sixth', '2 log records dropped, the logging queue was full'])
+
+
+class SQLSampleFilterTests(SimpleTestCase):
+
+    def test_rate_and_slow_queries(self):
+        sample = SQLSampleFilter(per_second=2, slow=0.1)
+        passed = [sample.filter(make_record(duration=0.001)) for _ in range(4)]
+        self.assertEqual(passed, [True, True, False, False])
+        slow = make_record(duration=0.5)
+        self.assertTrue(sample.filter(slow))
+        self.assertEqual(slow.skipped, 2)
+
+
+class BenchmarkLoggingTests(TestCase):
+
+    def test_every_profile_runs(self):
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'records.log')
+            call_command('benchmark_logging', requests=20, repeat=1, output=output, stdout=stdout)
+            with open(output) as file:
+                # the file holds the records of the last profile, one json line each
+                lines = file.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            json.loads(line)
+        self.assertEqual([line.split()[0] for line in stdout.getvalue().splitlines()], ['development', 'production'])
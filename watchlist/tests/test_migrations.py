@@ -0,0 +1,89 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTestCase(TransactionTestCase):
+    """ Migrate back to migrate_from, add rows with the historical models, then migrate to migrate_to """
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('watchlist', self.migrate_from)])
+        self.addCleanup(self.migrate_latest)
+        self.apps = executor.loader.project_state([('watchlist', self.migrate_from)]).apps
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('watchlist', self.migrate_to)])
+        return executor.loader.project_state([('watchlist', self.migrate_to)]).apps
+
+    def migrate_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def platform(self):
+        return self.apps.get_model('watchlist', 'StreamPlatform').objects.create(
+            name='platform', about='about', website='https://example.com')
+
+
+class SearchTermMigrationTests(MigrationTestCase):
+    migrate_from = '0007_review_unique_and_index'
+    migrate_to = '0008_searchterm'
+
+    def test_existing_movies_are_indexed(self):
+        WatchList = self.apps.get_model('watchlist', 'WatchList')
+        movie = WatchList.objects.create(title='The Space War', storyline='a war in space',
+                                         platform=self.platform())
+        apps = self.migrate()
+        if connection.vendor == 'mysql':
+            return
+        terms = dict(apps.get_model('watchlist', 'SearchTerm').objects.filter(watchlist_id=movie.pk)
+                     .values_list('term', 'weight'))
+        # 3 for a word of the title, 1 for the storyline, stop words are left out
+        self.assertEqual(terms, {'space': 4, 'war': 4})
+
+
+
+class LeaderboardMigrationTests(MigrationTestCase):
+    migrate_from = '0008_searchterm'
+    migrate_to = '0009_watchlist_leaderboard'
+
+    def test_bayesian_rating_is_backfilled(self):
+        WatchList = self.apps.get_model('watchlist', 'WatchList')
+        platform = self.platform()
+        rated = WatchList.objects.create(title='rated', storyline='x', platform=platform,
+                                         rating_sum=50, number_rating=10)
+        unrated = WatchList.objects.create(title='unrated', storyline='x', platform=platform)
+        apps = self.migrate()
+        WatchList = apps.get_model('watchlist', 'WatchList')
+        # (50 + 10 * 3.0) / (10 + 10)
+        self.assertAlmostEqual(WatchList.objects.get(pk=rated.pk).bayesian_rating, 4.0)
+        self.assertEqual(WatchList.objects.get(pk=unrated.pk).bayesian_rating, 0)
+
+
+class DuplicateReviewMigrationTests(MigrationTestCase):
+    migrate_from = '0006_updated_at'
+    migrate_to = '0007_review_unique_and_index'
+
+    def test_duplicates_are_removed_from_the_reviews_and_the_aggregate(self):
+        WatchList = self.apps.get_model('watchlist', 'WatchList')
+        Review = self.apps.get_model('watchlist', 'Review')
+        reviewer, other = (self.apps.get_model('auth', 'User').objects.create(username=name)
+                           for name in ('reviewer', 'other'))
+        movie = WatchList.objects.create(title='movie', storyline='x', platform=self.platform(),
+                                         number_rating=3, rating_sum=9, avg_rating=3, rating_2_count=2,
+                                         rating_5_count=1)
+        first = Review.objects.create(reviewer=reviewer, watchlist=movie, rating=2)
+        Review.objects.create(reviewer=reviewer, watchlist=movie, rating=5)
+        Review.objects.create(reviewer=other, watchlist=movie, rating=2)
+        apps = self.migrate()
+        Review = apps.get_model('watchlist', 'Review')
+        self.assertEqual(sorted(Review.objects.values_list('reviewer__username', 'rating')),
+                         [('other', 2), ('reviewer', 2)])
+        self.assertTrue(Review.objects.filter(pk=first.pk).exists())
+        movie = apps.get_model('watchlist', 'WatchList').objects.get(pk=movie.pk)
+        self.assertEqual((movie.number_rating, movie.rating_sum, movie.avg_rating, movie.rating_5_count),
+                         (2, 4, 2, 0))
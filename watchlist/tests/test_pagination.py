@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.models import Review, StreamPlatform, WatchList
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        for index in range(7):
+            WatchList.objects.create(title=f'movie {index}', storyline='story', platform=self.platform)
+        # three movies created at the same instant, the id breaks the tie
+        for index, movie in enumerate(WatchList.objects.order_by('pk')):
+            WatchList.objects.filter(pk=movie.pk).update(created=START + timedelta(minutes=min(index, 4)))
+        self.newest_first = list(WatchList.objects.order_by('-created', '-id').values_list('pk', flat=True))
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, url, link, **params):
+        pages = []
+        page = self.get(url, **params)
+        while True:
+            pages.append([movie['id'] for movie in page['results']])
+            if page[link] is None:
+                return pages, page
+            page = self.get(page[link])
+
+    def test_next_pages_cover_every_movie_once(self):
+        pages, _ = self.walk(reverse('watchlist:watchlist-list'), 'next', page_size=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.newest_first)
+
+    def test_previous_pages_are_the_same_pages(self):
+        forward, last = self.walk(reverse('watchlist:watchlist-list'), 'next', page_size=3)
+        backward = [[movie['id'] for movie in last['results']]]
+        page = last
+        while page['previous'] is not None:
+            page = self.get(page['previous'])
+            backward.append([movie['id'] for movie in page['results']])
+        self.assertEqual(backward[::-1], forward)
+        self.assertIsNone(self.get(reverse('watchlist:watchlist-list'), page_size=3)['previous'])
+
+    def test_new_rows_do_not_shift_the_next_page(self):
+        first = self.get(reverse('watchlist:watchlist-list'), page_size=3)
+        WatchList.objects.create(title='newer', storyline='story', platform=self.platform)
+        second = self.get(first['next'])
+        self.assertEqual([movie['id'] for movie in second['results']], self.newest_first[3:6])
+
+    def test_page_size_is_capped(self):
+        for index in range(100):
+            WatchList.objects.create(title=f'more {index}', storyline='story', platform=self.platform)
+        self.assertEqual(len(self.get(reverse('watchlist:watchlist-list'), page_size=500)['results']), 100)
+        self.assertEqual(len(self.get(reverse('watchlist:watchlist-list'), page_size='x')['results']), 20)
+
+    def test_invalid_cursors(self):
+        url = reverse('watchlist:watchlist-list')
+        bad_payload = base64.urlsafe_b64encode(json.dumps({'c': 'yesterday', 'i': 1}).encode()).decode()
+        for cursor in ('not base64!', base64.urlsafe_b64encode(b'[1]').decode(), bad_payload):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+    def test_reviews_of_a_movie(self):
+        movie = WatchList.objects.get(pk=self.newest_first[0])
+        for index in range(5):
+            Review.objects.create(reviewer=User.objects.create(username=f'reviewer {index}'), watchlist=movie,
+                                  rating=3, active=index != 2)
+        pages, _ = self.walk(reverse('watchlist:review-list', args=[movie.pk]), 'next', page_size=2)
+        expected = list(Review.objects.filter(active=True).order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(sum(pages, []), expected)
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.api.fields import parse_tree
+from watchlist.api.prefetch import prefetch_for_serializer
+from watchlist.api.serializers import StreamPlatformSerializer, WatchListSerializer
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class PrefetchPlanTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.add_platforms(1)
+
+    def add_platforms(self, count):
+        for index in range(count):
+            platform = StreamPlatform.objects.create(name=f'platform {StreamPlatform.objects.count()}',
+                                                     about='about', website='https://a.example')
+            for movie_index in range(3):
+                movie = WatchList.objects.create(title=f'movie {movie_index}', storyline='story', platform=platform)
+                for review_index in range(2):
+                    reviewer = User.objects.create(username=f'{platform.pk} {movie_index} {review_index}')
+                    Review.objects.create(reviewer=reviewer, watchlist=movie, rating=4)
+
+    def queries(self, serializer_class, queryset, **selection):
+        with CaptureQueriesContext(connection) as queries:
+            serializer_class(prefetch_for_serializer(queryset, serializer_class, **selection), many=True,
+                             context={'request': None}, **selection).data
+        return queries
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        few = len(self.queries(StreamPlatformSerializer, StreamPlatform.objects.all()))
+        self.add_platforms(4)
+        self.assertEqual(len(self.queries(StreamPlatformSerializer, StreamPlatform.objects.all())), few)
+        # platforms, movies, reviews joined with their reviewers
+        self.assertEqual(few, 3)
+
+    def test_list_view(self):
+        url = reverse('watchlist:streamplatform-list')
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_platforms(4)
+        get_backend().clear()
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.client.get(url).json()), 5)
+        self.assertEqual(len(many), len(few))
+
+    def test_only_the_selected_relations_and_columns_are_loaded(self):
+        queries = self.queries(WatchListSerializer, WatchList.objects.all(), fields=parse_tree('title'), expand=())
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('storyline', queries[0]['sql'])
+        queries = self.queries(WatchListSerializer, WatchList.objects.all(), fields=parse_tree('title,reviews'),
+                               expand=())
+        # the movies, and their reviews joined with the reviewers
+        self.assertEqual(len(queries), 2)
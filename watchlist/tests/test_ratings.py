@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, StreamPlatform, WatchList
+
+AGGREGATE = ('avg_rating', 'bayesian_rating', 'number_rating', 'rating_sum', 'rating_1_count', 'rating_2_count',
+             'rating_3_count', 'rating_4_count', 'rating_5_count')
+
+
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='story', platform=platform)
+
+    def aggregate(self):
+        return WatchList.objects.filter(pk=self.movie.pk).values_list(*AGGREGATE).get()
+
+    def assert_consistent(self):
+        """ The running aggregate is the one rebuilt from the reviews """
+        running = self.aggregate()
+        WatchList.objects.filter(pk=self.movie.pk).recompute_ratings()
+        for name, value, expected in zip(AGGREGATE, running, self.aggregate()):
+            self.assertAlmostEqual(value, expected, msg=name)
+        return dict(zip(AGGREGATE, running))
+
+    def create(self, username, rating):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username=username))
+        return client.post(reverse('watchlist:review-create', args=[self.movie.pk]), {'rating': rating})
+
+    def test_create(self):
+        for index, rating in enumerate((5, 4, 4)):
+            self.assertEqual(self.create(f'reviewer {index}', rating).status_code, 201)
+        aggregate = self.assert_consistent()
+        self.assertAlmostEqual(aggregate['avg_rating'], 13 / 3)
+        self.assertEqual((aggregate['rating_4_count'], aggregate['rating_5_count']), (2, 1))
+
+    def test_edit_and_delete(self):
+        self.create('first', 5)
+        self.create('second', 1)
+        first, second = Review.objects.order_by('pk')
+        url = reverse('watchlist:review-detail', args=[first.pk])
+        self.assertEqual(self.admin.put(url, {'rating': 2}).status_code, 200)
+        self.assertEqual(self.assert_consistent()['rating_5_count'], 0)
+        # the same rating again changes nothing
+        self.assertEqual(self.admin.put(url, {'rating': 2, 'review': 'edited'}).status_code, 200)
+        self.assert_consistent()
+        self.assertEqual(self.admin.delete(reverse('watchlist:review-detail', args=[second.pk])).status_code, 204)
+        self.assertEqual(self.assert_consistent()['number_rating'], 1)
+        self.assertEqual(self.admin.delete(url).status_code, 204)
+        aggregate = self.assert_consistent()
+        self.assertEqual((aggregate['number_rating'], aggregate['avg_rating']), (0, 0))
+
+    def test_one_update_computed_by_the_database(self):
+        # no read-modify-write in python: concurrent reviews can't overwrite each other
+        with self.assertNumQueries(1):
+            WatchList.objects.filter(pk=self.movie.pk).update_rating(added=5)
+        with self.assertNumQueries(1):
+            WatchList.objects.filter(pk=self.movie.pk).update_rating(added=3, removed=5)
+        aggregate = dict(zip(AGGREGATE, self.aggregate()))
+        self.assertEqual((aggregate['number_rating'], aggregate['rating_sum'], aggregate['avg_rating']), (1, 3, 3))
+        self.assertEqual((aggregate['rating_3_count'], aggregate['rating_5_count']), (1, 0))
+
+    def test_invalid_reviews_leave_the_aggregate_alone(self):
+        self.assertEqual(self.create('reviewer', 6).status_code, 400)
+        self.assertEqual(self.aggregate()[AGGREGATE.index('number_rating')], 0)
+
+    def test_only_the_average_and_the_count_are_public(self):
+        get_backend().clear()
+        fields = ['id', 'len_name', 'len_description', 'reviews', 'title', 'storyline', 'active', 'created',
+                  'avg_rating', 'number_rating', 'platform']
+        movie = self.admin.get(reverse('watchlist:watchlist-detail', args=[self.movie.pk])).json()
+        self.assertEqual(list(movie), fields)
+        platform = self.admin.get(reverse('watchlist:streamplatform-detail', args=[self.movie.platform_id])).json()
+        self.assertEqual(list(platform['watchlist'][0]), fields)
+        self.assertNotIn('updated_at', platform)
+        # the response of a write too
+        response = self.admin.put(reverse('watchlist:watchlist-detail', args=[self.movie.pk]),
+                                  {'title': 'new', 'storyline': 'story', 'platform': self.movie.platform_id})
+        self.assertEqual(list(response.json()), fields)
@@ -0,0 +1,99 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest import skipIf, skipUnless
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.api.parsers import NDJSONParser, ORJSONParser, msgpack
+from watchlist.api.renderers import MessagePackRenderer, ORJSONRenderer
+from watchlist.models import Review, StreamPlatform, WatchList
+
+DATA = {
+    'created': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2024, 5, 1),
+    'rating': 4.25,
+    'price': Decimal('9.99'),
+    # JSONRenderer escapes the line and paragraph separators
+    'title': 'Amélie \u2028 \u2029',
+    'items': [1, None, True, {'nested': 'value'}],
+}
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_same_bytes_as_json_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indented_output_falls_back_to_the_stdlib(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(ORJSONRenderer().render(DATA, media_type), JSONRenderer().render(DATA, media_type))
+
+
+class ParserTests(SimpleTestCase):
+
+    def test_json(self):
+        body = JSONRenderer().render(DATA)
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(body)), json.loads(body))
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"title": '))
+
+    def test_ndjson(self):
+        parsed = NDJSONParser().parse(io.BytesIO(b'{"a": 1}\n\n{"a": 2}\n'))
+        self.assertEqual(parsed, [{'a': 1}, {'a': 2}])
+        with self.assertRaisesMessage(ParseError, 'line 2'):
+            NDJSONParser().parse(io.BytesIO(b'{"a": 1}\n{"a": \n'))
+
+
+class NegotiationTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='story', platform=platform)
+        Review.objects.create(reviewer=User.objects.create(username='reviewer'), watchlist=self.movie, rating=4)
+
+    def test_json_by_default(self):
+        response = self.client.get(reverse('watchlist:watchlist-detail', args=[self.movie.pk]))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        url = reverse('watchlist:watchlist-detail', args=[self.movie.pk])
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(url).json())
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack_body(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='writer'))
+        response = client.post(reverse('watchlist:review-create', args=[self.movie.pk]),
+                               msgpack.packb({'rating': 5, 'review': 'great'}), content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Review.objects.get(reviewer__username='writer').review, 'great')
+
+    @skipIf(msgpack, 'msgpack is installed')
+    def test_msgpack_is_refused_without_msgpack(self):
+        response = self.client.post(reverse('watchlist:review-create', args=[self.movie.pk]), b'\x81',
+                                    content_type='application/msgpack')
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_invalid_json_body(self):
+        response = self.client.post(reverse('watchlist:review-create', args=[self.movie.pk]), b'{"rating": ',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Review.objects.count(), 1)
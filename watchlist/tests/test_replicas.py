@@ -0,0 +1,82 @@
+import contextvars
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from watchlist.api.streaming import _in_context
+from watchlist.models import WatchList
+from watchmate.replicas import PrimaryReplicaRouter, ReplicaMiddleware, _replica
+
+REPLICAS = ['replica_1', 'replica_2', 'replica_3']
+
+
+@override_settings(DATABASE_REPLICAS={'ALIASES': REPLICAS},
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.reads = []
+
+    def view(self, status=200):
+        def get_response(request):
+            # the reads of one response, a page, its count and the prefetches
+            self.reads.append({self.router.db_for_read(WatchList) for _ in range(10)})
+            return HttpResponse(status=status)
+        return get_response
+
+    def request(self, method='get', status=200, token='token'):
+        extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        return ReplicaMiddleware(self.view(status))(getattr(self.factory, method)('/watch/list/', **extra))
+
+    def test_outside_of_a_request_reads_from_the_primary(self):
+        self.assertEqual(self.router.db_for_read(WatchList), 'default')
+
+    def test_router_reads_from_the_replica_of_the_request(self):
+        token = _replica.set('replica_2')
+        try:
+            self.assertEqual(self.router.db_for_read(WatchList), 'replica_2')
+        finally:
+            _replica.reset(token)
+
+    def test_one_replica_per_request(self):
+        for _ in range(20):
+            self.request()
+        self.assertTrue(all(len(reads) == 1 for reads in self.reads))
+        self.assertTrue(set.union(*self.reads) <= set(REPLICAS))
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        self.request('post')
+        self.request()
+        self.request(token='other')
+        self.assertEqual(self.reads[0], {'default'})
+        self.assertEqual(self.reads[1], {'default'})
+        self.assertLessEqual(self.reads[2], set(REPLICAS))
+
+    def test_failed_writes_do_not_pin(self):
+        self.request('post', status=400)
+        self.request()
+        self.assertLessEqual(self.reads[1], set(REPLICAS))
+
+    def test_async_requests(self):
+        async def get_response(request):
+            self.reads.append({self.router.db_for_read(WatchList) for _ in range(10)})
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        async_to_sync(middleware)(self.factory.get('/watch/list/'))
+        self.assertEqual(len(self.reads[0]), 1)
+        self.assertLessEqual(self.reads[0], set(REPLICAS))
+
+    def test_streamed_bodies_read_from_the_replica_of_the_request(self):
+        def body():
+            # read once the middleware returned
+            yield self.router.db_for_read(WatchList).encode()
+
+        def get_response(request):
+            return StreamingHttpResponse(_in_context(contextvars.copy_context(), body()))
+
+        response = ReplicaMiddleware(get_response)(self.factory.get('/watch/list/'))
+        self.assertIn(b''.join(response.streaming_content).decode(), REPLICAS)
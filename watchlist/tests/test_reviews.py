@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class UniqueReviewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reviewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movie = WatchList.objects.create(title='movie', storyline='story', platform=platform)
+        self.url = reverse('watchlist:review-create', args=[self.movie.pk])
+
+    def test_second_review_of_a_movie(self):
+        self.assertEqual(self.client.post(self.url, {'rating': 5}).status_code, 201)
+        response = self.client.post(self.url, {'rating': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), ['You have already reviewed this movie'])
+        # the failed insert is rolled back with its aggregate update
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.number_rating, self.movie.rating_sum), (1, 5))
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_no_exists_query_before_the_insert(self):
+        with self.assertNumQueries(5):
+            # savepoint, insert, aggregate update, release, and the reviewer name of the response
+            self.assertEqual(self.client.post(self.url, {'rating': 5}).status_code, 201)
+
+    def test_the_database_enforces_it(self):
+        Review.objects.create(reviewer=self.user, watchlist=self.movie, rating=5)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Review.objects.create(reviewer=self.user, watchlist=self.movie, rating=4)
+
+
+class MissingMovieTests(TransactionTestCase):
+    # SQLite and PostgreSQL check the foreign keys at the commit, which a TestCase never reaches
+
+    def test_review_of_a_missing_movie(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='reviewer'))
+        response = client.post(reverse('watchlist:review-create', args=[999]), {'rating': 5})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Review.objects.exists())
@@ -0,0 +1,77 @@
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.models import SearchTerm, StreamPlatform, WatchList
+from watchlist.search import index_terms, tokenize, uses_fulltext
+
+
+class TokenizeTests(SimpleTestCase):
+
+    def test_words(self):
+        self.assertEqual(tokenize('The Lord of the Rings: a journey, X'), ['lord', 'rings', 'journey'])
+
+    def test_title_counts_more_than_the_storyline(self):
+        movie = WatchList(title='Space War', storyline='a war in deep space, space!')
+        self.assertEqual(index_terms(movie), {'space': 5, 'war': 4, 'deep': 1})
+
+
+# MySQL ranks with its FULLTEXT index, these are the scores of the SearchTerm index
+@skipIf(uses_fulltext(), 'the database has a FULLTEXT index')
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.other = StreamPlatform.objects.create(name='other', about='about', website='https://b.example')
+        self.movie('Space War', 'a war between planets')
+        self.movie('Planet Earth', 'a documentary about our planet and space')
+        self.movie('War Horse', 'a horse in the war')
+        self.movie('Hidden Space', 'space', active=False)
+        self.movie('Space Cats', 'cats in space', platform=self.other)
+
+    def movie(self, title, storyline, platform=None, active=True):
+        return WatchList.objects.create(title=title, storyline=storyline, platform=platform or self.platform,
+                                        active=active)
+
+    def search(self, expected_status=200, **params):
+        response = self.client.get(reverse('watchlist:watchlist-search'), params)
+        self.assertEqual(response.status_code, expected_status)
+        return response.json()
+
+    def titles(self, **params):
+        return [movie['title'] for movie in self.search(**params)['results']]
+
+    def test_best_match_first(self):
+        # a word of the title scores more than one of the storyline, inactive movies are left out
+        self.assertEqual(self.titles(q='space'), ['Space Cats', 'Space War', 'Planet Earth'])
+        self.assertEqual(self.titles(q='space war')[0], 'Space War')
+
+    def test_platform_filter(self):
+        self.assertEqual(self.titles(q='space', platform=self.other.pk), ['Space Cats'])
+        self.search(400, q='space', platform='x')
+
+    def test_active_filter(self):
+        self.assertEqual(self.titles(q='space', active='true'), ['Space Cats', 'Space War', 'Planet Earth'])
+        # only the admins see the inactive movies
+        self.assertEqual(self.titles(q='space', active='false'), [])
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.assertEqual(self.titles(q='space', active='false'), ['Hidden Space'])
+
+    def test_no_match(self):
+        self.assertEqual(self.titles(q='the of'), [])
+        self.assertEqual(self.titles(q='submarine'), [])
+        self.search(400)
+
+    def test_the_index_follows_the_edits(self):
+        movie = WatchList.objects.get(title='War Horse')
+        movie.title = 'Submarine'
+        movie.save()
+        self.assertEqual(self.titles(q='submarine'), ['Submarine'])
+        self.assertNotIn('horse', SearchTerm.objects.filter(watchlist=movie, weight__gt=1)
+                         .values_list('term', flat=True))
+        movie.delete()
+        self.assertEqual(self.titles(q='submarine'), [])
@@ -0,0 +1,123 @@
+import math
+import os
+import random
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.cache import get_backend
+from watchlist.models import Review, SimilarTitle, StreamPlatform, WatchList
+from watchlist.similarity import DEFAULT_SIMILARITY, compute_neighbours, refresh_similar_titles, vectorized
+
+
+def stats_of(reviews):
+    """ movie_stats() of in-memory (reviewer, movie, rating) triples """
+    ratings = {}
+    for _, movie, rating in reviews:
+        ratings.setdefault(movie, []).append(rating)
+    stats = {}
+    for movie, values in ratings.items():
+        mean = sum(values) / len(values)
+        stats[movie] = (mean, math.sqrt(sum((value - mean) ** 2 for value in values)))
+    return stats
+
+
+class ScoreTests(SimpleTestCase):
+    config = {**DEFAULT_SIMILARITY, 'SHRINKAGE': 10}
+
+    def neighbours(self, reviews, use_numpy=False, **config):
+        return compute_neighbours(reviews, stats_of(reviews), stats_of(reviews), {**self.config, **config},
+                                  use_numpy=use_numpy)
+
+    def test_shrunk_cosine_of_the_centered_ratings(self):
+        # centered: movie 1 (2, -2), movie 2 (1, -1), cosine 1, two reviewers in common: 2 / (2 + 10)
+        reviews = [(1, 1, 5), (2, 1, 1), (1, 2, 4), (2, 2, 2)]
+        self.assertEqual([(movie, rank, similar) for movie, rank, similar, _ in self.neighbours(reviews)],
+                         [(1, 1, 2), (2, 1, 1)])
+        for *_, score in self.neighbours(reviews):
+            self.assertAlmostEqual(score, 1 / 6)
+
+    def test_opposite_tastes_and_few_reviewers_are_not_neighbours(self):
+        opposite = [(1, 1, 5), (2, 1, 1), (1, 2, 1), (2, 2, 5)]
+        self.assertEqual(self.neighbours(opposite), [])
+        one_reviewer = [(1, 1, 5), (2, 1, 1), (1, 2, 5), (3, 2, 1)]
+        self.assertEqual(self.neighbours(one_reviewer), [])
+
+    def test_top_k(self):
+        # every movie is rated the same way, so each one has the 7 others as neighbours
+        reviews = [(reviewer, movie, reviewer % 5 + 1) for reviewer in range(10) for movie in range(8)]
+        neighbours = [(rank, similar) for movie, rank, similar, _ in self.neighbours(reviews, TOP_K=3) if movie == 0]
+        # equal scores are ranked by movie id
+        self.assertEqual(neighbours, [(1, 1), (2, 2), (3, 3)])
+
+    # they are in the Pipfile: a CI run without them fails here instead of skipping
+    @skipUnless(vectorized() or os.environ.get('CI'), 'NumPy and SciPy are not installed')
+    def test_numpy_and_python_agree(self):
+        rng = random.Random(7)
+        reviews = list({(rng.randrange(40), rng.randrange(15)): rng.randint(1, 5) for _ in range(300)}.items())
+        reviews = [(reviewer, movie, rating) for (reviewer, movie), rating in reviews]
+        python = self.neighbours(reviews, use_numpy=False, MIN_CO_RATINGS=2, TOP_K=5)
+        numpy = self.neighbours(reviews, use_numpy=True, MIN_CO_RATINGS=2, TOP_K=5)
+        self.assertEqual([row[:3] for row in numpy], [row[:3] for row in python])
+        for (*_, expected), (*_, score) in zip(python, numpy):
+            self.assertAlmostEqual(score, expected)
+
+
+class SimilarTitlesTests(TestCase):
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        self.movies = [WatchList.objects.create(title=f'movie {index}', storyline='story', platform=self.platform)
+                       for index in range(4)]
+        self.reviewers = [User.objects.create(username=f'reviewer {index}') for index in range(4)]
+        # movies 0 and 1 are liked by the same reviewers, movie 2 by the others
+        for reviewer, ratings in zip(self.reviewers, ((5, 5, 1, 3), (4, 5, 2, 3), (1, 2, 5, 3), (2, 1, 4, 4))):
+            for movie, rating in zip(self.movies, ratings):
+                self.review(reviewer, movie, rating)
+
+    def review(self, reviewer, movie, rating):
+        review = Review.objects.create(reviewer=reviewer, watchlist=movie, rating=rating)
+        WatchList.objects.filter(pk=movie.pk).update_rating(added=rating)
+        return review
+
+    def rows(self):
+        return sorted(SimilarTitle.objects.values_list('watchlist_id', 'rank', 'similar_id'))
+
+    def test_similar_view(self):
+        refresh_similar_titles(full=True)
+        similar = self.client.get(reverse('watchlist:watchlist-similar', args=[self.movies[0].pk])).json()
+        self.assertEqual(similar[0]['id'], self.movies[1].pk)
+        self.assertEqual(similar[0]['rank'], 1)
+        self.assertEqual(self.client.get(reverse('watchlist:watchlist-similar', args=[999])).status_code, 404)
+
+    def test_new_reviews_refresh_the_cached_ratings(self):
+        refresh_similar_titles(full=True)
+        url = reverse('watchlist:watchlist-similar', args=[self.movies[0].pk])
+        self.assertEqual(self.client.get(url).json()[0]['number_rating'], 4)
+        # the similar movie gets a review, the rows stay the same until the next refresh
+        self.client.force_authenticate(User.objects.create(username='new reviewer'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('watchlist:review-create', args=[self.movies[1].pk]),
+                                        {'rating': 5, 'review': 'great'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(url).json()[0]['number_rating'], 5)
+
+    def test_incremental_refresh_equals_a_full_build(self):
+        refresh_similar_titles(full=True)
+        reviewer = User.objects.create(username='new reviewer')
+        for movie, rating in zip(self.movies, (1, 5, 5, 1)):
+            self.review(reviewer, movie, rating)
+        movies, _ = refresh_similar_titles()
+        self.assertGreater(movies, 0)
+        incremental = self.rows()
+        refresh_similar_titles(full=True)
+        self.assertEqual(incremental, self.rows())
+
+    def test_nothing_changed(self):
+        refresh_similar_titles(full=True)
+        self.assertEqual(refresh_similar_titles(), (0, 0))
@@ -0,0 +1,52 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist.api.serializers import WatchListSerializer
+from watchlist.api.streaming import iterate_in_chunks
+from watchlist.models import Review, StreamPlatform, WatchList
+
+
+class StreamingTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='user'))
+        platform = StreamPlatform.objects.create(name='platform', about='about', website='https://a.example')
+        for index in range(5):
+            movie = WatchList.objects.create(title=f'movie {index}', storyline='story', platform=platform,
+                                             active=index != 2)
+            Review.objects.create(reviewer=User.objects.create(username=f'reviewer {index}'), watchlist=movie,
+                                  rating=index + 1)
+
+    def stream(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_chunks(self):
+        with self.assertNumQueries(3):
+            pks = [movie.pk for movie in iterate_in_chunks(WatchList.objects.all(), 2)]
+        self.assertEqual(pks, sorted(WatchList.objects.values_list('pk', flat=True)))
+
+    def test_streamed_movies_are_the_serialized_movies(self):
+        streamed = self.stream(reverse('watchlist:watchlist-list'), stream='true')
+        movies = WatchList.active_objects.order_by('pk')
+        self.assertEqual(streamed, json.loads(json.dumps(WatchListSerializer(movies, many=True).data)))
+
+    def test_streaming_is_opt_in(self):
+        url = reverse('watchlist:review-list')
+        response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        streamed = self.stream(url, stream='true')
+        self.assertEqual(sorted(streamed, key=lambda review: review['id']),
+                         sorted(response.json(), key=lambda review: review['id']))
+        self.assertEqual(len(streamed), 5)
+
+    def test_browsable_api_is_not_streamed(self):
+        response = self.client.get(reverse('watchlist:watchlist-list'), {'stream': 'true'}, HTTP_ACCEPT='text/html')
+        self.assertFalse(response.streaming)
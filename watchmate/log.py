@@ -0,0 +1,181 @@
+"""Non-blocking, structured logging for the production profile of settings.LOGGING.
+
+The development profile writes every record to stderr from the thread that
+logs it, the SQL of every query included (DEBUG is on): a request waits
+for its log lines to be written and a slow terminal or pipe slows the api
+down. Here:
+
+QueueListenerHandler only puts the record on a bounded queue, a listener
+thread formats and writes it. When the queue is full the record is dropped
+and counted, logging never blocks a request.
+
+JSONFormatter writes one line of JSON per record, with the fields passed in
+extra={...}: the instrumentation middleware logs its numbers that way, so a
+measured request is one record with its method, path, status and timings.
+
+SQLSampleFilter rate limits the records of django.db.backends: at most
+PER_SECOND queries a second are logged, plus every query slower than SLOW
+seconds, with the number of queries skipped since the previous record.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# the attributes of every record, the other ones come from extra={...}
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', logging.INFO, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def dumps(entry):
+    if orjson is not None:
+        try:
+            return orjson.dumps(entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # integers of more than 64 bits, the stdlib encoder takes them
+            pass
+    return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class JSONFormatter(logging.Formatter):
+    """ One line of JSON per record: time, level, logger, message and the extra fields """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        # newlines are escaped by the encoder, a record stays on one line
+        return dumps(entry)
+
+
+class _Listener(QueueListener):
+
+    def enqueue_sentinel(self):
+        # waits for the thread to make room, on a full queue put_nowait() would raise and nothing would stop
+        self.queue.put(self._sentinel)
+
+
+class QueueListenerHandler(QueueHandler):
+    """ Queue the records, a listener thread writes them to stream with the formatter of the handler.
+
+    The thread is started by the first record of each process: a worker forked by the server
+    after the settings are loaded starts its own.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._reported = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # the queue of the parent, its locks may have been held by its listener at the fork
+                self.queue = queue.Queue(self.queue_size)
+            self.target.setFormatter(self.formatter)
+            self._listener = _Listener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """ Write the records still queued and stop the thread """
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                self._listener = None
+                self._pid = None
+
+    def prepare(self, record):
+        # formatted by the listener, only the message is built now: its arguments can change after the call
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+            return
+        except Exception:
+            self.handleError(record)
+            return
+        if self.dropped != self._reported:
+            self.report_dropped()
+
+    def report_dropped(self):
+        dropped, self._reported = self.dropped - self._reported, self.dropped
+        record = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                   '%d log records dropped, the logging queue was full', (dropped,), None)
+        record.dropped = dropped
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self._reported -= dropped
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
+
+
+class SQLSampleFilter(logging.Filter):
+    """ Let through per_second records a second (a token bucket) and every query slower than slow seconds """
+
+    def __init__(self, per_second=10, slow=0.1, name=''):
+        super().__init__(name)
+        self.per_second = per_second
+        self.slow = slow
+        self.tokens = float(per_second)
+        self.updated = time.monotonic()
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        duration = getattr(record, 'duration', None)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated) * self.per_second)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+            elif self.slow is None or duration is None or duration < self.slow:
+                self.skipped += 1
+                return False
+            skipped, self.skipped = self.skipped, 0
+        # the queries that weren't logged since the previous record
+        record.skipped = skipped
+        return True
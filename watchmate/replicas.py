@@ -0,0 +1,161 @@
+"""Primary / replica database routing.
+
+ReplicaMiddleware decides, once per request, where its reads go:
+requests with a safe method (GET, HEAD, OPTIONS) read from one of the
+replicas of DATABASE_REPLICAS['ALIASES'], every other request and
+everything outside of a request (management commands, shell) stays on the
+primary, the 'default' database. Writes always go to the primary.
+
+The replica is picked once, at the start of the request: replicas don't
+lag by the same amount, the queries of one response (a page and its
+count, a movie and its prefetched reviews) must all see the same state.
+
+Replicas lag behind the primary, so a client that just wrote is pinned to
+the primary for STICKY_SECONDS: a user reading the review they just posted
+must see it. Clients are told apart by their credentials (the
+Authorization header, or the session cookie), the pins are kept in the
+Django cache CACHE, which has to be shared by the processes in production.
+
+Some models are always read from the primary (PRIMARY_MODELS): a token
+created by a login must authenticate the next request right away, and the
+database cache (django_cache.cacheentry) holds the versions of the response
+cache, a bump must be seen right away.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_SETTINGS = {
+    'ALIASES': [],
+    'STICKY_SECONDS': 5,
+    'CACHE': 'default',
+    'PRIMARY_MODELS': ['authtoken.token', 'auth.user', 'sessions.session', 'django_cache.cacheentry'],
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# the replica the current request reads from, None to read from the primary
+_replica = ContextVar('watchmate_replica', default=None)
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'DATABASE_REPLICAS', {})}
+
+
+def client_key(request):
+    """ The cache key of the client that sent the request, None for an anonymous client """
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    # the credentials themselves never go in the cache
+    return 'replicas:pin:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+class PrimaryReplicaRouter:
+    """ Reads go to a replica when the request allows it, writes and migrations to the primary """
+
+    def __init__(self):
+        config = get_settings()
+        self.replicas = list(config['ALIASES'])
+        self.primary_models = {label.lower() for label in config['PRIMARY_MODELS']}
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or replica not in self.replicas:
+            return DEFAULT_DB_ALIAS
+        # the model of the database cache only has app_label and model_name
+        if f'{model._meta.app_label}.{model._meta.model_name}' in self.primary_models:
+            return DEFAULT_DB_ALIAS
+        # a read in a transaction of the primary must see what the transaction wrote
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas get the schema through replication
+        if db in self.replicas:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """ Send the reads of safe requests to the replicas, pin the clients that write to the primary """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_settings()
+        self.replicas = list(config['ALIASES'])
+        self.enabled = bool(self.replicas)
+        self.sticky_seconds = config['STICKY_SECONDS']
+        self.cache = caches[config['CACHE']]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        key = client_key(request)
+        token = _replica.set(self.choose_replica(self.can_use_replica(request, key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        self.pin(request, response, key)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        key = client_key(request)
+        token = _replica.set(self.choose_replica(await self.acan_use_replica(request, key)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        await self.apin(request, response, key)
+        return response
+
+    def choose_replica(self, can_use_replica):
+        """ The replica every read of the request goes to, None for the primary """
+        return random.choice(self.replicas) if can_use_replica else None
+
+    def can_use_replica(self, request, key):
+        if request.method not in SAFE_METHODS:
+            return False
+        return key is None or self.cache.get(key) is None
+
+    async def acan_use_replica(self, request, key):
+        if request.method not in SAFE_METHODS:
+            return False
+        return key is None or await self.cache.aget(key) is None
+
+    def should_pin(self, request, response, key):
+        # a failed write changed nothing
+        return key is not None and request.method not in SAFE_METHODS and response.status_code < 400
+
+    def pin(self, request, response, key):
+        if self.should_pin(request, response, key):
+            self.cache.set(key, True, self.sticky_seconds)
+
+    async def apin(self, request, response, key):
+        if self.should_pin(request, response, key):
+            await self.cache.aset(key, True, self.sticky_seconds)
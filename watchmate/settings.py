@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 from environs import Env
 
@@ -39,11 +40,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'watchlist.apps.WatchlistConfig',
+    'user.apps.UserConfig',
     'rest_framework',
     'rest_framework.authtoken',  # Token Authentication with rest_framework.authentication.TokenAuthentication
 ]
 
 MIDDLEWARE = [
+    # first, so the time of the other middleware is measured too
+    'watchlist.api.instrumentation.InstrumentationMiddleware',
+    'watchmate.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +91,46 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, one MySQL option file per replica
+# (see watchmate.replicas for which requests read from them)
+for _index, _option_file in enumerate(env.list('DATABASE_REPLICA_OPTION_FILES', []), start=1):
+    DATABASES[f'replica_{_index}'] = {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': 'watchlistDB',
+        'OPTIONS': {
+            'read_default_file': _option_file,
+        },
+        # tests read the rows they wrote, from the primary
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['watchmate.replicas.PrimaryReplicaRouter']
+
+DATABASE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias.startswith('replica_')],
+    # seconds a client reads from the primary after a write, longer than the replication lag
+    'STICKY_SECONDS': 5,
+    # shared by all the processes with REDIS_URL, so the pin holds whichever process serves the next request
+    'CACHE': 'default',
+}
+
+# The response cache (watchlist.api.cache) and the read-your-writes pins (watchmate.replicas) are kept
+# out of MySQL: REDIS_URL shares them between every process, the web workers and the management
+# commands (needs the redis package); without it they are in the memory of each process
+if env.str('REDIS_URL', ''):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': env.str('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -131,23 +176,147 @@ REST_FRAMEWORK = {
         # 'rest_framework.authentication.BasicAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
         # 'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication'
+        # TokenAuthentication with the token lookup cached in memory
+        'user.api.authentication.CachedTokenAuthentication'
     ],
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
     # ],
+    # JSON with orjson, and MessagePack with Accept / Content-Type: application/msgpack
+    # (see watchlist.api.renderers, orjson and msgpack are optional)
+    'DEFAULT_RENDERER_CLASSES': [
+        'watchlist.api.renderers.ORJSONRenderer',
+        *(['watchlist.api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'watchlist.api.parsers.ORJSONParser',
+        'watchlist.api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# In memory cache of user.api.authentication.CachedTokenAuthentication, per process:
+# a token revoked in another process (logout, deactivated user) is accepted for up to TIMEOUT seconds
+TOKEN_AUTH_CACHE = {
+    'TIMEOUT': 10,  # seconds
+    'MAX_ENTRIES': 10000,
+}
+
+# Thread pool of the async registration (user.api.hashing), bounds the CPU spent on password hashing
+PASSWORD_HASHING = {
+    'MAX_WORKERS': 4,
+    'MAX_PENDING': 64,  # hashes running or queued, the next registrations get a 503
 }
 
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
+# Response cache of the read endpoints in watchlist.api.views
+# with REDIS_URL in Redis, so a bump made by any process is seen by every process right away;
+# without it in an LRU of each process: a write made by another process (another worker, a management
+# command) is only seen once the entries expire, the responses can be up to 'timeout' seconds stale
+if env.str('REDIS_URL', ''):
+    WATCHLIST_RESPONSE_CACHE = {
+        'BACKEND': 'watchlist.api.cache.DjangoCacheBackend',
+        'OPTIONS': {
+            'alias': 'default',
+            'timeout': 3600,  # seconds, the entries of old versions are never read again
         },
+    }
+else:
+    WATCHLIST_RESPONSE_CACHE = {
+        'BACKEND': 'watchlist.api.cache.LocMemLRUBackend',
+        'OPTIONS': {
+            'max_entries': 1000,
+            'max_size': 64 * 1024 * 1024,  # bytes of pickled responses
+            'timeout': 60,  # seconds, the staleness window of the other processes
+        },
+    }
+
+# Bayesian average of the top rated leaderboards: (rating_sum + MIN_VOTES * PRIOR_MEAN) / (number_rating + MIN_VOTES)
+# after a change, run manage.py recompute_ratings to rank every movie with the new values
+WATCHLIST_LEADERBOARD = {
+    'MIN_VOTES': 10,
+    'PRIOR_MEAN': 3.0,
+}
+
+# Similar titles of /watch/list/<pk>/similar/ (watchlist.similarity), computed by manage.py refresh_similar_titles
+# after a change, run it with --full to recompute every movie
+WATCHLIST_SIMILARITY = {
+    'TOP_K': 20,  # neighbours kept per movie
+    'MIN_CO_RATINGS': 2,  # reviewers two movies need in common
+    'SHRINKAGE': 10,  # the score is shrunk by n / (n + SHRINKAGE), n the reviewers in common
+}
+
+# rows per INSERT / UPDATE statement of the bulk endpoints
+WATCHLIST_BULK_BATCH_SIZE = 500
+
+# watchlist.api.instrumentation.InstrumentationMiddleware
+REQUEST_INSTRUMENTATION = {
+    'SAMPLE_RATE': 0.1,  # share of the requests that are measured
+    'SERVER_TIMING': True,  # send the Server-Timing header
+    'N_PLUS_ONE_THRESHOLD': 5,  # repetitions of a query shape that are logged as a N+1
+}
+
+# 'development': every record, the SQL of every query included, written to stderr by the thread that logs it
+# 'production': one line of JSON per record, written by a listener thread (watchmate.log), INFO and up,
+#     at most 10 SQL queries a second are logged plus the ones slower than 100ms
+# manage.py benchmark_logging compares them
+LOGGING_PROFILES = {
+    'development': {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {
+            'console': {
+                'class': 'logging.StreamHandler',
+            },
+        },
+        'root': {
+            'handlers': ['console'],
+            'level': 'DEBUG',
+        },
+        'loggers': {},
     },
-    'root': {
-        'handlers': ['console'],
-        'level': 'DEBUG',
+    'production': {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'json': {
+                '()': 'watchmate.log.JSONFormatter',
+            },
+        },
+        'filters': {
+            'sql_sample': {
+                '()': 'watchmate.log.SQLSampleFilter',
+                'per_second': 10,
+                'slow': 0.1,  # seconds
+            },
+        },
+        'handlers': {
+            'queue': {
+                '()': 'watchmate.log.QueueListenerHandler',
+                'stream': 'ext://sys.stderr',
+                'queue_size': 10000,  # records, the next ones are dropped and counted
+                'formatter': 'json',
+            },
+        },
+        'root': {
+            'handlers': ['queue'],
+            'level': 'WARNING',
+        },
+        'loggers': {
+            'django': {'level': 'INFO'},
+            'django.server': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+            'django.db.backends': {'level': 'DEBUG', 'filters': ['sql_sample']},
+            # the DDL of the migrations
+            'django.db.backends.schema': {'level': 'INFO'},
+            'watchlist': {'level': 'INFO'},
+            'user': {'level': 'INFO'},
+        },
     },
 }
+LOGGING_PROFILE = env.str('LOGGING_PROFILE', 'development')
+LOGGING = LOGGING_PROFILES[LOGGING_PROFILE]
+
+# per logger levels on top of the profile, e.g. LOG_LEVELS=django.db.backends=INFO,watchlist.instrumentation=WARNING
+for _logger, _level in env.dict('LOG_LEVELS', {}).items():
+    LOGGING['loggers'].setdefault(_logger, {})['level'] = _level.upper()